@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.routes import projects, testcases, runs, dashboard, metrics, tools, auth, users
+from app.api.routes import projects, testcases, runs, dashboard, metrics, tools, auth, users, llm
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -9,4 +9,5 @@ api_router.include_router(testcases.router, prefix="/testcases", tags=["testcase
 api_router.include_router(runs.router, prefix="/runs", tags=["runs"])
 api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 api_router.include_router(tools.router, prefix="/tools", tags=["tools"])
+api_router.include_router(llm.router, prefix="/llm", tags=["llm"])
 api_router.include_router(dashboard.router, tags=["dashboard"])
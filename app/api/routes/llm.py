@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+from app.core.db import get_session
+from app.schemas.telemetry import LLMTelemetryResponse
+
+router = APIRouter()
+
+@router.get("/scheduler")
+def read_scheduler_stats() -> List[Dict[str, Any]]:
+    # Per-model concurrency limit, queue depth, retries and throttling
+    from app.providers.scheduler import get_llm_scheduler
+    return get_llm_scheduler().stats()
+
+@router.get("/telemetry", response_model=LLMTelemetryResponse)
+def read_llm_telemetry(
+    group_by: str = "model",
+    project_id: Optional[int] = None,
+    test_case_id: Optional[int] = None,
+    metric_definition_id: Optional[int] = None,
+    model: Optional[str] = None,
+    since: Optional[datetime] = None,
+    session: Session = Depends(get_session)
+):
+    # Latency percentiles and token usage of persisted provider calls
+    from app.services.telemetry import get_llm_telemetry_rollups
+    try:
+        return get_llm_telemetry_rollups(session, group_by, project_id, test_case_id, metric_definition_id, model, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlmodel import Session
 from app.core.db import get_session
-from app.models.metric import MetricDefinition
+from app.core.config import settings
+from app.models.metric import MetricDefinition, MetricType
+from app.schemas.metric import MetricDefinitionRead, MetricSamplingUpdate
 
 router = APIRouter()
 
@@ -14,3 +16,20 @@ def delete_metric(id: int, session: Session = Depends(get_session)):
     session.delete(metric)
     session.commit()
     return None
+
+@router.put("/{id}/sampling", response_model=MetricDefinitionRead)
+def update_metric_sampling(id: int, update: MetricSamplingUpdate, session: Session = Depends(get_session)):
+    metric = session.get(MetricDefinition, id)
+    if not metric:
+        raise HTTPException(status_code=404, detail="Metric not found")
+    if metric.metric_type != MetricType.LLM_JUDGE and update.judge_max_samples > 1:
+        raise HTTPException(status_code=400, detail="Only LLM_JUDGE metrics can be sampled")
+    if update.judge_max_samples > settings.JUDGE_MAX_SAMPLES_LIMIT:
+        raise HTTPException(status_code=400, detail=f"judge_max_samples must be at most {settings.JUDGE_MAX_SAMPLES_LIMIT}")
+
+    metric.judge_max_samples = update.judge_max_samples
+    metric.judge_variance_threshold = update.judge_variance_threshold
+    session.add(metric)
+    session.commit()
+    session.refresh(metric)
+    return metric
@@ -10,6 +10,7 @@ from app.models.user import User
 from app.models.project_membership import ProjectMembership
 from app.schemas.project import ProjectRead, ProjectCreate, TestCaseRead, TestCaseCreate
 from app.schemas.report import ReportRequest, ReportResponse
+from app.schemas.evaluation import BatchEvaluationRequest, BatchEvaluationJobRead
 
 router = APIRouter()
 
@@ -131,6 +132,32 @@ def generate_project_report_endpoint(id: int, request: ReportRequest, session: S
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/{id}/evaluate/batch", response_model=BatchEvaluationJobRead, status_code=202)
+def start_batch_evaluation(
+    id: int,
+    request: BatchEvaluationRequest,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(deps.get_current_user)
+):
+    project = session.get(Project, id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items to evaluate")
+
+    # Runs in the background; poll GET /{id}/evaluate/batch/{job_id} for progress
+    from app.services.batch import start_batch_job
+    job = start_batch_job(session.get_bind(), id, request.items, model_name=current_user.preferred_model, multi_sample=request.multi_sample, use_batch_api=request.use_batch_api)
+    return job.to_read()
+
+@router.get("/{id}/evaluate/batch/{job_id}", response_model=BatchEvaluationJobRead)
+def read_batch_evaluation(id: int, job_id: str, session: Session = Depends(get_session)):
+    from app.services.batch import get_batch_job
+    job = get_batch_job(session, job_id)
+    if not job or job.project_id != id:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
 @router.delete("/{id}", status_code=204)
 def delete_project(id: int, session: Session = Depends(get_session)):
     project = session.get(Project, id)
@@ -141,6 +168,8 @@ def delete_project(id: int, session: Session = Depends(get_session)):
     # For now, let's assume cascade or manually delete related items if needed.
     # SQLModel relationships usually need explicit cascade config or DB level cascade.
     # Given sqlite default foreign keys might be ON, let's try deletion.
+    from app.services.telemetry import delete_llm_calls_outside_runs
+    delete_llm_calls_outside_runs(session, project_id=id)
     session.delete(project)
     session.commit()
     return None
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlmodel import Session
 from app.core.db import get_session
 from app.models.evaluation import EvaluationRun
-from app.schemas.evaluation import EvaluationRunRead
+from app.schemas.evaluation import EvaluationRunRead, EvaluationRunStatusRead
 
 router = APIRouter()
 
@@ -12,3 +12,11 @@ def read_run(id: int, session: Session = Depends(get_session)):
     if not run:
         raise HTTPException(status_code=404, detail="EvaluationRun not found")
     return run
+
+@router.get("/{id}/status", response_model=EvaluationRunStatusRead)
+def read_run_status(id: int, session: Session = Depends(get_session)):
+    # Lightweight polling target for background commits
+    run = session.get(EvaluationRun, id)
+    if not run:
+        raise HTTPException(status_code=404, detail="EvaluationRun not found")
+    return run
@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import List
+from typing import List, Set, Tuple
+import asyncio
 import json
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
@@ -12,6 +13,7 @@ from app.schemas.metric import MetricDesignIterationCreate, MetricDesignIteratio
 from app.schemas.evaluation import EvaluationRunPreviewRequest, EvaluationRunPreviewResponse, EvaluationRunCommitRequest, EvaluationRunRead
 from app.schemas.report import ReportRequest, ReportResponse
 from app.services.llm import generate_metric_proposals
+from app.services.profile import TestCaseProfile
 from app.api import deps
 from app.models import User
 
@@ -33,6 +35,9 @@ def create_example(id: int, example: ExampleCreate, session: Session = Depends(g
     session.add(db_example)
     session.commit()
     session.refresh(db_example)
+
+    from app.services.profile import invalidate_test_case_profile
+    invalidate_test_case_profile(id)
     return db_example
 
 @router.post("/{id}/metric-design", response_model=MetricDesignIterationRead)
@@ -48,7 +53,9 @@ def start_metric_design(id: int, design: MetricDesignIterationCreate, session: S
         raise HTTPException(status_code=409, detail="Metrics already confirmed for this test case")
     
     # Call LLM Stub
-    llm_response = generate_metric_proposals(design.user_intent, test_case, model_name=current_user.preferred_model)
+    from app.services.telemetry import record_llm_calls
+    with record_llm_calls(session.get_bind(), test_case.project_id, id):
+        llm_response = generate_metric_proposals(design.user_intent, test_case, model_name=current_user.preferred_model)
 
     # Persist user_intent on TestCase if not already set or if updated
     if test_case.user_intent != design.user_intent:
@@ -116,68 +123,105 @@ def confirm_metric_design(id: int, iteration_id: int, session: Session = Depends
     
     return created_metrics
 
-@router.post("/{id}/evaluate/preview", response_model=EvaluationRunPreviewResponse)
-def preview_evaluation(id: int, request: EvaluationRunPreviewRequest, session: Session = Depends(get_session), current_user: User = Depends(deps.get_current_user)):
+# The evaluation routes are async so judge calls can be awaited. Their database work is
+# synchronous (and can wait up to SQLITE_BUSY_TIMEOUT_MS on a lock), so it runs in a thread
+# through these helpers instead of blocking the event loop.
+
+def _load_evaluation_inputs(session: Session, id: int) -> Tuple[TestCase, List[MetricDefinition], TestCaseProfile]:
     test_case = session.get(TestCase, id)
     if not test_case:
         raise HTTPException(status_code=404, detail="TestCase not found")
-        
+
     metrics = session.exec(select(MetricDefinition).where(MetricDefinition.test_case_id == id, MetricDefinition.is_active == True)).all()
     if not metrics:
         raise HTTPException(status_code=409, detail="No active metrics for this test case")
-        
-    from app.services.evaluation import evaluate_test_case
-    return evaluate_test_case(test_case, metrics, request.outputs, model_name=current_user.preferred_model)
+    # Loads the examples here rather than lazily from the judge context on the event loop
+    from app.services.profile import get_test_case_profile
+    return test_case, metrics, get_test_case_profile(test_case)
+
+# Detached telemetry writes of interrupted streams; referenced until they finish
+_telemetry_tasks: Set[asyncio.Task] = set()
+
+def _with_results(run):
+    # Load what EvaluationRunRead serializes while still off the event loop
+    run.metric_results, run.sample_results
+    return run
+
+@router.post("/{id}/evaluate/preview", response_model=EvaluationRunPreviewResponse)
+async def preview_evaluation(id: int, request: EvaluationRunPreviewRequest, session: Session = Depends(get_session), current_user: User = Depends(deps.get_current_user)):
+    test_case, metrics, profile = await asyncio.to_thread(_load_evaluation_inputs, session, id)
+
+    from app.services.evaluation import evaluate_test_case_async
+    from app.services.preview_store import preview_store
+    from app.services.telemetry import store_llm_calls
+    calls = []
+    try:
+        eval_response = await evaluate_test_case_async(test_case, metrics, request.outputs, model_name=current_user.preferred_model, multi_sample=request.multi_sample, calls=calls)
+    finally:
+        # Stored before the handle is handed out, so a commit links these rows instead of copying them
+        await asyncio.to_thread(store_llm_calls, session.get_bind(), calls, test_case.project_id, id)
+    preview_store.put(id, metrics, profile, request.outputs, request.multi_sample, current_user.preferred_model, eval_response)
+    return eval_response
+
+@router.post("/{id}/evaluate/preview/stream")
+async def stream_preview_evaluation(id: int, request: EvaluationRunPreviewRequest, session: Session = Depends(get_session), current_user: User = Depends(deps.get_current_user)):
+    """
+    Server-Sent Events version of /evaluate/preview: `metric` events as each
+    result is ready, then `aggregate`, `gap_analysis`, and finally `result`
+    carrying the same EvaluationRunPreviewResponse as the plain endpoint.
+    """
+    # Also builds the profile: the stream outlives the request session, and a cached profile never loads the examples
+    test_case, metrics, profile = await asyncio.to_thread(_load_evaluation_inputs, session, id)
+
+    from app.services.evaluation import stream_test_case_evaluation
+    from app.services.preview_store import preview_store
+    from app.services.telemetry import store_llm_calls
+    model_name = current_user.preferred_model
+    bind, project_id = session.get_bind(), test_case.project_id
+    calls = []
+
+    async def events():
+        try:
+            async for event, payload in stream_test_case_evaluation(test_case, metrics, request.outputs, model_name=model_name, multi_sample=request.multi_sample, calls=calls):
+                if event == "result":
+                    await asyncio.to_thread(store_llm_calls, bind, calls, project_id, id)
+                    preview_store.put(id, metrics, profile, request.outputs, request.multi_sample, model_name, payload)
+                    payload = payload.model_dump(mode="json")
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            if any(call.telemetry_id is None for call in calls):
+                # Failed or the client went away: this task may be cancelled, so store from a
+                # task of its own. It runs after the cancelled judge calls have recorded themselves.
+                task = asyncio.get_running_loop().create_task(asyncio.to_thread(store_llm_calls, bind, calls, project_id, id))
+                _telemetry_tasks.add(task)
+                task.add_done_callback(_telemetry_tasks.discard)
+
+    # X-Accel-Buffering stops nginx-style proxies from holding events back
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.post("/{id}/evaluate/commit", response_model=EvaluationRunRead)
-def commit_evaluation(id: int, request: EvaluationRunCommitRequest, session: Session = Depends(get_session), current_user: User = Depends(deps.get_current_user)):
-    test_case = session.get(TestCase, id)
-    if not test_case:
-        raise HTTPException(status_code=404, detail="TestCase not found")
-        
-    metrics = session.exec(select(MetricDefinition).where(MetricDefinition.test_case_id == id, MetricDefinition.is_active == True)).all()
-    if not metrics:
-        raise HTTPException(status_code=409, detail="No active metrics for this test case")
+async def commit_evaluation(id: int, request: EvaluationRunCommitRequest, session: Session = Depends(get_session), current_user: User = Depends(deps.get_current_user)):
+    test_case, metrics, profile = await asyncio.to_thread(_load_evaluation_inputs, session, id)
 
-    # Run evaluation
-    from app.services.evaluation import evaluate_test_case
-    eval_response = evaluate_test_case(test_case, metrics, request.outputs, model_name=current_user.preferred_model)
-    
-    # Get next version number
-    from app.models.evaluation import EvaluationRun, MetricResult
-    last_run = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == id).order_by(EvaluationRun.version_number.desc())).first()
-    version_number = (last_run.version_number + 1) if last_run else 1
+    # Reuse the previewed results when the handle is still valid, otherwise run evaluation
+    from app.services.evaluation import evaluate_test_case_async, save_evaluation_run
+    from app.services.preview_store import preview_store
+    eval_response = None
+    if request.preview_id:
+        eval_response = preview_store.take(request.preview_id, id, metrics, profile, request.outputs, request.multi_sample, current_user.preferred_model)
+    if eval_response is None and request.background is not False:
+        # Reserve the version now and let the background executor fill it in
+        from app.services.evaluation import create_pending_run
+        from app.services.background import submit_run_evaluation
+        run = await asyncio.to_thread(lambda: _with_results(create_pending_run(session, id, notes=request.notes)))
+        submit_run_evaluation(session.get_bind(), run.id, [m.id for m in metrics], request.outputs, model_name=current_user.preferred_model, multi_sample=request.multi_sample)
+        return run
+    if eval_response is None:
+        eval_response = await evaluate_test_case_async(test_case, metrics, request.outputs, model_name=current_user.preferred_model, multi_sample=request.multi_sample)
     
-    # Create Run
-    run = EvaluationRun(
-        test_case_id=id,
-        version_number=version_number,
-        status="completed",
-        aggregated_score=eval_response.aggregated_score,
-        gap_analysis=eval_response.gap_analysis,
-        notes=request.notes
-    )
-    session.add(run)
-    session.commit()
-    session.refresh(run)
-    
-    # Create Results
-    for res in eval_response.metric_results:
-        metric_result = MetricResult(
-            evaluation_run_id=run.id,
-            metric_definition_id=res["metric_definition_id"],
-            score=res["score"],
-            reasoning=res["explanation"], # Mapping explanation to reasoning
-            metric_name=res["metric_name"],
-            explanation=res["explanation"],
-            raw_json=res["raw_json"]
-        )
-        session.add(metric_result)
-    
-    session.commit()
-    session.refresh(run)
-    
-    return run
+    return await asyncio.to_thread(lambda: _with_results(save_evaluation_run(session, id, eval_response, notes=request.notes)))
 
 @router.get("/{id}/runs", response_model=List[EvaluationRunRead])
 def read_testcase_runs(id: int, session: Session = Depends(get_session)):
@@ -186,7 +230,7 @@ def read_testcase_runs(id: int, session: Session = Depends(get_session)):
     if not test_case:
          raise HTTPException(status_code=404, detail="TestCase not found")
          
-    runs = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == id).order_by(EvaluationRun.version_number.desc())).all()
+    runs = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == id).where(EvaluationRun.status == "completed").order_by(EvaluationRun.version_number.desc())).all()
     return runs
 
 @router.post("/{id}/report", response_model=None)
@@ -228,7 +272,7 @@ def get_testcase_dashboard(id: int, session: Session = Depends(get_session)):
     if not test_case:
         raise HTTPException(status_code=404, detail="TestCase not found")
         
-    runs = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == id).order_by(EvaluationRun.version_number.asc())).all()
+    runs = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == id).where(EvaluationRun.status == "completed").order_by(EvaluationRun.version_number.asc())).all()
     
     aggregated_score_points = [
         {"version_number": r.version_number, "score": r.aggregated_score, "created_at": r.created_at} 
@@ -277,6 +321,8 @@ def delete_testcase(id: int, session: Session = Depends(get_session)):
     test_case = session.get(TestCase, id)
     if not test_case:
         raise HTTPException(status_code=404, detail="TestCase not found")
+    from app.services.telemetry import delete_llm_calls_outside_runs
+    delete_llm_calls_outside_runs(session, test_case_id=id)
     session.delete(test_case)
     session.commit()
     return None
@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Dict, Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import SecretStr, field_validator
 
@@ -9,12 +9,78 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./test.db"
     
     # LLM Settings
-    LLM_MODE: Literal["stub", "openai"] = "stub"
+    LLM_MODE: Literal["stub", "openai", "record", "replay"] = "stub"
     OPENAI_API_KEY: SecretStr | None = None
     OPENAI_MODEL: str = "gpt-5"
+    OPENAI_BASE_URL: Optional[str] = None # e.g. a local fake: python -m app.providers.fake_openai
+    
+    # OpenAI HTTP client (shared by every provider in the process)
+    LLM_HTTP_TIMEOUT_SECONDS: float = 120.0
+    LLM_HTTP_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    LLM_MAX_RETRIES: int = 2 # SDK-level retries, only used when the scheduler is disabled
+    
+    # LLM call scheduler (per-model budgets, adaptive concurrency, retries)
+    LLM_SCHEDULER_ENABLED: bool = True
+    LLM_RPM_LIMIT: int = 0 # Requests per minute per model, 0 = unlimited
+    LLM_TPM_LIMIT: int = 0 # Estimated tokens per minute per model, 0 = unlimited
+    LLM_MODEL_LIMITS: Dict[str, Dict[str, int]] = {} # e.g. {"gpt-4o-mini": {"rpm": 5000, "tpm": 2000000, "max_concurrency": 64}}
+    LLM_INITIAL_CONCURRENCY: int = 8
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_LATENCY_TARGET_SECONDS: float = 30.0 # Slower calls shrink the concurrency limit
+    LLM_SCHEDULER_MAX_ATTEMPTS: int = 5
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = 30.0
+    
+    # Batch API (offline judging)
+    LLM_BATCH_POLL_SECONDS: float = 30.0
+    LLM_BATCH_TIMEOUT_SECONDS: float = 24 * 3600
+    
+    # LLM response cache (content-addressed, SQLite-backed)
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_PATH: str = "./llm_cache.db"
+    LLM_CACHE_MAX_ENTRIES: int = 50000
+    LLM_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+
+    # Record/replay (LLM_MODE=record appends OpenAI interactions, LLM_MODE=replay serves them offline)
+    LLM_RECORDING_PATH: str = "./llm_recordings.jsonl"
+    LLM_REPLAY_LATENCY_SCALE: float = 1.0 # Multiplies recorded latencies; 0 replays instantly
+    LLM_REPLAY_ON_MISS: Literal["any", "stub", "error"] = "any"
+    
+    # Evaluation Settings
+    EVAL_JUDGE_CONCURRENCY: int = 8 # Max LLM_JUDGE calls in flight per evaluation
+    EVAL_MULTI_METRIC_JUDGE: bool = False # Judge all LLM_JUDGE metrics of an output in one call
+    JUDGE_SAMPLE_WAVE_SIZE: int = 2 # Judge samples drawn in parallel per wave for metrics with judge_max_samples > 1
+    JUDGE_MAX_SAMPLES_LIMIT: int = 10 # Upper bound accepted for a metric's judge_max_samples
+    JUDGE_VARIANCE_THRESHOLD: float = 25.0 # Stop sampling once the score variance is at or below this (per-metric override)
+    EVAL_PRESCREEN_ENABLED: bool = False # Local checks that can skip LLM judging of an obviously broken output
+    PRESCREEN_MIN_LENGTH_RATIO: float = 0.25 # Shorter than this share of the shortest desired example: truncated
+    PRESCREEN_MAX_LENGTH_RATIO: float = 4.0 # Longer than this multiple of the longest desired example: runaway
+    PRESCREEN_COPY_SIMILARITY: float = 0.95 # Similarity to a "current" example that counts as a copy of it
+    PRESCREEN_MIN_SIMILARITY: float = 0.05 # Below this similarity to every desired example: unrelated or wrong language
+    RULE_TIME_BUDGET_MS: int = 100 # Per-rule budget for user/LLM-written regexes
+    PREVIEW_TTL_SECONDS: int = 600 # How long a preview can be committed without re-running it
+    BACKGROUND_EVAL_WORKERS: int = 4 # Background commit evaluations running at once
+    BATCH_EVAL_WORKERS: int = 8 # Test cases evaluated concurrently by a batch job
+    BATCH_COMMIT_SIZE: int = 50 # Runs written per transaction by a batch job
+    TELEMETRY_DEFAULT_WINDOW_DAYS: int = 7 # Rollup window when the request has no `since`
+    TELEMETRY_MAX_CALLS: int = 100000 # Most recent calls a rollup reads; older ones in the window are skipped
     
     # Custom SQLite path
     SQLITE_PATH: str | None = None
+
+    # Database engine profile
+    DB_ECHO: bool = False # Log every SQL statement (debugging only)
+    DB_POOL_SIZE: int = 10 # Connections kept open (file databases)
+    DB_MAX_OVERFLOW: int = 20 # Extra connections allowed under load
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0 # Wait for a free connection before failing
+    SQLITE_JOURNAL_MODE: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"] = "WAL" # WAL lets readers run during a commit; needs a local (not network) filesystem
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL" # NORMAL is durable across app crashes in WAL mode
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000 # Wait for a competing writer instead of failing with "database is locked"
+    SQLITE_CACHE_SIZE_KB: int = 65536 # Page cache per connection
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024 # Memory-mapped reads; 0 disables
     
     # GCS Bootstrap
     GCS_DB_BUCKET: str | None = None
@@ -32,8 +98,8 @@ class Settings(BaseSettings):
         return v
     
     def model_post_init(self, __context):
-        if self.LLM_MODE == "openai" and not self.OPENAI_API_KEY:
-             raise ValueError("OPENAI_API_KEY must be set when LLM_MODE is 'openai'")
+        if self.LLM_MODE in ("openai", "record") and not self.OPENAI_API_KEY:
+             raise ValueError(f"OPENAI_API_KEY must be set when LLM_MODE is '{self.LLM_MODE}'")
         
         # Override DATABASE_URL if SQLITE_PATH is provided
         if self.SQLITE_PATH:
@@ -1,21 +1,94 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from typing import Any, Dict, Optional
 from app.core.config import settings
 
+import logging
 import os
 
+logger = logging.getLogger("uvicorn")
+
 # Create DB directory if it doesn't exist (for Cloud Run mounted volumes)
 if settings.SQLITE_PATH:
     db_dir = os.path.dirname(settings.SQLITE_PATH)
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir, exist_ok=True)
 
-connect_args = {"check_same_thread": False}
-engine = create_engine(settings.DATABASE_URL, echo=True, connect_args=connect_args)
+SYNCHRONOUS_LEVELS = ["OFF", "NORMAL", "FULL", "EXTRA"] # PRAGMA synchronous reports the index
+
+def _is_file_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+def apply_sqlite_pragmas(dbapi_connection: Any, connection_record: Any = None) -> None:
+    """Runs on every new connection: these pragmas are per connection (journal_mode persists in the file)."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_BYTES)}")
+    finally:
+        cursor.close()
+
+def create_db_engine(url: str) -> Engine:
+    """
+    Engine with the profile from settings. File-backed SQLite gets the
+    connect-time pragmas and a sized connection pool; in-memory databases keep
+    SQLAlchemy's default single-connection pool.
+    """
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO}
+    is_sqlite = make_url(url).get_backend_name() == "sqlite"
+    if is_sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+    if not is_sqlite or _is_file_sqlite(url):
+        options.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW, pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS)
+    new_engine = create_engine(url, **options)
+    if _is_file_sqlite(url):
+        event.listen(new_engine, "connect", apply_sqlite_pragmas)
+    return new_engine
+
+engine = create_db_engine(settings.DATABASE_URL)
+
+def engine_profile(db_engine: Optional[Engine] = None) -> Dict[str, Any]:
+    """Effective settings, read back from a live connection rather than echoed from config."""
+    db_engine = db_engine or engine
+    profile: Dict[str, Any] = {
+        "url": db_engine.url.render_as_string(hide_password=True),
+        "echo": db_engine.echo,
+        "pool": type(db_engine.pool).__name__,
+    }
+    if isinstance(db_engine.pool, QueuePool):
+        profile.update(pool_size=db_engine.pool.size(), max_overflow=db_engine.pool._max_overflow)
+    if db_engine.url.get_backend_name() == "sqlite":
+        with db_engine.connect() as connection:
+            def read(pragma: str) -> Any:
+                return connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+            synchronous = read("synchronous")
+            profile.update(
+                journal_mode=read("journal_mode"),
+                synchronous=SYNCHRONOUS_LEVELS[synchronous] if 0 <= synchronous < len(SYNCHRONOUS_LEVELS) else synchronous,
+                busy_timeout_ms=read("busy_timeout"),
+                cache_size=read("cache_size"),
+                mmap_size=read("mmap_size"),
+            )
+    return profile
+
+def log_engine_profile() -> None:
+    profile = engine_profile()
+    logger.info("Database engine: " + ", ".join(f"{key}={value}" for key, value in profile.items()))
+    # SQLite silently keeps the old mode when WAL is unavailable, e.g. on a network filesystem
+    if settings.SQLITE_JOURNAL_MODE == "WAL" and profile.get("journal_mode") not in (None, "wal", "memory"):
+        logger.warning(f"SQLite journal_mode is {profile['journal_mode']}, not WAL: writers will block dashboard readers")
 
 def init_db():
-    # Import models here to ensure they are registered with SQLModel
-    from app.models import project, test_case, metric, evaluation
-    SQLModel.metadata.create_all(engine)
+    # Versioned migrations; a no-op beyond one query when the schema is current
+    from app.core.migrations import run_migrations
+    run_migrations(engine)
 
 def get_session():
     with Session(engine) as session:
@@ -0,0 +1,333 @@
+"""
+Versioned schema migrations, applied at startup by init_db (FastAPI lifespan).
+
+Applied versions are recorded in the `schema_version` table. When the latest
+version is already recorded, startup costs one CREATE TABLE IF NOT EXISTS and
+one SELECT: no table reflection, unlike running create_all on every boot.
+Each pending migration runs in its own transaction together with its version
+row, under a database lock, so instances starting together apply it once.
+
+Databases created before versioning (create_all plus the ad-hoc
+scripts/migrate_*.py) are in an unknown state, so migrations check before they
+add anything. Add new migrations at the end of MIGRATIONS with the next
+version number, and never edit one that has shipped: migration 1 is a frozen
+copy of the tables, not the live models. Index and column changes must also be
+declared on the models, so that fresh databases and migrated databases end up
+with the same schema (tests/test_migrations.py compares them).
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Set
+
+from sqlalchemy import Boolean, Column, DateTime, Enum, Float, ForeignKey, Index, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger("uvicorn")
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+def _quote(connection: Connection, name: str) -> str:
+    # "user" is a reserved word outside SQLite
+    return connection.dialect.identifier_preparer.quote(name)
+
+def table_columns(connection: Connection, table: str) -> Set[str]:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+def add_column(connection: Connection, table: str, column: str, ddl: str) -> None:
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    if column not in table_columns(connection, table):
+        connection.exec_driver_sql(f"ALTER TABLE {_quote(connection, table)} ADD COLUMN {column} {ddl}")
+
+def create_index(connection: Connection, name: str, table: str, columns: List[str], unique: bool = False) -> None:
+    connection.exec_driver_sql(f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS {name} ON {_quote(connection, table)} ({", ".join(columns)})')
+
+def _v1_tables() -> MetaData:
+    """The tables as of the first versioned release. Frozen: later changes belong in new migrations."""
+    metadata = MetaData()
+    Table("user", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("email", String, nullable=False),
+        Column("full_name", String),
+        Column("hashed_password", String, nullable=False),
+        Column("preferred_model", String),
+        Column("profile_picture_url", String),
+        Index("ix_user_email", "email", unique=True))
+    Table("project", metadata,
+        Column("name", String, nullable=False),
+        Column("description", String),
+        Column("id", Integer, primary_key=True),
+        Column("created_at", DateTime, nullable=False),
+        Column("owner_id", Integer, ForeignKey("user.id")),
+        Index("ix_project_name", "name"))
+    Table("projectmembership", metadata,
+        Column("project_id", Integer, ForeignKey("project.id"), primary_key=True),
+        Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+        Column("role", String, nullable=False))
+    Table("report", metadata,
+        Column("scope_type", Enum("TEST_CASE", "PROJECT", name="reportscope"), nullable=False),
+        Column("scope_id", Integer, nullable=False),
+        Column("start_date", DateTime, nullable=False),
+        Column("end_date", DateTime, nullable=False),
+        Column("content_json", String, nullable=False),
+        Column("summary_text", String, nullable=False),
+        Column("id", Integer, primary_key=True),
+        Column("created_at", DateTime, nullable=False))
+    Table("testcase", metadata,
+        Column("name", String, nullable=False),
+        Column("description", String),
+        Column("user_intent", String),
+        Column("id", Integer, primary_key=True),
+        Column("project_id", Integer, ForeignKey("project.id"), nullable=False),
+        Column("created_at", DateTime, nullable=False))
+    Table("example", metadata,
+        Column("content", String, nullable=False),
+        Column("type", Enum("DESIRED", "CURRENT", name="exampletype"), nullable=False),
+        Column("id", Integer, primary_key=True),
+        Column("test_case_id", Integer, ForeignKey("testcase.id"), nullable=False),
+        Column("created_at", DateTime, nullable=False))
+    Table("metricdefinition", metadata,
+        Column("name", String, nullable=False),
+        Column("description", String, nullable=False),
+        Column("metric_type", Enum("LLM_JUDGE", "DETERMINISTIC", name="metrictype"), nullable=False),
+        Column("scale_type", Enum("BOUNDED", "UNBOUNDED", "BOOLEAN", name="scaletype"), nullable=False),
+        Column("scale_min", Float),
+        Column("scale_max", Float),
+        Column("target_direction", Enum("HIGHER_IS_BETTER", "LOWER_IS_BETTER", "NEUTRAL", name="targetdirection"), nullable=False),
+        Column("evaluation_prompt", String),
+        Column("rule_definition", String),
+        Column("id", Integer, primary_key=True),
+        Column("test_case_id", Integer, ForeignKey("testcase.id"), nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("is_active", Boolean, nullable=False),
+        Column("judge_max_samples", Integer, nullable=False),
+        Column("judge_variance_threshold", Float))
+    Table("metricdesigniteration", metadata,
+        Column("user_intent", String, nullable=False),
+        Column("feedback", String),
+        Column("llm_proposed_metrics", String),
+        Column("gap_analysis", String),
+        Column("id", Integer, primary_key=True),
+        Column("test_case_id", Integer, ForeignKey("testcase.id"), nullable=False),
+        Column("iteration_number", Integer, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("confirmed_at", DateTime))
+    Table("evaluationrun", metadata,
+        Column("status", String, nullable=False),
+        Column("id", Integer, primary_key=True),
+        Column("test_case_id", Integer, ForeignKey("testcase.id"), nullable=False),
+        Column("version_number", Integer, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("aggregated_score", Float),
+        Column("notes", String),
+        Column("gap_analysis", String),
+        Column("error_message", String))
+    for name, extra in (("metricresult", []), ("metricsampleresult", [Column("sample_index", Integer, nullable=False)])):
+        Table(name, metadata,
+            Column("score", Float, nullable=False),
+            Column("reasoning", String),
+            Column("metric_name", String, nullable=False),
+            Column("explanation", String),
+            Column("raw_json", String),
+            Column("id", Integer, primary_key=True),
+            Column("evaluation_run_id", Integer, ForeignKey("evaluationrun.id"), nullable=False),
+            Column("metric_definition_id", Integer, ForeignKey("metricdefinition.id"), nullable=False),
+            *extra)
+    Table("llmcalltelemetry", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("created_at", DateTime, nullable=False),
+        Column("project_id", Integer, ForeignKey("project.id")),
+        Column("test_case_id", Integer, ForeignKey("testcase.id"), nullable=False),
+        Column("evaluation_run_id", Integer, ForeignKey("evaluationrun.id"), nullable=False),
+        Column("metric_result_id", Integer, ForeignKey("metricresult.id")),
+        Column("metric_definition_id", Integer),
+        Column("sample_index", Integer),
+        Column("method", String, nullable=False),
+        Column("model", String, nullable=False),
+        Column("latency_ms", Float, nullable=False),
+        Column("input_tokens", Integer),
+        Column("output_tokens", Integer),
+        Column("cached_input_tokens", Integer),
+        Column("retries", Integer, nullable=False),
+        Column("cache_hit", Boolean, nullable=False),
+        Column("success", Boolean, nullable=False),
+        Column("error", String))
+    return metadata
+
+def _create_tables(connection: Connection) -> None:
+    # Creates only the missing tables: the baseline for empty and pre-versioning databases
+    _v1_tables().create_all(connection)
+
+def _add_columns(connection: Connection) -> None:
+    # Columns added to existing tables since the first schema (incl. scripts/migrate_prod_full.py)
+    add_column(connection, "project", "owner_id", f"INTEGER REFERENCES {_quote(connection, 'user')}(id)")
+    add_column(connection, "user", "preferred_model", "VARCHAR DEFAULT 'gpt-5'")
+    add_column(connection, "user", "profile_picture_url", "VARCHAR")
+    add_column(connection, "evaluationrun", "error_message", "VARCHAR")
+    add_column(connection, "metricdefinition", "judge_max_samples", "INTEGER NOT NULL DEFAULT 1")
+    add_column(connection, "metricdefinition", "judge_variance_threshold", "FLOAT")
+    add_column(connection, "llmcalltelemetry", "cached_input_tokens", "INTEGER")
+
+def _add_hot_path_indexes(connection: Connection) -> None:
+    # Foreign keys read by dashboards, reports and cascades; names match the model declarations
+    create_index(connection, "ix_testcase_project_id", "testcase", ["project_id"])
+    create_index(connection, "ix_example_test_case_id", "example", ["test_case_id"])
+    create_index(connection, "ix_metricdefinition_test_case_id", "metricdefinition", ["test_case_id"])
+    create_index(connection, "ix_metricdesigniteration_test_case_id", "metricdesigniteration", ["test_case_id"])
+    create_index(connection, "ix_evaluationrun_test_case_status_version", "evaluationrun", ["test_case_id", "status", "version_number"])
+    create_index(connection, "ix_evaluationrun_test_case_created_at", "evaluationrun", ["test_case_id", "created_at"])
+    create_index(connection, "ix_metricresult_run_metric", "metricresult", ["evaluation_run_id", "metric_definition_id"])
+    create_index(connection, "ix_metricsampleresult_run_metric_sample", "metricsampleresult", ["evaluation_run_id", "metric_definition_id", "sample_index"])
+    create_index(connection, "ix_llmcalltelemetry_evaluation_run_id", "llmcalltelemetry", ["evaluation_run_id"])
+    create_index(connection, "ix_llmcalltelemetry_created_at", "llmcalltelemetry", ["created_at"])
+    # Fresh statistics so the planner picks the new indexes right away
+    connection.exec_driver_sql("ANALYZE")
+
+def _add_version_counter(connection: Connection) -> None:
+    # Run versions come from a per-test-case counter; the unique index backs it up
+    add_column(connection, "testcase", "last_version_number", "INTEGER NOT NULL DEFAULT 0")
+    connection.exec_driver_sql(
+        "UPDATE testcase SET last_version_number = "
+        "(SELECT COALESCE(MAX(version_number), 0) FROM evaluationrun WHERE evaluationrun.test_case_id = testcase.id)"
+    )
+    duplicates = connection.exec_driver_sql(
+        "SELECT test_case_id, version_number FROM evaluationrun GROUP BY test_case_id, version_number HAVING COUNT(*) > 1"
+    ).all()
+    if duplicates:
+        # Left by the old read-then-insert allocation; renumbering would break existing report ranges
+        # Migration 7 creates the index, or stops startup until the duplicates are resolved
+        logger.warning(f"Duplicate run versions {duplicates[:10]}: skipping ux_evaluationrun_test_case_version")
+        return
+    create_index(connection, "ux_evaluationrun_test_case_version", "evaluationrun", ["test_case_id", "version_number"], unique=True)
+
+def _create_batch_jobs(connection: Connection) -> None:
+    # Batch evaluation progress, so job ids survive a restart
+    metadata = MetaData()
+    Table("batchevaluationjob", metadata,
+        Column("id", String, primary_key=True),
+        Column("project_id", Integer, nullable=False),
+        Column("status", String, nullable=False),
+        Column("total", Integer, nullable=False),
+        Column("completed", Integer, nullable=False),
+        Column("failed", Integer, nullable=False),
+        Column("run_ids_json", String, nullable=False),
+        Column("errors_json", String, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("finished_at", DateTime),
+        Index("ix_batchevaluationjob_project_id", "project_id"))
+    metadata.create_all(connection)
+
+def _add_telemetry_rollup_indexes(connection: Connection) -> None:
+    # The llm/telemetry filters, each with the time window they are read in
+    create_index(connection, "ix_llmcalltelemetry_project_created_at", "llmcalltelemetry", ["project_id", "created_at"])
+    create_index(connection, "ix_llmcalltelemetry_model_created_at", "llmcalltelemetry", ["model", "created_at"])
+    create_index(connection, "ix_llmcalltelemetry_metric_created_at", "llmcalltelemetry", ["metric_definition_id", "created_at"])
+    connection.exec_driver_sql("ANALYZE llmcalltelemetry")
+
+def _require_unique_run_versions(connection: Connection) -> None:
+    # Migration 4 skipped the unique index over duplicate versions and is never retried.
+    # Failing here keeps this migration pending, so it checks again on every startup.
+    duplicates = connection.exec_driver_sql(
+        "SELECT test_case_id, version_number, COUNT(*) FROM evaluationrun GROUP BY test_case_id, version_number HAVING COUNT(*) > 1"
+    ).all()
+    if duplicates:
+        raise RuntimeError(
+            f"evaluationrun has {len(duplicates)} duplicated (test_case_id, version_number) pairs, e.g. "
+            f"{[tuple(row) for row in duplicates[:10]]} as (test_case_id, version_number, count). "
+            "Delete or renumber the extra runs (and raise testcase.last_version_number to match), "
+            "then restart to create ux_evaluationrun_test_case_version."
+        )
+    create_index(connection, "ux_evaluationrun_test_case_version", "evaluationrun", ["test_case_id", "version_number"], unique=True)
+
+def _nullable_telemetry_links(connection: Connection) -> None:
+    # Calls outside a run (previews, metric design, reports) are recorded without one
+    if connection.dialect.name != "sqlite":
+        for column in ("test_case_id", "evaluation_run_id"):
+            connection.exec_driver_sql(f"ALTER TABLE llmcalltelemetry ALTER COLUMN {column} DROP NOT NULL")
+        return
+    # SQLite can't drop NOT NULL in place: rebuild the table, then its indexes
+    columns = (
+        "id", "created_at", "project_id", "test_case_id", "evaluation_run_id", "metric_result_id", "metric_definition_id",
+        "sample_index", "method", "model", "latency_ms", "input_tokens", "output_tokens", "cached_input_tokens",
+        "retries", "cache_hit", "success", "error"
+    )
+    connection.exec_driver_sql(
+        "CREATE TABLE llmcalltelemetry_rebuild ("
+        "id INTEGER NOT NULL PRIMARY KEY, created_at DATETIME NOT NULL, "
+        "project_id INTEGER REFERENCES project (id), test_case_id INTEGER REFERENCES testcase (id), "
+        "evaluation_run_id INTEGER REFERENCES evaluationrun (id), metric_result_id INTEGER REFERENCES metricresult (id), "
+        "metric_definition_id INTEGER, sample_index INTEGER, method VARCHAR NOT NULL, model VARCHAR NOT NULL, "
+        "latency_ms FLOAT NOT NULL, input_tokens INTEGER, output_tokens INTEGER, cached_input_tokens INTEGER, "
+        "retries INTEGER NOT NULL, cache_hit BOOLEAN NOT NULL, success BOOLEAN NOT NULL, error VARCHAR)"
+    )
+    connection.exec_driver_sql(
+        f"INSERT INTO llmcalltelemetry_rebuild ({', '.join(columns)}) SELECT {', '.join(columns)} FROM llmcalltelemetry"
+    )
+    connection.exec_driver_sql("DROP TABLE llmcalltelemetry")
+    connection.exec_driver_sql("ALTER TABLE llmcalltelemetry_rebuild RENAME TO llmcalltelemetry")
+    create_index(connection, "ix_llmcalltelemetry_evaluation_run_id", "llmcalltelemetry", ["evaluation_run_id"])
+    create_index(connection, "ix_llmcalltelemetry_created_at", "llmcalltelemetry", ["created_at"])
+    create_index(connection, "ix_llmcalltelemetry_project_created_at", "llmcalltelemetry", ["project_id", "created_at"])
+    create_index(connection, "ix_llmcalltelemetry_model_created_at", "llmcalltelemetry", ["model", "created_at"])
+    create_index(connection, "ix_llmcalltelemetry_metric_created_at", "llmcalltelemetry", ["metric_definition_id", "created_at"])
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create missing tables", _create_tables),
+    Migration(2, "add columns introduced after the initial schema", _add_columns),
+    Migration(3, "hot-path indexes", _add_hot_path_indexes),
+    Migration(4, "per-test-case run version counter", _add_version_counter),
+    Migration(5, "batch evaluation jobs", _create_batch_jobs),
+    Migration(6, "telemetry rollup indexes", _add_telemetry_rollup_indexes),
+    Migration(7, "unique run versions", _require_unique_run_versions),
+    Migration(8, "telemetry for calls outside runs", _nullable_telemetry_links),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+MIGRATION_LOCK_ID = 7_214_001 # pg_advisory_xact_lock key
+
+def current_version(connection: Connection) -> int:
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    )
+    return connection.exec_driver_sql("SELECT MAX(version) FROM schema_version").scalar() or 0
+
+def _lock(connection: Connection) -> None:
+    """Serializes migrators until the transaction ends; the caller re-reads the version afterwards."""
+    if connection.dialect.name == "sqlite":
+        # Takes the write lock up front; later instances wait out busy_timeout instead of racing.
+        # pysqlite would otherwise not open a transaction around DDL at all.
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SELECT pg_advisory_xact_lock({MIGRATION_LOCK_ID})")
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Applies the pending migrations in order and returns their versions."""
+    with engine.begin() as connection:
+        if current_version(connection) >= LATEST_VERSION:
+            return []
+
+    applied = []
+    with engine.connect() as connection:
+        for migration in MIGRATIONS:
+            with connection.begin():
+                _lock(connection)
+                # Another instance may have applied it while we waited for the lock
+                if migration.version <= current_version(connection):
+                    continue
+                migration.upgrade(connection)
+                connection.execute(
+                    text("INSERT INTO schema_version (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                    {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+                )
+            logger.info(f"Applied schema migration {migration.version}: {migration.name}")
+            applied.append(migration.version)
+    return applied
+
+if __name__ == "__main__":
+    from app.core.db import engine
+    print(f"Applied: {run_migrations(engine) or 'nothing, schema is current'} (latest version {LATEST_VERSION})")
@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from app.core.db import engine, init_db
+from app.core.db import engine, init_db, log_engine_profile
 from app.api.main import api_router
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.bootstrap import bootstrap_database
@@ -11,10 +11,23 @@ async def lifespan(app: FastAPI):
     # Bootstrap DB from GCS if needed
     bootstrap_database(settings)
     
-    # Check/Init DB (create tables if missing)
+    # Apply pending schema migrations
     init_db()
+    log_engine_profile()
+
+    # Background evaluations and batch jobs in flight when the last process stopped won't resume
+    from app.services.background import fail_interrupted_runs
+    from app.services.batch import fail_interrupted_jobs
+    fail_interrupted_runs(engine)
+    fail_interrupted_jobs(engine)
     yield
 
+    # Release the shared LLM connection pools
+    from app.providers.llm import close_llm_providers
+    await close_llm_providers()
+    from app.providers.cache import flush_llm_cache
+    flush_llm_cache()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
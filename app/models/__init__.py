@@ -2,6 +2,7 @@ from .user import User
 from .project import Project
 from .test_case import TestCase
 from .metric import MetricDefinition, MetricDesignIteration
-from .evaluation import EvaluationRun, MetricResult
+from .evaluation import EvaluationRun, LLMCallTelemetry, MetricResult, MetricSampleResult
 from .project_membership import ProjectMembership
 from .report import Report
+from .batch import BatchEvaluationJob
@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+class BatchEvaluationJob(SQLModel, table=True):
+    # Progress of a batch evaluation, written with each chunk of committed runs
+    id: str = Field(primary_key=True) # uuid4 hex, returned as job_id
+    project_id: int = Field(index=True)
+    status: str = Field(default="pending") # pending -> running -> completed / failed
+    total: int
+    completed: int = 0
+    failed: int = 0
+    run_ids_json: str = "[]"
+    errors_json: str = "[]"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
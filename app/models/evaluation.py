@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, Relationship
 # from app.models.test_case import TestCase
 # from app.models.metric import MetricDefinition
@@ -8,6 +9,12 @@ class EvaluationRunBase(SQLModel):
     status: str = Field(default="pending")
 
 class EvaluationRun(EvaluationRunBase, table=True):
+    # Dashboards list a test case's completed runs by version; reports select them by date range
+    __table_args__ = (
+        Index("ix_evaluationrun_test_case_status_version", "test_case_id", "status", "version_number"),
+        Index("ix_evaluationrun_test_case_created_at", "test_case_id", "created_at"),
+        Index("ux_evaluationrun_test_case_version", "test_case_id", "version_number", unique=True),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     test_case_id: int = Field(foreign_key="testcase.id")
     version_number: int
@@ -15,9 +22,12 @@ class EvaluationRun(EvaluationRunBase, table=True):
     aggregated_score: Optional[float] = None
     notes: Optional[str] = None
     gap_analysis: Optional[str] = None
+    error_message: Optional[str] = None # Set when a background evaluation fails
     
     test_case: "TestCase" = Relationship(back_populates="runs")
     metric_results: List["MetricResult"] = Relationship(back_populates="evaluation_run", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    sample_results: List["MetricSampleResult"] = Relationship(back_populates="evaluation_run", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    llm_calls: List["LLMCallTelemetry"] = Relationship(back_populates="evaluation_run", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
 class MetricResultBase(SQLModel):
     score: float
@@ -27,9 +37,52 @@ class MetricResultBase(SQLModel):
     raw_json: Optional[str] = None
 
 class MetricResult(MetricResultBase, table=True):
+    __table_args__ = (Index("ix_metricresult_run_metric", "evaluation_run_id", "metric_definition_id"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     evaluation_run_id: int = Field(foreign_key="evaluationrun.id")
     metric_definition_id: int = Field(foreign_key="metricdefinition.id")
     
     evaluation_run: EvaluationRun = Relationship(back_populates="metric_results")
     metric_definition: "MetricDefinition" = Relationship()
+
+class MetricSampleResult(MetricResultBase, table=True):
+    # Per-output score for multi-sample runs. MetricResult keeps the per-metric mean
+    # so dashboards and reports keep reading a single row per metric.
+    __table_args__ = (Index("ix_metricsampleresult_run_metric_sample", "evaluation_run_id", "metric_definition_id", "sample_index"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    evaluation_run_id: int = Field(foreign_key="evaluationrun.id")
+    metric_definition_id: int = Field(foreign_key="metricdefinition.id")
+    sample_index: int
+
+    evaluation_run: EvaluationRun = Relationship(back_populates="sample_results")
+
+class LLMCallTelemetry(SQLModel, table=True):
+    # One row per provider call: judges and gap analysis of runs, plus calls made outside
+    # a run (previews, metric design, report narratives) with evaluation_run_id None.
+    # project_id and model are denormalized so rollups don't need joins.
+    # Rollups filter by one of them and read a recent window, hence (filter, created_at).
+    __table_args__ = (
+        Index("ix_llmcalltelemetry_project_created_at", "project_id", "created_at"),
+        Index("ix_llmcalltelemetry_model_created_at", "model", "created_at"),
+        Index("ix_llmcalltelemetry_metric_created_at", "metric_definition_id", "created_at"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    project_id: Optional[int] = Field(default=None, foreign_key="project.id")
+    test_case_id: Optional[int] = Field(default=None, foreign_key="testcase.id")
+    evaluation_run_id: Optional[int] = Field(default=None, foreign_key="evaluationrun.id", index=True) # Set on commit for a reused preview
+    metric_result_id: Optional[int] = Field(default=None, foreign_key="metricresult.id") # None for gap analysis
+    metric_definition_id: Optional[int] = None
+    sample_index: Optional[int] = None
+    method: str # Provider method, e.g. "judge_metric"
+    model: str
+    latency_ms: float
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_input_tokens: Optional[int] = None # Prompt tokens billed at the provider's cached rate
+    retries: int = 0
+    cache_hit: bool = False
+    success: bool = True
+    error: Optional[str] = None
+
+    evaluation_run: Optional[EvaluationRun] = Relationship(back_populates="llm_calls")
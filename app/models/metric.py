@@ -31,9 +31,13 @@ class MetricDefinitionBase(SQLModel):
 
 class MetricDefinition(MetricDefinitionBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    test_case_id: int = Field(foreign_key="testcase.id")
+    test_case_id: int = Field(foreign_key="testcase.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = Field(default=True)
+    # LLM_JUDGE self-consistency: up to judge_max_samples judge calls, stopping early once
+    # the score variance drops to judge_variance_threshold (None: settings.JUDGE_VARIANCE_THRESHOLD)
+    judge_max_samples: int = Field(default=1)
+    judge_variance_threshold: Optional[float] = None
     
     test_case: "TestCase" = Relationship(back_populates="metrics") 
 
@@ -45,7 +49,7 @@ class MetricDesignIterationBase(SQLModel):
 
 class MetricDesignIteration(MetricDesignIterationBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    test_case_id: int = Field(foreign_key="testcase.id")
+    test_case_id: int = Field(foreign_key="testcase.id", index=True)
     iteration_number: int
     created_at: datetime = Field(default_factory=datetime.utcnow)
     confirmed_at: Optional[datetime] = None
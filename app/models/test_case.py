@@ -16,8 +16,10 @@ class TestCaseBase(SQLModel):
     
 class TestCase(TestCaseBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    project_id: int = Field(foreign_key="project.id")
+    project_id: int = Field(foreign_key="project.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Highest EvaluationRun.version_number handed out; incremented in the run's own transaction
+    last_version_number: int = Field(default=0)
     
     project: Project = Relationship(back_populates="test_cases")
     examples: List["Example"] = Relationship(back_populates="test_case", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
@@ -30,7 +32,7 @@ class ExampleBase(SQLModel):
 
 class Example(ExampleBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    test_case_id: int = Field(foreign_key="testcase.id")
+    test_case_id: int = Field(foreign_key="testcase.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     test_case: TestCase = Relationship(back_populates="examples")
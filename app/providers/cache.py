@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.models.metric import MetricDefinition
+from app.models.test_case import TestCase
+from app.providers.llm import PROMPT_VERSION, AsyncLLMProvider, LLMProvider
+from app.providers.telemetry import note_cache_hit
+from app.schemas.llm_validation import JudgeResult
+from app.schemas.metric import StructuredLLMResponse
+from app.core.config import settings
+
+def make_cache_key(method: str, model: str, payload: Any) -> str:
+    """
+    Content-addressed key: sha256 over the prompt version, the method, the model and
+    the canonical JSON of every input that ends up in the prompt.
+    """
+    canonical = json.dumps([PROMPT_VERSION, method, model, payload], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def metric_fingerprint(metric: MetricDefinition) -> Dict[str, Any]:
+    # Only the definition matters, not the row identity
+    return {
+        "name": metric.name,
+        "description": metric.description,
+        "metric_type": metric.metric_type,
+        "scale_type": metric.scale_type,
+        "scale_min": metric.scale_min,
+        "scale_max": metric.scale_max,
+        "target_direction": metric.target_direction,
+        "evaluation_prompt": metric.evaluation_prompt,
+        "rule_definition": metric.rule_definition,
+    }
+
+def judge_payload(metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> Dict[str, Any]:
+    payload = {"metric": metric_fingerprint(metric), "candidate": candidate_text, "context": test_case_context}
+    if sample:
+        # Repeated draws must not collapse onto one cached answer; sample 0 keeps the pre-sampling key
+        payload["sample"] = sample
+    return payload
+
+def multi_judge_payload(metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[str, Any]:
+    # Metric ids are part of the answer, so they belong in the key
+    return {"metrics": [[m.id, metric_fingerprint(m)] for m in metrics], "candidate": candidate_text, "context": test_case_context}
+
+def dump_judgements(judged: Dict[int, JudgeResult]) -> str:
+    return json.dumps({str(metric_id): result.model_dump() for metric_id, result in judged.items()})
+
+def load_judgements(value: str) -> Dict[int, JudgeResult]:
+    return {int(metric_id): JudgeResult(**result) for metric_id, result in json.loads(value).items()}
+
+def proposals_payload(intent: str, test_case: TestCase) -> Dict[str, Any]:
+    return {
+        "intent": intent,
+        "name": test_case.name,
+        "description": test_case.description,
+        "examples": [[e.type, e.content] for e in test_case.examples],
+    }
+
+def narrative_payload(context_data: Any) -> Any:
+    if hasattr(context_data, "model_dump"):
+        return context_data.model_dump(mode="json")
+    return context_data
+
+def analysis_payload(test_case: TestCase, metric_results: List[Any]) -> Dict[str, Any]:
+    # Mirrors what OpenAILLMProvider.analyze_evaluation_results puts in the prompt
+    return {
+        "name": test_case.name,
+        "results": [[r.get("metric_name"), r.get("score"), r.get("explanation")] for r in metric_results],
+    }
+
+class LLMResponseCache:
+    """
+    SQLite-backed store for provider responses.
+
+    Entries older than `ttl_seconds` are treated as misses and deleted. When the
+    table grows past `max_entries`, the least recently used entries are evicted.
+    Hit/miss counters are kept per process; per-entry hit counts are persisted.
+    Hits only update memory: their `last_used_at`/`hits` are written in batches,
+    with the next write, eviction or close, so warm reads never wait on a commit.
+    """
+    EVICTION_INTERVAL = 100 # writes between size checks
+    TOUCH_FLUSH_SIZE = 500 # pending hit updates before they are written
+
+    def __init__(self, path: str, max_entries: int = 50000, ttl_seconds: int = 30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._touched: Dict[str, Tuple[float, int]] = {} # key -> (last used at, hits since flush)
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                method TEXT NOT NULL,
+                model TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used_at ON llm_cache (last_used_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._touched.pop(key, None)
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self._touched[key] = (now, self._touched.get(key, (now, 0))[1] + 1)
+            if len(self._touched) >= self.TOUCH_FLUSH_SIZE:
+                self._flush_touched()
+                self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, method: str, model: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, method, model, value, created_at, last_used_at, hits) VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, method, model, value, now, now)
+            )
+            self._touched.pop(key, None)
+            self._writes += 1
+            if self._writes % self.EVICTION_INTERVAL == 0:
+                self._evict(now)
+            self._flush_touched()
+            self._conn.commit()
+
+    def flush(self) -> None:
+        """Write pending hit updates."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(time.time())
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE llm_cache SET last_used_at = ?, hits = hits + ? WHERE key = ?",
+            [(last_used_at, hits, key) for key, (last_used_at, hits) in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def _evict(self, now: float) -> None:
+        # Recency must be current before picking the least recently used entries
+        self._flush_touched()
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key NOT IN (SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+class CachedLLMProvider(LLMProvider):
+    """
+    Wraps any LLMProvider and serves byte-identical requests from the cache.
+    Failed calls are never cached.
+    """
+    def __init__(self, inner: LLMProvider, cache: LLMResponseCache):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.cache = cache
+        self.model = getattr(inner, "model", type(inner).__name__)
+
+    def _cached(self, method: str, payload: Any, call: Callable[[], Any], dump: Callable[[Any], str], load: Callable[[str], Any]) -> Any:
+        key = make_cache_key(method, self.model, payload)
+        hit = self.cache.get(key)
+        if hit is not None:
+            note_cache_hit()
+            return load(hit)
+        value = call()
+        self.cache.set(key, method, self.model, dump(value))
+        return value
+
+    def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        return self._cached(
+            "generate_metric_proposals", proposals_payload(intent, test_case),
+            lambda: self.inner.generate_metric_proposals(intent, test_case),
+            lambda v: v.model_dump_json(), StructuredLLMResponse.model_validate_json
+        )
+
+    def generate_report_narrative(self, context_data: Any) -> str:
+        return self._cached(
+            "generate_report_narrative", narrative_payload(context_data),
+            lambda: self.inner.generate_report_narrative(context_data),
+            str, str
+        )
+
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        return self._cached(
+            "judge_metric", judge_payload(metric, candidate_text, test_case_context, sample),
+            lambda: self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample),
+            lambda v: v.model_dump_json(), JudgeResult.model_validate_json
+        )
+
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        return self._cached(
+            "judge_metrics", multi_judge_payload(metrics, candidate_text, test_case_context),
+            lambda: self.inner.judge_metrics(metrics, candidate_text, test_case_context),
+            dump_judgements, load_judgements
+        )
+
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return self._cached(
+            "analyze_evaluation_results", analysis_payload(test_case, metric_results),
+            lambda: self.inner.analyze_evaluation_results(test_case, metric_results),
+            str, str
+        )
+
+class AsyncCachedLLMProvider(AsyncLLMProvider):
+    """
+    Async twin of CachedLLMProvider over the same cache, so preview/commit and
+    the sync paths share entries. SQLite lookups run in a worker thread to keep
+    the event loop free.
+    """
+    def __init__(self, inner: AsyncLLMProvider, cache: LLMResponseCache):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.cache = cache
+        self.model = getattr(inner, "model", type(inner).__name__.replace("Async", "", 1))
+
+    async def _cached(self, method: str, payload: Any, call: Callable[[], Awaitable[Any]], dump: Callable[[Any], str], load: Callable[[str], Any]) -> Any:
+        key = make_cache_key(method, self.model, payload)
+        hit = await asyncio.to_thread(self.cache.get, key)
+        if hit is not None:
+            note_cache_hit()
+            return load(hit)
+        value = await call()
+        await asyncio.to_thread(self.cache.set, key, method, self.model, dump(value))
+        return value
+
+    async def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        return await self._cached(
+            "generate_metric_proposals", proposals_payload(intent, test_case),
+            lambda: self.inner.generate_metric_proposals(intent, test_case),
+            lambda v: v.model_dump_json(), StructuredLLMResponse.model_validate_json
+        )
+
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        return await self._cached(
+            "generate_report_narrative", narrative_payload(context_data),
+            lambda: self.inner.generate_report_narrative(context_data),
+            str, str
+        )
+
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        return await self._cached(
+            "judge_metric", judge_payload(metric, candidate_text, test_case_context, sample),
+            lambda: self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample),
+            lambda v: v.model_dump_json(), JudgeResult.model_validate_json
+        )
+
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        return await self._cached(
+            "judge_metrics", multi_judge_payload(metrics, candidate_text, test_case_context),
+            lambda: self.inner.judge_metrics(metrics, candidate_text, test_case_context),
+            dump_judgements, load_judgements
+        )
+
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return await self._cached(
+            "analyze_evaluation_results", analysis_payload(test_case, metric_results),
+            lambda: self.inner.analyze_evaluation_results(test_case, metric_results),
+            str, str
+        )
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide cache instance, created on first use from settings."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                settings.LLM_CACHE_PATH,
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+            )
+        return _cache
+
+def flush_llm_cache() -> None:
+    """Called from the FastAPI lifespan on shutdown, so batched hit updates are not lost."""
+    with _cache_lock:
+        cache = _cache
+    if cache is not None:
+        cache.flush()
@@ -0,0 +1,327 @@
+"""
+Local OpenAI-compatible HTTP server for exercising the real client stack.
+
+Unlike StubLLMProvider, requests go through the OpenAI SDK, httpx, the
+connection pool and the scheduler, so timeouts, retries, pooling and
+concurrency can be tuned without the network. It serves the two endpoints the
+providers use, POST /v1/responses (responses.parse) and POST
+/v1/chat/completions, with:
+
+- latency drawn from a fixed, uniform or lognormal distribution, plus an
+  optional per-output-token cost
+- injected 429 and 500 answers, and 429s above a concurrency limit
+- token accounting (~4 characters per token), including prompt-cache hits
+  for repeated system prompts of 1024+ tokens, in the same usage fields as
+  the real API
+
+Structured answers follow the requested JSON schema. Judge answers score like
+StubLLMProvider (candidate length % 100) and metric design returns the stub
+proposals. Counters are at GET /stats.
+
+Point the app at it with OPENAI_BASE_URL, or run it in-process from tests and
+scripts with FakeOpenAIServer:
+
+    python -m app.providers.fake_openai --port 8081 --latency-ms 800 --latency-distribution lognormal --latency-spread 0.5
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.providers.llm import StubLLMProvider
+
+CACHE_MIN_TOKENS = 1024 # Smallest prefix the API caches, in 128-token increments above it
+CACHE_INCREMENT = 128
+
+@dataclass
+class FakeOpenAIConfig:
+    latency_ms: float = 0.0 # Fixed/uniform: mean; lognormal: median
+    latency_distribution: str = "fixed" # fixed | uniform | lognormal
+    latency_spread: float = 0.0 # Uniform: +/- ms; lognormal: sigma
+    ms_per_output_token: float = 0.0
+    rate_limit_rate: float = 0.0 # Share of requests answered 429
+    server_error_rate: float = 0.0 # Share of requests answered 500
+    max_concurrency: int = 0 # Requests beyond this many in flight are answered 429; 0 = unlimited
+    retry_after_seconds: Optional[float] = 1.0
+    seed: Optional[int] = None
+
+    def sample_latency_ms(self, rng: random.Random) -> float:
+        if self.latency_distribution == "uniform":
+            return max(0.0, rng.uniform(self.latency_ms - self.latency_spread, self.latency_ms + self.latency_spread))
+        if self.latency_distribution == "lognormal" and self.latency_ms > 0:
+            return rng.lognormvariate(0.0, self.latency_spread) * self.latency_ms
+        return self.latency_ms
+
+@dataclass
+class FakeOpenAIStats:
+    requests: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "statuses": dict(self.statuses),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+def _messages(body: Dict[str, Any]) -> List[Dict[str, str]]:
+    raw = body.get("input", body.get("messages", []))
+    if isinstance(raw, str):
+        return [{"role": "user", "content": raw}]
+    return [{"role": m.get("role", "user"), "content": _text(m.get("content"))} for m in raw]
+
+def _fake_value(schema: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """Smallest instance that satisfies a (strict mode) JSON schema."""
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return _fake_value(options[0], defs)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {name: _fake_value(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fake_value(schema.get("items", {}), defs)]
+    if kind == "string":
+        return "fake"
+    if kind in ("number", "integer"):
+        value = schema.get("minimum", 1)
+        return int(value) if kind == "integer" else float(value)
+    if kind == "boolean":
+        return True
+    return None
+
+def _judgement(candidate_text: str) -> Dict[str, Any]:
+    return {"score": float(len(candidate_text) % 100), "explanation": f"Fake judged based on length ({len(candidate_text)} chars)."}
+
+def structured_answer(schema: Dict[str, Any], messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    prompt = "\n".join(m["content"] for m in messages)
+    properties = set(schema.get("properties", {}))
+    match = re.search(r"Evaluate this Text:\n---\n(.*)\n---", prompt, re.DOTALL)
+    candidate_text = match.group(1) if match else ""
+    if properties == {"score", "explanation"}:
+        return _judgement(candidate_text)
+    if properties == {"results"} and "Metric ID:" in prompt:
+        ids = [int(i) for i in re.findall(r"Metric ID: (\d+)", prompt)]
+        return {"results": [{"metric_id": i, **_judgement(candidate_text)} for i in ids]}
+    if "proposed_metrics" in properties:
+        # Metric design: the stub proposals, which pass the cross-field validators a bare schema can't express
+        return StubLLMProvider().generate_metric_proposals("", None).model_dump(mode="json")
+    return _fake_value(schema, schema.get("$defs", {}))
+
+def create_fake_openai_app(config: Optional[FakeOpenAIConfig] = None) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    app.state.config = config or FakeOpenAIConfig()
+    app.state.stats = FakeOpenAIStats()
+    rng = random.Random(app.state.config.seed)
+    seen_prefixes: set = set()
+    counter = {"n": 0}
+
+    def error(status: int, message: str, kind: str) -> JSONResponse:
+        headers = {}
+        if status == 429 and app.state.config.retry_after_seconds is not None:
+            headers["retry-after"] = str(app.state.config.retry_after_seconds)
+        return JSONResponse({"error": {"message": message, "type": kind, "code": None}}, status_code=status, headers=headers)
+
+    def usage(model: str, messages: List[Dict[str, str]], output: str) -> Tuple[int, int, int]:
+        input_tokens = count_tokens("".join(m["content"] for m in messages))
+        cached = 0
+        if messages and messages[0]["role"] in ("system", "developer"):
+            prefix_tokens = count_tokens(messages[0]["content"])
+            digest = hashlib.sha256(f"{model}\0{messages[0]['content']}".encode("utf-8")).hexdigest()
+            if prefix_tokens >= CACHE_MIN_TOKENS and digest in seen_prefixes:
+                cached = prefix_tokens // CACHE_INCREMENT * CACHE_INCREMENT
+            seen_prefixes.add(digest)
+        output_tokens = count_tokens(output)
+        stats = app.state.stats
+        stats.input_tokens += input_tokens
+        stats.cached_input_tokens += cached
+        stats.output_tokens += output_tokens
+        return input_tokens, cached, output_tokens
+
+    async def handle(request: Request, answer) -> JSONResponse:
+        # A malformed body is the caller's bug, not simulated traffic: answer
+        # like the real API and leave the stats alone
+        try:
+            body = await request.json()
+        except ValueError as e:
+            return error(400, f"We could not parse the JSON body of your request: {e}", "invalid_request_error")
+        if not isinstance(body, dict):
+            return error(400, "The request body must be a JSON object", "invalid_request_error")
+
+        # Runs on one event loop, so the counters need no lock
+        config, stats = app.state.config, app.state.stats
+        stats.requests += 1
+        counter["n"] += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            if config.max_concurrency and stats.in_flight > config.max_concurrency:
+                response = error(429, "Too many concurrent requests", "rate_limit_exceeded")
+            elif rng.random() < config.rate_limit_rate:
+                response = error(429, "Rate limit reached (injected)", "rate_limit_exceeded")
+            elif rng.random() < config.server_error_rate:
+                await asyncio.sleep(config.sample_latency_ms(rng) / 1000)
+                response = error(500, "The server had an error (injected)", "server_error")
+            else:
+                messages = _messages(body)
+                text = answer(body, messages)
+                input_tokens, cached, output_tokens = usage(body.get("model", ""), messages, text)
+                await asyncio.sleep((config.sample_latency_ms(rng) + output_tokens * config.ms_per_output_token) / 1000)
+                response = JSONResponse(render(request.url.path, counter["n"], body.get("model", ""), text, input_tokens, cached, output_tokens))
+        finally:
+            stats.in_flight -= 1
+        stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+        return response
+
+    def render(path: str, n: int, model: str, text: str, input_tokens: int, cached: int, output_tokens: int) -> Dict[str, Any]:
+        if path.endswith("/responses"):
+            return {
+                "id": f"resp_fake_{n}", "object": "response", "created_at": int(time.time()), "model": model,
+                "status": "completed", "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+                "output": [{
+                    "id": f"msg_fake_{n}", "type": "message", "status": "completed", "role": "assistant",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}]
+                }],
+                "usage": {
+                    "input_tokens": input_tokens, "input_tokens_details": {"cached_tokens": cached},
+                    "output_tokens": output_tokens, "output_tokens_details": {"reasoning_tokens": 0},
+                    "total_tokens": input_tokens + output_tokens
+                },
+            }
+        return {
+            "id": f"chatcmpl_fake_{n}", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": input_tokens, "prompt_tokens_details": {"cached_tokens": cached},
+                "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens
+            },
+        }
+
+    def responses_answer(body: Dict[str, Any], messages: List[Dict[str, str]]) -> str:
+        text_format = (body.get("text") or {}).get("format") or {}
+        if text_format.get("type") == "json_schema":
+            return json.dumps(structured_answer(text_format.get("schema", {}), messages))
+        return "Fake response."
+
+    def chat_answer(body: Dict[str, Any], messages: List[Dict[str, str]]) -> str:
+        return f"Fake completion for a {len(messages)}-message prompt."
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        return await handle(request, responses_answer)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        return await handle(request, chat_answer)
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats.snapshot()
+
+    return app
+
+class FakeOpenAIServer:
+    """Runs the fake server on a free local port in a background thread."""
+    def __init__(self, config: Optional[FakeOpenAIConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+        self.app = create_fake_openai_app(config)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning", lifespan="off"))
+        self.host = host
+        self.port = port
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def config(self) -> FakeOpenAIConfig:
+        return self.app.state.config
+
+    @property
+    def stats(self) -> FakeOpenAIStats:
+        return self.app.state.stats
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.server.run, name="fake-openai", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Fake OpenAI server did not start")
+            time.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--latency-spread", type=float, default=0.0)
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FakeOpenAIConfig(
+        latency_ms=args.latency_ms, latency_distribution=args.latency_distribution, latency_spread=args.latency_spread,
+        ms_per_output_token=args.ms_per_output_token, rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate, max_concurrency=args.max_concurrency, seed=args.seed
+    )
+    print(f"Fake OpenAI at http://{args.host}:{args.port}/v1 (set OPENAI_BASE_URL to this)")
+    uvicorn.run(create_fake_openai_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,190 @@
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple, Union
+import asyncio
+import io
 import json
+import re
+import threading
+import time
+import weakref
 
 from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection, MetricDesignIteration
 from app.models.test_case import TestCase
 from app.schemas.metric import MetricDefinitionCreate, StructuredLLMResponse
-from app.schemas.llm_validation import JudgeResult
+from app.schemas.llm_validation import JudgeResult, MultiJudgeResult
 from app.core.config import settings
+from app.providers.telemetry import llm_call, note_usage
+
+# Judge prompts are laid out for provider-side prompt caching, which reuses the
+# longest previously seen prefix: static instructions first, then the test case
+# context (shared by every metric and output of an evaluation), then the output,
+# and the per-metric text last. Judging N metrics then pays for the context once.
+#
+# Bump PROMPT_VERSION whenever a prompt below changes wording or layout: it is
+# part of every response cache key, so answers to the old prompts stop being served.
+PROMPT_VERSION = 2
+
+JUDGE_SYSTEM_PROMPT = """You are an AI Judge evaluating an LLM response.
+You are given the test case context, the text to evaluate and the metric to judge it on.
+
+Constraint:
+Output must be in JSON format with 'score' (float) and 'explanation' (short English text).
+"""
+
+MULTI_JUDGE_SYSTEM_PROMPT = """You are an AI Judge evaluating an LLM response against several metrics.
+You are given the test case context, the text to evaluate and the metrics to judge it on.
+Judge each metric independently, as if it were the only one.
+
+Constraint:
+Output must be in JSON format with 'results': one entry per metric, each with 'metric_id' (int), 'score' (float) and 'explanation' (short English text).
+"""
+
+def _judge_input(system_prompt: str, candidate_text: str, test_case_context: str, metric_text: str) -> List[dict]:
+    return [
+        {"role": "system", "content": f"{system_prompt}\nContext:\n{test_case_context}"},
+        {"role": "user", "content": f"Evaluate this Text:\n---\n{candidate_text}\n---\n\n{metric_text}"}
+    ]
+
+def _metric_block(metric: MetricDefinition) -> str:
+    return f"""Metric Name: {metric.name}
+Metric Description: {metric.description}
+Evaluation Prompt: {metric.evaluation_prompt}"""
+
+def build_judge_messages(metric: MetricDefinition, candidate_text: str, test_case_context: str) -> List[dict]:
+    """Judge prompt, shared by the interactive and the Batch API paths."""
+    return _judge_input(JUDGE_SYSTEM_PROMPT, candidate_text, test_case_context, _metric_block(metric))
+
+def build_multi_judge_messages(metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> List[dict]:
+    """One judge prompt for several metrics, so the context is sent once."""
+    metric_blocks = "\n\n".join(f"Metric ID: {metric.id}\n{_metric_block(metric)}" for metric in metrics)
+    return _judge_input(MULTI_JUDGE_SYSTEM_PROMPT, candidate_text, test_case_context, f"Metrics:\n{metric_blocks}")
+
+def validate_multi_judge(metrics: List[MetricDefinition], parsed: MultiJudgeResult) -> Dict[int, JudgeResult]:
+    """
+    Keeps only results for the requested metric ids (first one wins on
+    duplicates). Missing metrics are simply absent; callers judge those one by one.
+    """
+    requested = {metric.id for metric in metrics}
+    judged: Dict[int, JudgeResult] = {}
+    for item in parsed.results:
+        if item.metric_id in requested and item.metric_id not in judged:
+            judged[item.metric_id] = JudgeResult(score=item.score, explanation=item.explanation)
+    return judged
+
+def build_analysis_messages(test_case: TestCase, metric_results: List[Any]) -> List[dict]:
+    """Gap-analysis prompt, shared by the interactive and the Batch API paths."""
+    system_prompt = """You are a QA Analyst suitable for analyzing the results of a specific test case evaluation.
+Review the scores and explanations for each metric. Identify the main performance gap or success.
+Provide a short, 1-2 sentence "Gap Analysis" summarizing the model's current performance state on this test case.
+"""
+    # simplified serialization
+    results_summary = [{"name": r.get('metric_name'), "score": r.get('score'), "explanation": r.get('explanation')} for r in metric_results]
+    
+    user_content = f"Test Case: {test_case.name}\nResults: {json.dumps(results_summary, indent=2)}"
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+def build_metric_design_messages(user_intent: str, test_case: TestCase) -> List[dict]:
+    """Metric-design prompt, shared by the sync and async providers."""
+    system_prompt = """You are an expert in evaluating qualitative AI outputs.
+
+Your task is to design evaluation metrics for a test case.
+The goal is to transform subjective quality requirements into clear, measurable metrics
+that can be tracked consistently over time.
+
+You must follow these rules strictly:
+1. Think step by step before producing the final output.
+2. Propose metrics that are stable, comparable across versions, and non-overlapping.
+3. Prefer fewer, high-signal metrics over many weak ones.
+4. Each metric must measure a single, clearly defined quality dimension.
+5. Metrics must be suitable for longitudinal evaluation.
+
+Metric rules:
+- Use LLM_JUDGE for ANY check involving meaning, semantics, tone, creativity, or complex reasoning.
+- Use DETERMINISTIC ONLY for simple, objective rule-based checks:
+  - Exact substring presence/absence.
+  - Regex pattern matching.
+  - Numeric constraints (word count, character count, sentence length).
+- If a metric requires understanding the *context* or *intent* of a word (e.g., "uses action verbs", "references specific assets"), it MUST be LLM_JUDGE.
+- Strongly prefer BOUNDED metrics with a 0–100 scale unless there is a compelling reason not to.
+- Use UNBOUNDED metrics only for raw counts (e.g., violations, words).
+- Every LLM_JUDGE metric must include a clear evaluation_prompt.
+- Every DETERMINISTIC metric must include a clear rule_definition, written as a JSON object string:
+  - {"type": "regex", "pattern": "<python regex>", "flags": "i", "max": 0}
+  - {"type": "substrings", "values": ["term", ...], "case_sensitive": false, "max": 0}
+  - {"type": "word_count" | "char_count" | "sentence_count", "min": <number>, "max": <number>}
+  "min"/"max" are optional bounds on the match count or length.
+
+Output rules:
+- Return a strict JSON object matching the provided schema.
+- Do not include explanations outside the JSON."""
+
+    desired_examples = [e.content for e in test_case.examples if e.type == "desired"]
+    current_examples = [e.content for e in test_case.examples if e.type == "current"]
+    
+    user_content = f"""User Intent: {user_intent}
+Test Case: {test_case.name}
+Description: {test_case.description}
+
+Desired Output Examples (Target):
+{json.dumps(desired_examples, indent=2)}
+
+Current Output Examples (Baseline - flawed):
+{json.dumps(current_examples, indent=2)}
+
+Analyze the gap between Desired and Current examples given the User Intent.
+Design metrics that specifically measure this gap."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+def build_narrative_messages(context_data: Any) -> List[dict]:
+    """Report-narrative prompt, shared by the sync and async providers."""
+    # context_data is now expected to be a dict with 'test_case_name', 'history': [{version, score, gap_analysis}]
+    
+    system_prompt = """You are a lead Data Analyst. 
+Your goal is to write a cohesive 'Story of Progress' for an executive report.
+
+Input: A chronological list of evaluation versions, each with a score and a detailed gap analysis.
+Task: Synthesize these inputs into a single, flowing narrative that analyzes the **overall trajectory** from the first version to the last.
+- IGNORE intermediate version details unless they represent a critical turning point.
+- Focus strictly on comparing the STARTING STATE vs the ENDING STATE.
+- What specific flaws were present initially?
+- How were they resolved (or not) by the final version?
+
+Style Guidelines:
+- Write in a professional, reporting tone.
+- Do NOT output a chronological list (e.g., "Version 1... Version 2..."). Focus on the net evolution.
+- Round all scores to 1 decimal place.
+- Do NOT use em-dashes (—). Use normal dashes (-) or colons (:) instead.
+- Use bolding (**) for key terms or metrics for readability.
+- Do NOT include any "[End of Report]" text.
+"""
+
+    if hasattr(context_data, "model_dump_json"):
+         user_content = f"Report Data: {context_data.model_dump_json()}"
+    else:
+         user_content = f"Report Data: {json.dumps(context_data, indent=2)}"
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+class JudgeProvider(Protocol):
+    """
+    What evaluate_test_case needs from a provider: judging and gap analysis.
+    Every LLMProvider qualifies; so does anything that only replays judgements.
+    """
+    supports_sampling: bool
+
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult: ...
+
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]: ...
+
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str: ...
 
 class LLMProvider(ABC):
     @abstractmethod
@@ -17,10 +195,28 @@ class LLMProvider(ABC):
     def generate_report_narrative(self, context_data: Any) -> str:
         pass
 
+    # False for providers that can give only one answer per judgement, like the batch path's
+    # precomputed judgements: self-consistency sampling is skipped. Wrappers copy it from
+    # their inner provider. Replay keeps it: each draw is keyed, and replayed, by its sample number.
+    supports_sampling = True
+
     @abstractmethod
-    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str) -> JudgeResult:
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        """
+        `sample` numbers repeated draws of the same judgement (self-consistency
+        sampling). The prompt is unchanged; caches key on it so each draw is a
+        fresh answer.
+        """
         pass
 
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        """
+        Judges several metrics in one call, keyed by metric id. Metrics missing
+        from the result are judged one by one by the caller. Providers without
+        multi-metric support raise NotImplementedError.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
         pass
@@ -83,7 +279,7 @@ class StubLLMProvider(LLMProvider):
     def generate_report_narrative(self, content: Any) -> str:
         return "Deterministic narrative based on stub data."
         
-    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str) -> JudgeResult:
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
         # Deterministic scoring based on hash of text
         score = float(len(candidate_text) % 100)
         return JudgeResult(
@@ -91,167 +287,556 @@ class StubLLMProvider(LLMProvider):
             explanation=f"Stub judged based on length ({len(candidate_text)} chars)."
         )
 
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        return {metric.id: self.judge_metric(metric, candidate_text, test_case_context) for metric in metrics}
+
     def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
         return f"Stub Gap Analysis for {test_case.name}: Performance is consistent with expectations based on {len(metric_results)} metrics."
 
 class OpenAILLMProvider(LLMProvider):
-    def __init__(self, override_model: Optional[str] = None):
+    def __init__(self, override_model: Optional[str] = None, client: Any = None):
         # Fail fast if key missing
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is required for OpenAILLMProvider")
         try:
              from openai import OpenAI
-             self.client = OpenAI(api_key=settings.OPENAI_API_KEY.get_secret_value())
+             # The registry passes its shared client; standalone instances get their own
+             self.client = client if client is not None else OpenAI(api_key=settings.OPENAI_API_KEY.get_secret_value(), base_url=settings.OPENAI_BASE_URL)
              # Use override if provided, else settings default
              self.model = override_model if override_model else settings.OPENAI_MODEL
         except ImportError:
             raise ImportError("openai package is required for OpenAILLMProvider")
 
     def generate_metric_proposals(self, user_intent: str, test_case: TestCase) -> StructuredLLMResponse:
-        system_prompt = """You are an expert in evaluating qualitative AI outputs.
-
-Your task is to design evaluation metrics for a test case.
-The goal is to transform subjective quality requirements into clear, measurable metrics
-that can be tracked consistently over time.
-
-You must follow these rules strictly:
-1. Think step by step before producing the final output.
-2. Propose metrics that are stable, comparable across versions, and non-overlapping.
-3. Prefer fewer, high-signal metrics over many weak ones.
-4. Each metric must measure a single, clearly defined quality dimension.
-5. Metrics must be suitable for longitudinal evaluation.
-
-Metric rules:
-- Use LLM_JUDGE for ANY check involving meaning, semantics, tone, creativity, or complex reasoning.
-- Use DETERMINISTIC ONLY for simple, objective rule-based checks:
-  - Exact substring presence/absence.
-  - Regex pattern matching.
-  - Numeric constraints (word count, character count, sentence length).
-- If a metric requires understanding the *context* or *intent* of a word (e.g., "uses action verbs", "references specific assets"), it MUST be LLM_JUDGE.
-- Strongly prefer BOUNDED metrics with a 0–100 scale unless there is a compelling reason not to.
-- Use UNBOUNDED metrics only for raw counts (e.g., violations, words).
-- Every LLM_JUDGE metric must include a clear evaluation_prompt.
-- Every DETERMINISTIC metric must include a clear rule_definition (regex or logic).
-
-Output rules:
-- Return a strict JSON object matching the provided schema.
-- Do not include explanations outside the JSON."""
-
-        desired_examples = [e.content for e in test_case.examples if e.type == "desired"]
-        current_examples = [e.content for e in test_case.examples if e.type == "current"]
-        
-        user_content = f"""User Intent: {user_intent}
-Test Case: {test_case.name}
-Description: {test_case.description}
-
-Desired Output Examples (Target):
-{json.dumps(desired_examples, indent=2)}
-
-Current Output Examples (Baseline - flawed):
-{json.dumps(current_examples, indent=2)}
-
-Analyze the gap between Desired and Current examples given the User Intent.
-Design metrics that specifically measure this gap."""
-
         # Use Responses API as requested
         # Note: The user provided snippet uses client.responses.parse
         # input=[{"role": ...}], text_format=Model
         
         response = self.client.responses.parse(
             model=self.model,
-            input=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ],
+            input=build_metric_design_messages(user_intent, test_case),
             text_format=StructuredLLMResponse
         )
         
+        note_usage(getattr(response, "usage", None))
         # event = response.output_parsed
         return response.output_parsed
 
-    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str) -> JudgeResult:
-        system_prompt = f"""You are an AI Judge evaluating an LLM response.
-        
-Metric Name: {metric.name}
-Metric Description: {metric.description}
-Evaluation Prompt: {metric.evaluation_prompt}
-
-Context:
-{test_case_context}
-
-Constraint:
-Output must be in JSON format with 'score' (float) and 'explanation' (short English text).
-"""
-        user_content = f"Evaluate this Text:\n---\n{candidate_text}\n---"
-
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
         response = self.client.responses.parse(
             model=self.model,
-            input=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ],
+            input=build_judge_messages(metric, candidate_text, test_case_context),
             text_format=JudgeResult
         )
+        note_usage(getattr(response, "usage", None))
         return response.output_parsed
 
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        response = self.client.responses.parse(
+            model=self.model,
+            input=build_multi_judge_messages(metrics, candidate_text, test_case_context),
+            text_format=MultiJudgeResult
+        )
+        note_usage(getattr(response, "usage", None))
+        return validate_multi_judge(metrics, response.output_parsed)
+
     def generate_report_narrative(self, context_data: Any) -> str:
-        # context_data is now expected to be a dict with 'test_case_name', 'history': [{version, score, gap_analysis}]
-        
-        system_prompt = """You are a lead Data Analyst. 
-Your goal is to write a cohesive 'Story of Progress' for an executive report.
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=build_narrative_messages(context_data)
+        )
+        note_usage(getattr(completion, "usage", None))
+        return completion.choices[0].message.content.strip()
 
-Input: A chronological list of evaluation versions, each with a score and a detailed gap analysis.
-Task: Synthesize these inputs into a single, flowing narrative that analyzes the **overall trajectory** from the first version to the last.
-- IGNORE intermediate version details unless they represent a critical turning point.
-- Focus strictly on comparing the STARTING STATE vs the ENDING STATE.
-- What specific flaws were present initially?
-- How were they resolved (or not) by the final version?
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=build_analysis_messages(test_case, metric_results)
+        )
+        note_usage(getattr(completion, "usage", None))
+        return completion.choices[0].message.content.strip()
 
-Style Guidelines:
-- Write in a professional, reporting tone.
-- Do NOT output a chronological list (e.g., "Version 1... Version 2..."). Focus on the net evolution.
-- Round all scores to 1 decimal place.
-- Do NOT use em-dashes (—). Use normal dashes (-) or colons (:) instead.
-- Use bolding (**) for key terms or metrics for readability.
-- Do NOT include any "[End of Report]" text.
-"""
+class AsyncLLMProvider(ABC):
+    """
+    Awaitable counterpart of LLMProvider. Lets async routes keep hundreds of
+    LLM calls in flight on the event loop instead of pinning a threadpool
+    thread per call.
+    """
+    @abstractmethod
+    async def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        pass
 
-        if hasattr(context_data, "model_dump_json"):
-             user_content = f"Report Data: {context_data.model_dump_json()}"
-        else:
-             user_content = f"Report Data: {json.dumps(context_data, indent=2)}"
+    @abstractmethod
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        pass
 
-        completion = self.client.chat.completions.create(
+    supports_sampling = True
+
+    @abstractmethod
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        """See LLMProvider.judge_metric."""
+        pass
+
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        """See LLMProvider.judge_metrics."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        pass
+
+class AsyncStubLLMProvider(AsyncLLMProvider):
+    """Same deterministic answers as StubLLMProvider."""
+    def __init__(self):
+        self.stub = StubLLMProvider()
+
+    async def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        return self.stub.generate_metric_proposals(intent, test_case)
+
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        return self.stub.generate_report_narrative(context_data)
+
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        return self.stub.judge_metric(metric, candidate_text, test_case_context, sample=sample)
+
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        return self.stub.judge_metrics(metrics, candidate_text, test_case_context)
+
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return self.stub.analyze_evaluation_results(test_case, metric_results)
+
+class AsyncOpenAILLMProvider(AsyncLLMProvider):
+    def __init__(self, override_model: Optional[str] = None, client: Any = None):
+        # Fail fast if key missing
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY is required for AsyncOpenAILLMProvider")
+        try:
+             from openai import AsyncOpenAI
+             self.client = client if client is not None else AsyncOpenAI(api_key=settings.OPENAI_API_KEY.get_secret_value(), base_url=settings.OPENAI_BASE_URL)
+             self.model = override_model if override_model else settings.OPENAI_MODEL
+        except ImportError:
+            raise ImportError("openai package is required for AsyncOpenAILLMProvider")
+
+    async def generate_metric_proposals(self, user_intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        response = await self.client.responses.parse(
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ]
+            input=build_metric_design_messages(user_intent, test_case),
+            text_format=StructuredLLMResponse
         )
-        return completion.choices[0].message.content.strip()
+        note_usage(getattr(response, "usage", None))
+        return response.output_parsed
 
-    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
-        system_prompt = """You are a QA Analyst suitable for analyzing the results of a specific test case evaluation.
-Review the scores and explanations for each metric. Identify the main performance gap or success.
-Provide a short, 1-2 sentence "Gap Analysis" summarizing the model's current performance state on this test case.
-"""
-        # simplified serialization
-        results_summary = [{"name": r.get('metric_name'), "score": r.get('score'), "explanation": r.get('explanation')} for r in metric_results]
-        
-        user_content = f"Test Case: {test_case.name}\nResults: {json.dumps(results_summary, indent=2)}"
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        response = await self.client.responses.parse(
+            model=self.model,
+            input=build_judge_messages(metric, candidate_text, test_case_context),
+            text_format=JudgeResult
+        )
+        note_usage(getattr(response, "usage", None))
+        return response.output_parsed
 
-        completion = self.client.chat.completions.create(
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        response = await self.client.responses.parse(
+            model=self.model,
+            input=build_multi_judge_messages(metrics, candidate_text, test_case_context),
+            text_format=MultiJudgeResult
+        )
+        note_usage(getattr(response, "usage", None))
+        return validate_multi_judge(metrics, response.output_parsed)
+
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        completion = await self.client.chat.completions.create(
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ],
+            messages=build_narrative_messages(context_data)
+        )
+        note_usage(getattr(completion, "usage", None))
+        return completion.choices[0].message.content.strip()
 
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        completion = await self.client.chat.completions.create(
+            model=self.model,
+            messages=build_analysis_messages(test_case, metric_results)
         )
+        note_usage(getattr(completion, "usage", None))
         return completion.choices[0].message.content.strip()
 
+class BatchBackend(ABC):
+    """
+    Where Batch API request files go. OpenAIBatchBackend talks to the real
+    API; LocalBatchBackend answers in-process so tests and dry runs need no
+    network.
+    """
+    @abstractmethod
+    def submit(self, jsonl: bytes, endpoint: str) -> str:
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        pass
+
+    @abstractmethod
+    def results(self, batch_id: str) -> str:
+        pass
+
+class OpenAIBatchBackend(BatchBackend):
+    def __init__(self, client: Any):
+        self.client = client
+
+    def submit(self, jsonl: bytes, endpoint: str) -> str:
+        input_file = self.client.files.create(file=("judge_batch.jsonl", io.BytesIO(jsonl)), purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint=endpoint, completion_window="24h")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> str:
+        batch = self.client.batches.retrieve(batch_id)
+        chunks = []
+        # Failed requests land in the error file, successful ones in the output file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                chunks.append(self.client.files.content(file_id).text)
+        return "\n".join(chunks)
+
+def _stub_batch_responder(body: dict) -> str:
+    """Answers like StubLLMProvider: judge score is the candidate length % 100."""
+    user_content = body["messages"][-1]["content"]
+    if body.get("response_format"):
+        match = re.search(r"Evaluate this Text:\n---\n(.*)\n---", user_content, re.DOTALL)
+        candidate_text = match.group(1) if match else ""
+        return JudgeResult(
+            score=float(len(candidate_text) % 100),
+            explanation=f"Stub judged based on length ({len(candidate_text)} chars)."
+        ).model_dump_json()
+    return "Stub Gap Analysis from local batch backend."
+
+class LocalBatchBackend(BatchBackend):
+    """In-process stand-in for the Batch API: batches complete as soon as they are submitted."""
+    def __init__(self, responder: Callable[[dict], str] = _stub_batch_responder):
+        self.responder = responder
+        self._batches: Dict[str, str] = {}
+
+    def submit(self, jsonl: bytes, endpoint: str) -> str:
+        output = []
+        for line in jsonl.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            try:
+                content = self.responder(request["body"])
+                response = {
+                    "status_code": 200,
+                    "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+                }
+                output.append({"custom_id": request["custom_id"], "response": response, "error": None})
+            except Exception as e:
+                output.append({"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}})
+        batch_id = f"local_batch_{len(self._batches) + 1}"
+        self._batches[batch_id] = "\n".join(json.dumps(o) for o in output)
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return "completed" if batch_id in self._batches else "failed"
+
+    def results(self, batch_id: str) -> str:
+        return self._batches[batch_id]
+
+class BatchJudge:
+    """
+    Offline judging through the Batch API: requests are written to a JSONL
+    file, submitted once, polled until the batch finishes, and parsed back by
+    custom_id. Much cheaper and outside the interactive rate limit, at the cost
+    of latency (up to the 24h completion window).
+    """
+    ENDPOINT = "/v1/chat/completions"
+    TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(self, backend: BatchBackend, model: str, poll_interval: float = 30.0, timeout: float = 24 * 3600):
+        self.backend = backend
+        self.model = model
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def judge_metrics(self, requests: List[Tuple[str, MetricDefinition, str, str]]) -> Dict[str, Union[JudgeResult, Exception]]:
+        """requests: (custom_id, metric, candidate_text, test_case_context)"""
+        bodies = {
+            custom_id: {
+                "model": self.model,
+                "messages": build_judge_messages(metric, candidate_text, context),
+                "response_format": {"type": "json_object"}
+            }
+            for custom_id, metric, candidate_text, context in requests
+        }
+        parsed: Dict[str, Union[JudgeResult, Exception]] = {}
+        for custom_id, content in self._run(bodies).items():
+            if isinstance(content, Exception):
+                parsed[custom_id] = content
+                continue
+            try:
+                parsed[custom_id] = JudgeResult.model_validate_json(content)
+            except Exception as e:
+                parsed[custom_id] = e
+        return parsed
+
+    def analyze_evaluation_results(self, requests: List[Tuple[str, TestCase, List[Any]]]) -> Dict[str, Union[str, Exception]]:
+        """requests: (custom_id, test_case, metric_results)"""
+        bodies = {
+            custom_id: {"model": self.model, "messages": build_analysis_messages(test_case, metric_results)}
+            for custom_id, test_case, metric_results in requests
+        }
+        return {k: v if isinstance(v, Exception) else v.strip() for k, v in self._run(bodies).items()}
+
+    def _run(self, bodies: Dict[str, dict]) -> Dict[str, Union[str, Exception]]:
+        if not bodies:
+            return {}
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": self.ENDPOINT, "body": body})
+            for custom_id, body in bodies.items()
+        ]
+        batch_id = self.backend.submit("\n".join(lines).encode("utf-8"), self.ENDPOINT)
+
+        deadline = time.monotonic() + self.timeout
+        status = self.backend.status(batch_id)
+        while status not in self.TERMINAL_STATUSES:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Batch {batch_id} still '{status}' after {self.timeout}s")
+            time.sleep(self.poll_interval)
+            status = self.backend.status(batch_id)
+        if status != "completed":
+            raise RuntimeError(f"Batch {batch_id} ended with status '{status}'")
+
+        results: Dict[str, Union[str, Exception]] = {}
+        for line in self.backend.results(batch_id).splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                error = item.get("error") or response.get("body", {}).get("error") or {}
+                results[item["custom_id"]] = RuntimeError(f"Batch request failed: {error.get('message', error)}")
+                continue
+            results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        for custom_id in bodies:
+            # A request missing from both output files counts as failed
+            results.setdefault(custom_id, RuntimeError("Batch request returned no result"))
+        return results
+
+def _http_options() -> Dict[str, Any]:
+    import httpx
+    return {
+        "timeout": httpx.Timeout(settings.LLM_HTTP_TIMEOUT_SECONDS, connect=settings.LLM_HTTP_CONNECT_TIMEOUT_SECONDS),
+        "limits": httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS
+        ),
+    }
+
+def _sdk_max_retries() -> int:
+    # The scheduler retries with its own backoff; stacking SDK retries under it would multiply attempts
+    return 0 if settings.LLM_SCHEDULER_ENABLED else settings.LLM_MAX_RETRIES
+
+class LLMProviderRegistry:
+    """
+    Process-wide provider instances keyed by (LLM_MODE, model).
+
+    Every OpenAI provider shares one client, and with it one keep-alive
+    connection pool, so requests reuse warm TLS connections instead of paying
+    the handshake on every call. Async clients are bound to the event loop
+    that created them, so they are kept per loop.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers: Dict[Tuple[str, str], LLMProvider] = {}
+        self._client: Any = None
+        # event loop -> (AsyncOpenAI client or None, providers by (mode, model))
+        self._async_state: "weakref.WeakKeyDictionary[Any, Tuple[Any, Dict[Tuple[str, str], AsyncLLMProvider]]]" = weakref.WeakKeyDictionary()
+
+    def openai_client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                import httpx
+                from openai import OpenAI
+                options = _http_options()
+                self._client = OpenAI(
+                    api_key=settings.OPENAI_API_KEY.get_secret_value(),
+                    base_url=settings.OPENAI_BASE_URL,
+                    timeout=options["timeout"],
+                    max_retries=_sdk_max_retries(),
+                    http_client=httpx.Client(follow_redirects=True, **options)
+                )
+            return self._client
+
+    def get(self, override_model: Optional[str] = None) -> LLMProvider:
+        model = override_model or settings.OPENAI_MODEL
+        key = (settings.LLM_MODE, model)
+        provider = self._providers.get(key)
+        if provider is not None:
+            return provider
+        if settings.LLM_MODE in ("openai", "record"):
+            provider = OpenAILLMProvider(override_model=model, client=self.openai_client())
+            if settings.LLM_SCHEDULER_ENABLED:
+                from app.providers.scheduler import ScheduledLLMProvider, get_llm_scheduler
+                provider = ScheduledLLMProvider(provider, get_llm_scheduler())
+            if settings.LLM_MODE == "record":
+                from app.providers.replay import RecordingLLMProvider, get_llm_archive
+                provider = RecordingLLMProvider(provider, get_llm_archive())
+        elif settings.LLM_MODE == "replay":
+            from app.providers.replay import replay_provider
+            provider = replay_provider(model)
+        else:
+            provider = StubLLMProvider()
+        with self._lock:
+            return self._providers.setdefault(key, provider)
+
+    def get_async(self, override_model: Optional[str] = None) -> AsyncLLMProvider:
+        model = override_model or settings.OPENAI_MODEL
+        key = (settings.LLM_MODE, model)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop to bind a pooled client to: hand out a standalone provider
+            if settings.LLM_MODE in ("openai", "record"):
+                provider = AsyncOpenAILLMProvider(override_model=model)
+                if settings.LLM_MODE == "record":
+                    from app.providers.replay import AsyncRecordingLLMProvider, get_llm_archive
+                    provider = AsyncRecordingLLMProvider(provider, get_llm_archive())
+                return provider
+            if settings.LLM_MODE == "replay":
+                from app.providers.replay import async_replay_provider
+                return async_replay_provider(model)
+            return AsyncStubLLMProvider()
+        with self._lock:
+            if loop not in self._async_state:
+                self._async_state[loop] = (None, {})
+            client, providers = self._async_state[loop]
+            provider = providers.get(key)
+            if provider is not None:
+                return provider
+            if settings.LLM_MODE in ("openai", "record"):
+                if client is None:
+                    import httpx
+                    from openai import AsyncOpenAI
+                    options = _http_options()
+                    client = AsyncOpenAI(
+                        api_key=settings.OPENAI_API_KEY.get_secret_value(),
+                        base_url=settings.OPENAI_BASE_URL,
+                        timeout=options["timeout"],
+                        max_retries=_sdk_max_retries(),
+                        http_client=httpx.AsyncClient(follow_redirects=True, **options)
+                    )
+                    self._async_state[loop] = (client, providers)
+                provider = AsyncOpenAILLMProvider(override_model=model, client=client)
+                if settings.LLM_SCHEDULER_ENABLED:
+                    from app.providers.scheduler import AsyncScheduledLLMProvider, get_llm_scheduler
+                    provider = AsyncScheduledLLMProvider(provider, get_llm_scheduler())
+                if settings.LLM_MODE == "record":
+                    from app.providers.replay import AsyncRecordingLLMProvider, get_llm_archive
+                    provider = AsyncRecordingLLMProvider(provider, get_llm_archive())
+            elif settings.LLM_MODE == "replay":
+                from app.providers.replay import async_replay_provider
+                provider = async_replay_provider(model)
+            else:
+                provider = AsyncStubLLMProvider()
+            providers[key] = provider
+            return provider
+
+    def close(self) -> None:
+        """Drops every provider and closes the sync connection pool."""
+        with self._lock:
+            client, self._client = self._client, None
+            self._providers.clear()
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """close(), plus the async pool of the running event loop."""
+        with self._lock:
+            client, _ = self._async_state.pop(asyncio.get_running_loop(), (None, {}))
+        if client is not None:
+            await client.close()
+        self.close()
+
+provider_registry = LLMProviderRegistry()
+
+async def close_llm_providers() -> None:
+    """Called from the FastAPI lifespan on shutdown."""
+    await provider_registry.aclose()
+
+def get_batch_judge(override_model: Optional[str] = None) -> BatchJudge:
+    model = override_model or settings.OPENAI_MODEL
+    # Batch jobs are not recorded: replay mode judges them locally like stub mode
+    if settings.LLM_MODE in ("openai", "record"):
+        backend: BatchBackend = OpenAIBatchBackend(provider_registry.openai_client())
+    else:
+        backend = LocalBatchBackend()
+    return BatchJudge(backend, model, poll_interval=settings.LLM_BATCH_POLL_SECONDS, timeout=settings.LLM_BATCH_TIMEOUT_SECONDS)
+
+class TelemetryLLMProvider(LLMProvider):
+    def __init__(self, inner: LLMProvider):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.model = getattr(inner, "model", type(inner).__name__)
+
+    def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        with llm_call("generate_metric_proposals", self.model):
+            return self.inner.generate_metric_proposals(intent, test_case)
+
+    def generate_report_narrative(self, context_data: Any) -> str:
+        with llm_call("generate_report_narrative", self.model):
+            return self.inner.generate_report_narrative(context_data)
+
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        with llm_call("judge_metric", self.model):
+            return self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample)
+
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        with llm_call("judge_metrics", self.model):
+            return self.inner.judge_metrics(metrics, candidate_text, test_case_context)
+
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        with llm_call("analyze_evaluation_results", self.model):
+            return self.inner.analyze_evaluation_results(test_case, metric_results)
+
+class AsyncTelemetryLLMProvider(AsyncLLMProvider):
+    def __init__(self, inner: AsyncLLMProvider):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.model = getattr(inner, "model", type(inner).__name__.replace("Async", "", 1))
+
+    async def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        with llm_call("generate_metric_proposals", self.model):
+            return await self.inner.generate_metric_proposals(intent, test_case)
+
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        with llm_call("generate_report_narrative", self.model):
+            return await self.inner.generate_report_narrative(context_data)
+
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        with llm_call("judge_metric", self.model):
+            return await self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample)
+
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        with llm_call("judge_metrics", self.model):
+            return await self.inner.judge_metrics(metrics, candidate_text, test_case_context)
+
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        with llm_call("analyze_evaluation_results", self.model):
+            return await self.inner.analyze_evaluation_results(test_case, metric_results)
+
 def get_llm_provider(override_model: Optional[str] = None) -> LLMProvider:
-    if settings.LLM_MODE == "openai":
-        return OpenAILLMProvider(override_model=override_model)
-    return StubLLMProvider()
+    provider = provider_registry.get(override_model)
+
+    if settings.LLM_CACHE_ENABLED:
+        from app.providers.cache import CachedLLMProvider, get_llm_cache
+        provider = CachedLLMProvider(provider, get_llm_cache())
+    return TelemetryLLMProvider(provider)
+
+def get_async_llm_provider(override_model: Optional[str] = None) -> AsyncLLMProvider:
+    provider = provider_registry.get_async(override_model)
 
+    if settings.LLM_CACHE_ENABLED:
+        from app.providers.cache import AsyncCachedLLMProvider, get_llm_cache
+        provider = AsyncCachedLLMProvider(provider, get_llm_cache())
+    return AsyncTelemetryLLMProvider(provider)
@@ -0,0 +1,268 @@
+"""
+Record/replay providers for offline benchmarks and load tests.
+
+LLM_MODE=record runs against OpenAI as usual and appends every interaction
+(request key, response and latency) to a JSONL archive at
+settings.LLM_RECORDING_PATH. LLM_MODE=replay serves that archive without any
+network access: each response is returned after its recorded latency times
+settings.LLM_REPLAY_LATENCY_SCALE, so evaluation, report and DOCX paths run
+with production-like payloads and timing.
+
+Requests are keyed exactly like the response cache. What happens on a replay
+miss is set by settings.LLM_REPLAY_ON_MISS:
+
+- "any": serve another recording of the same method (round robin), so payload
+  sizes and latencies stay realistic for inputs that were never recorded
+- "stub": answer like StubLLMProvider, with a latency sampled from the
+  recordings of the method
+- "error": raise LookupError
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.metric import MetricDefinition
+from app.models.test_case import TestCase
+from app.providers.cache import (
+    analysis_payload, dump_judgements, judge_payload, load_judgements, make_cache_key,
+    multi_judge_payload, narrative_payload, proposals_payload
+)
+from app.providers.llm import AsyncLLMProvider, LLMProvider, StubLLMProvider
+from app.schemas.llm_validation import JudgeResult
+from app.schemas.metric import StructuredLLMResponse
+
+# method -> (dump, load) between provider results and archived strings
+CODECS: Dict[str, Tuple[Callable[[Any], str], Callable[[str], Any]]] = {
+    "generate_metric_proposals": (lambda v: v.model_dump_json(), StructuredLLMResponse.model_validate_json),
+    "generate_report_narrative": (str, str),
+    "judge_metric": (lambda v: v.model_dump_json(), JudgeResult.model_validate_json),
+    "judge_metrics": (dump_judgements, load_judgements),
+    "analyze_evaluation_results": (str, str),
+}
+
+class LLMRecordingArchive:
+    """Append-only JSONL of recorded interactions, indexed in memory by key and by method."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_method: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue # A torn last line from an interrupted recording
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        self._by_key.setdefault(entry["key"], []).append(entry)
+        self._by_method.setdefault(entry["method"], []).append(entry)
+
+    def _next(self, cursor: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Round robin, so repeated requests walk through every recording
+        position = self._cursors.get(cursor, 0)
+        self._cursors[cursor] = position + 1
+        return entries[position % len(entries)]
+
+    def record(self, key: str, method: str, model: str, latency_ms: float, response: str) -> None:
+        entry = {
+            "key": key,
+            "method": method,
+            "model": model,
+            "latency_ms": latency_ms,
+            "recorded_at": datetime.utcnow().isoformat(),
+            "response": response,
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._index(entry)
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._by_key.get(key)
+            return self._next(f"key:{key}", entries) if entries else None
+
+    def any(self, method: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._by_method.get(method)
+            return self._next(f"method:{method}", entries) if entries else None
+
+    def sample_latency_ms(self, method: str) -> float:
+        with self._lock:
+            entries = self._by_method.get(method)
+            return random.choice(entries)["latency_ms"] if entries else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": sum(len(entries) for entries in self._by_method.values()),
+                "methods": {method: len(entries) for method, entries in self._by_method.items()},
+            }
+
+class RecordingLLMProvider(LLMProvider):
+    """Passes every call through to `inner` and archives its response and latency. Failed calls are not recorded."""
+    def __init__(self, inner: LLMProvider, archive: LLMRecordingArchive):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.archive = archive
+        self.model = getattr(inner, "model", type(inner).__name__)
+
+    def _recorded(self, method: str, payload: Any, call: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        value = call()
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.archive.record(make_cache_key(method, self.model, payload), method, self.model, latency_ms, CODECS[method][0](value))
+        return value
+
+    def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        return self._recorded("generate_metric_proposals", proposals_payload(intent, test_case), lambda: self.inner.generate_metric_proposals(intent, test_case))
+
+    def generate_report_narrative(self, context_data: Any) -> str:
+        return self._recorded("generate_report_narrative", narrative_payload(context_data), lambda: self.inner.generate_report_narrative(context_data))
+
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        return self._recorded("judge_metric", judge_payload(metric, candidate_text, test_case_context, sample), lambda: self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample))
+
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        return self._recorded("judge_metrics", multi_judge_payload(metrics, candidate_text, test_case_context), lambda: self.inner.judge_metrics(metrics, candidate_text, test_case_context))
+
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return self._recorded("analyze_evaluation_results", analysis_payload(test_case, metric_results), lambda: self.inner.analyze_evaluation_results(test_case, metric_results))
+
+class AsyncRecordingLLMProvider(AsyncLLMProvider):
+    """Async twin of RecordingLLMProvider, appending to the same archive."""
+    def __init__(self, inner: AsyncLLMProvider, archive: LLMRecordingArchive):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.archive = archive
+        self.model = getattr(inner, "model", type(inner).__name__.replace("Async", "", 1))
+
+    async def _recorded(self, method: str, payload: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        value = await call()
+        latency_ms = (time.perf_counter() - started) * 1000
+        await asyncio.to_thread(self.archive.record, make_cache_key(method, self.model, payload), method, self.model, latency_ms, CODECS[method][0](value))
+        return value
+
+    async def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        return await self._recorded("generate_metric_proposals", proposals_payload(intent, test_case), lambda: self.inner.generate_metric_proposals(intent, test_case))
+
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        return await self._recorded("generate_report_narrative", narrative_payload(context_data), lambda: self.inner.generate_report_narrative(context_data))
+
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        return await self._recorded("judge_metric", judge_payload(metric, candidate_text, test_case_context, sample), lambda: self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample))
+
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        return await self._recorded("judge_metrics", multi_judge_payload(metrics, candidate_text, test_case_context), lambda: self.inner.judge_metrics(metrics, candidate_text, test_case_context))
+
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return await self._recorded("analyze_evaluation_results", analysis_payload(test_case, metric_results), lambda: self.inner.analyze_evaluation_results(test_case, metric_results))
+
+def _remap_judgements(metrics: List[MetricDefinition], judged: Dict[int, JudgeResult]) -> Dict[int, JudgeResult]:
+    # A recording for other metrics: hand its judgements out in order
+    values = list(judged.values())
+    return {metric.id: values[i % len(values)] for i, metric in enumerate(metrics)} if values else {}
+
+class ReplayLLMProvider(LLMProvider):
+    """Serves recorded responses with their recorded latency; never touches the network."""
+    def __init__(self, archive: LLMRecordingArchive, model: str, latency_scale: float = 1.0, on_miss: str = "any"):
+        self.archive = archive
+        self.model = model
+        self.latency_scale = latency_scale
+        self.on_miss = on_miss
+        self.stub = StubLLMProvider()
+
+    def _resolve(self, method: str, payload: Any) -> Tuple[Optional[Any], float]:
+        """(recorded value or None to answer like the stub, seconds to wait)."""
+        entry = self.archive.lookup(make_cache_key(method, self.model, payload))
+        if entry is None and self.on_miss == "error":
+            raise LookupError(f"No recording for {method} on {self.model}")
+        if entry is None and self.on_miss == "any":
+            entry = self.archive.any(method)
+        if entry is None:
+            return None, self.archive.sample_latency_ms(method) * self.latency_scale / 1000
+        return CODECS[method][1](entry["response"]), entry["latency_ms"] * self.latency_scale / 1000
+
+    def _replay(self, method: str, payload: Any, stub: Callable[[], Any]) -> Any:
+        value, delay = self._resolve(method, payload)
+        if delay > 0:
+            time.sleep(delay)
+        return stub() if value is None else value
+
+    def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        return self._replay("generate_metric_proposals", proposals_payload(intent, test_case), lambda: self.stub.generate_metric_proposals(intent, test_case))
+
+    def generate_report_narrative(self, context_data: Any) -> str:
+        return self._replay("generate_report_narrative", narrative_payload(context_data), lambda: self.stub.generate_report_narrative(context_data))
+
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        return self._replay("judge_metric", judge_payload(metric, candidate_text, test_case_context, sample), lambda: self.stub.judge_metric(metric, candidate_text, test_case_context))
+
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        judged = self._replay("judge_metrics", multi_judge_payload(metrics, candidate_text, test_case_context), lambda: self.stub.judge_metrics(metrics, candidate_text, test_case_context))
+        requested = {metric.id for metric in metrics}
+        return judged if set(judged) <= requested else _remap_judgements(metrics, judged)
+
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return self._replay("analyze_evaluation_results", analysis_payload(test_case, metric_results), lambda: self.stub.analyze_evaluation_results(test_case, metric_results))
+
+class AsyncReplayLLMProvider(AsyncLLMProvider):
+    """Async twin of ReplayLLMProvider; waits with asyncio.sleep so replayed latency doesn't hold a thread."""
+    def __init__(self, archive: LLMRecordingArchive, model: str, latency_scale: float = 1.0, on_miss: str = "any"):
+        self.replay = ReplayLLMProvider(archive, model, latency_scale, on_miss)
+        self.model = model
+
+    async def _replay(self, method: str, payload: Any, stub: Callable[[], Any]) -> Any:
+        value, delay = self.replay._resolve(method, payload)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return stub() if value is None else value
+
+    async def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        return await self._replay("generate_metric_proposals", proposals_payload(intent, test_case), lambda: self.replay.stub.generate_metric_proposals(intent, test_case))
+
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        return await self._replay("generate_report_narrative", narrative_payload(context_data), lambda: self.replay.stub.generate_report_narrative(context_data))
+
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        return await self._replay("judge_metric", judge_payload(metric, candidate_text, test_case_context, sample), lambda: self.replay.stub.judge_metric(metric, candidate_text, test_case_context))
+
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        judged = await self._replay("judge_metrics", multi_judge_payload(metrics, candidate_text, test_case_context), lambda: self.replay.stub.judge_metrics(metrics, candidate_text, test_case_context))
+        requested = {metric.id for metric in metrics}
+        return judged if set(judged) <= requested else _remap_judgements(metrics, judged)
+
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return await self._replay("analyze_evaluation_results", analysis_payload(test_case, metric_results), lambda: self.replay.stub.analyze_evaluation_results(test_case, metric_results))
+
+_archive: Optional[LLMRecordingArchive] = None
+_archive_lock = threading.Lock()
+
+def get_llm_archive() -> LLMRecordingArchive:
+    """Process-wide archive, loaded on first use from settings.LLM_RECORDING_PATH."""
+    global _archive
+    with _archive_lock:
+        if _archive is None or _archive.path != settings.LLM_RECORDING_PATH:
+            _archive = LLMRecordingArchive(settings.LLM_RECORDING_PATH)
+        return _archive
+
+def replay_provider(model: str) -> ReplayLLMProvider:
+    return ReplayLLMProvider(get_llm_archive(), model, settings.LLM_REPLAY_LATENCY_SCALE, settings.LLM_REPLAY_ON_MISS)
+
+def async_replay_provider(model: str) -> AsyncReplayLLMProvider:
+    return AsyncReplayLLMProvider(get_llm_archive(), model, settings.LLM_REPLAY_LATENCY_SCALE, settings.LLM_REPLAY_ON_MISS)
@@ -0,0 +1,389 @@
+"""
+Shared scheduler in front of the OpenAI providers.
+
+Every LLM call of the process goes through one `ModelLane` per model, which
+enforces:
+
+- request and token budgets per minute (token buckets, refilled continuously),
+- an adaptive concurrency limit (AIMD: +1 after a window of healthy calls,
+  halved on a 429, trimmed when latency exceeds the target),
+- retries with full-jitter exponential backoff on 429/5xx/connection errors,
+  honouring Retry-After when the API sends one.
+
+Sync callers (thread pools) and async callers (event loops) share the same
+lanes, so a batch job and a burst of previews cannot overrun the provider
+between them.
+"""
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.models.metric import MetricDefinition
+from app.models.test_case import TestCase
+from app.providers.llm import (
+    AsyncLLMProvider, LLMProvider, build_analysis_messages, build_judge_messages,
+    build_metric_design_messages, build_multi_judge_messages, build_narrative_messages
+)
+from app.providers.telemetry import note_retry
+from app.schemas.llm_validation import JudgeResult
+from app.schemas.metric import StructuredLLMResponse
+
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+def estimate_tokens(messages: List[dict], expected_output: int = 300) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + expected_output
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES or isinstance(error, (TimeoutError, ConnectionError))
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """`per_minute` units, refilled continuously. A budget of 0 means unlimited."""
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def wait_time(self, cost: float, now: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        cost = min(cost, self.capacity) # Oversized requests still get through on a full bucket
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float) -> None:
+        if self.capacity > 0:
+            self.tokens -= min(cost, self.capacity)
+
+@dataclass
+class LaneStats:
+    completed: int = 0
+    failed: int = 0
+    retries: int = 0
+    throttled: int = 0
+    total_latency: float = 0.0
+
+@dataclass
+class ModelLane:
+    model: str
+    requests: TokenBucket
+    tokens: TokenBucket
+    limit: float
+    min_limit: int
+    max_limit: int
+    in_flight: int = 0
+    queued: int = 0
+    successes_since_change: int = 0
+    last_decrease: float = 0.0
+    stats: LaneStats = field(default_factory=LaneStats)
+
+class LLMScheduler:
+    def __init__(
+        self,
+        initial_concurrency: int = 8,
+        max_concurrency: int = 32,
+        max_attempts: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        latency_target: float = 30.0,
+        model_limits: Optional[Dict[str, Dict[str, int]]] = None,
+        default_rpm: int = 0,
+        default_tpm: int = 0,
+        sleep: Callable[[float], None] = time.sleep,
+        async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+    ):
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latency_target = latency_target
+        self.model_limits = model_limits or {}
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+        self._lanes: Dict[str, ModelLane] = {}
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_waiters: Set[Tuple[Any, asyncio.Event]] = set()
+
+    def _lane(self, model: str) -> ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            limits = self.model_limits.get(model, {})
+            max_limit = max(1, int(limits.get("max_concurrency", self.max_concurrency)))
+            lane = ModelLane(
+                model=model,
+                requests=TokenBucket(int(limits.get("rpm", self.default_rpm))),
+                tokens=TokenBucket(int(limits.get("tpm", self.default_tpm))),
+                limit=float(min(max_limit, max(1, self.initial_concurrency))),
+                min_limit=1,
+                max_limit=max_limit
+            )
+            self._lanes[model] = lane
+        return lane
+
+    # --- slot accounting (caller holds self._lock) ---
+
+    def _try_acquire(self, lane: ModelLane, cost: int) -> Optional[float]:
+        """0.0 when a slot was taken, seconds to wait for budget, or None to wait for a slot."""
+        if lane.in_flight >= int(lane.limit):
+            return None
+        now = time.monotonic()
+        wait = max(lane.requests.wait_time(1, now), lane.tokens.wait_time(cost, now))
+        if wait > 0:
+            return wait
+        lane.requests.take(1)
+        lane.tokens.take(cost)
+        lane.in_flight += 1
+        return 0.0
+
+    def _release(self, lane: ModelLane, latency: Optional[float], throttled: bool) -> None:
+        lane.in_flight -= 1
+        now = time.monotonic()
+        if throttled:
+            lane.stats.throttled += 1
+            # Concurrent 429s from one burst count as a single signal
+            if now - lane.last_decrease > 1.0:
+                lane.limit = max(lane.min_limit, lane.limit / 2)
+                lane.last_decrease = now
+            lane.successes_since_change = 0
+        elif latency is not None:
+            lane.stats.completed += 1
+            lane.stats.total_latency += latency
+            if latency > self.latency_target:
+                lane.limit = max(lane.min_limit, lane.limit * 0.9)
+                lane.successes_since_change = 0
+            else:
+                lane.successes_since_change += 1
+                if lane.successes_since_change >= int(lane.limit):
+                    lane.limit = min(lane.max_limit, lane.limit + 1)
+                    lane.successes_since_change = 0
+        self._condition.notify_all()
+        for loop, event in list(self._async_waiters):
+            loop.call_soon_threadsafe(event.set)
+
+    def _acquire(self, lane: ModelLane, cost: int) -> None:
+        with self._lock:
+            lane.queued += 1
+            try:
+                while True:
+                    wait = self._try_acquire(lane, cost)
+                    if wait == 0.0:
+                        return
+                    self._condition.wait(timeout=wait)
+            finally:
+                lane.queued -= 1
+
+    async def _acquire_async(self, lane: ModelLane, cost: int) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lane.queued += 1
+        try:
+            while True:
+                event = asyncio.Event()
+                with self._lock:
+                    wait = self._try_acquire(lane, cost)
+                    if wait == 0.0:
+                        return
+                    waiter = (loop, event)
+                    self._async_waiters.add(waiter)
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._lock:
+                        self._async_waiters.discard(waiter)
+        finally:
+            with self._lock:
+                lane.queued -= 1
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        hinted = retry_after(error)
+        if hinted is not None:
+            return min(self.backoff_max, hinted)
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _finish(self, lane: ModelLane, started: float, error: Optional[Exception]) -> None:
+        with self._lock:
+            if error is None:
+                self._release(lane, time.monotonic() - started, throttled=False)
+            else:
+                self._release(lane, None, throttled=is_rate_limited(error))
+
+    def call(self, model: str, cost: int, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            lane = self._lane(model)
+        for attempt in range(self.max_attempts):
+            self._acquire(lane, cost)
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                self._finish(lane, started, e)
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    with self._lock:
+                        lane.stats.failed += 1
+                    raise
+                with self._lock:
+                    lane.stats.retries += 1
+                note_retry()
+                self._sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                # Cancelled mid-call (e.g. an SSE client went away): hand the slot back uncounted
+                with self._lock:
+                    self._release(lane, None, throttled=False)
+                raise
+            self._finish(lane, started, None)
+            return result
+
+    async def call_async(self, model: str, cost: int, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            lane = self._lane(model)
+        for attempt in range(self.max_attempts):
+            await self._acquire_async(lane, cost)
+            started = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as e:
+                self._finish(lane, started, e)
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    with self._lock:
+                        lane.stats.failed += 1
+                    raise
+                with self._lock:
+                    lane.stats.retries += 1
+                note_retry()
+                await self._async_sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                # Cancelled mid-call (e.g. an SSE client went away): hand the slot back uncounted
+                with self._lock:
+                    self._release(lane, None, throttled=False)
+                raise
+            self._finish(lane, started, None)
+            return result
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "model": lane.model,
+                    "concurrency_limit": int(lane.limit),
+                    "in_flight": lane.in_flight,
+                    "queue_depth": lane.queued,
+                    "completed": lane.stats.completed,
+                    "failed": lane.stats.failed,
+                    "retries": lane.stats.retries,
+                    "throttled": lane.stats.throttled,
+                    "avg_latency_seconds": (lane.stats.total_latency / lane.stats.completed) if lane.stats.completed else None,
+                    "rpm_limit": int(lane.requests.capacity) or None,
+                    "tpm_limit": int(lane.tokens.capacity) or None,
+                }
+                for lane in self._lanes.values()
+            ]
+
+class ScheduledLLMProvider(LLMProvider):
+    """Routes every call of the wrapped provider through the scheduler lane of its model."""
+    def __init__(self, inner: LLMProvider, scheduler: LLMScheduler):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.scheduler = scheduler
+        self.model = getattr(inner, "model", type(inner).__name__)
+
+    def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        cost = estimate_tokens(build_metric_design_messages(intent, test_case), expected_output=2000)
+        return self.scheduler.call(self.model, cost, lambda: self.inner.generate_metric_proposals(intent, test_case))
+
+    def generate_report_narrative(self, context_data: Any) -> str:
+        cost = estimate_tokens(build_narrative_messages(context_data), expected_output=1500)
+        return self.scheduler.call(self.model, cost, lambda: self.inner.generate_report_narrative(context_data))
+
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        cost = estimate_tokens(build_judge_messages(metric, candidate_text, test_case_context))
+        return self.scheduler.call(self.model, cost, lambda: self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample))
+
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        cost = estimate_tokens(build_multi_judge_messages(metrics, candidate_text, test_case_context), expected_output=200 * len(metrics))
+        return self.scheduler.call(self.model, cost, lambda: self.inner.judge_metrics(metrics, candidate_text, test_case_context))
+
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        cost = estimate_tokens(build_analysis_messages(test_case, metric_results))
+        return self.scheduler.call(self.model, cost, lambda: self.inner.analyze_evaluation_results(test_case, metric_results))
+
+class AsyncScheduledLLMProvider(AsyncLLMProvider):
+    """Async twin of ScheduledLLMProvider; shares lanes with the sync callers."""
+    def __init__(self, inner: AsyncLLMProvider, scheduler: LLMScheduler):
+        self.inner = inner
+        self.supports_sampling = inner.supports_sampling
+        self.scheduler = scheduler
+        self.model = getattr(inner, "model", type(inner).__name__)
+
+    async def generate_metric_proposals(self, intent: str, test_case: TestCase) -> StructuredLLMResponse:
+        cost = estimate_tokens(build_metric_design_messages(intent, test_case), expected_output=2000)
+        return await self.scheduler.call_async(self.model, cost, lambda: self.inner.generate_metric_proposals(intent, test_case))
+
+    async def generate_report_narrative(self, context_data: Any) -> str:
+        cost = estimate_tokens(build_narrative_messages(context_data), expected_output=1500)
+        return await self.scheduler.call_async(self.model, cost, lambda: self.inner.generate_report_narrative(context_data))
+
+    async def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        cost = estimate_tokens(build_judge_messages(metric, candidate_text, test_case_context))
+        return await self.scheduler.call_async(self.model, cost, lambda: self.inner.judge_metric(metric, candidate_text, test_case_context, sample=sample))
+
+    async def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        cost = estimate_tokens(build_multi_judge_messages(metrics, candidate_text, test_case_context), expected_output=200 * len(metrics))
+        return await self.scheduler.call_async(self.model, cost, lambda: self.inner.judge_metrics(metrics, candidate_text, test_case_context))
+
+    async def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        cost = estimate_tokens(build_analysis_messages(test_case, metric_results))
+        return await self.scheduler.call_async(self.model, cost, lambda: self.inner.analyze_evaluation_results(test_case, metric_results))
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Process-wide scheduler, created on first use from settings."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                initial_concurrency=settings.LLM_INITIAL_CONCURRENCY,
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                max_attempts=settings.LLM_SCHEDULER_MAX_ATTEMPTS,
+                backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+                backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+                latency_target=settings.LLM_LATENCY_TARGET_SECONDS,
+                model_limits=settings.LLM_MODEL_LIMITS,
+                default_rpm=settings.LLM_RPM_LIMIT,
+                default_tpm=settings.LLM_TPM_LIMIT
+            )
+        return _scheduler
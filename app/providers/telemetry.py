@@ -0,0 +1,111 @@
+"""
+Per-call LLM telemetry.
+
+`TelemetryLLMProvider` (app.providers.llm, the outermost wrapper returned by
+get_llm_provider) opens one `LLMCallRecord` per provider call. Inner layers
+annotate the record of the call in progress: the OpenAI providers add token usage, the scheduler counts
+retries, the cache marks hits. Finished records go to the collector of the
+current context (see `collect_llm_calls`), from where the evaluation service
+persists them with the run, and app.services.telemetry.persist_llm_calls
+stores calls made outside one (previews, metric design, reports).
+
+Everything travels through contextvars, so thread pools must submit with
+`contextvars.copy_context().run` to keep records flowing to the collector.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+@dataclass
+class LLMCallRecord:
+    method: str
+    model: str
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    latency_ms: float = 0.0
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_input_tokens: Optional[int] = None # Part of input_tokens served from the provider's prompt cache
+    retries: int = 0
+    cache_hit: bool = False
+    success: bool = True
+    error: Optional[str] = None
+    metric_definition_id: Optional[int] = None
+    sample_index: Optional[int] = None
+    telemetry_id: Optional[int] = None # LLMCallTelemetry row, once persisted
+
+_current_call: ContextVar[Optional[LLMCallRecord]] = ContextVar("llm_current_call", default=None)
+_collector: ContextVar[Optional[List[LLMCallRecord]]] = ContextVar("llm_call_collector", default=None)
+_labels: ContextVar[Dict[str, Any]] = ContextVar("llm_call_labels", default={})
+
+@contextmanager
+def collect_llm_calls(calls: Optional[List[LLMCallRecord]] = None) -> Iterator[List[LLMCallRecord]]:
+    """Calls finished in this context (and tasks/threads copied from it) are appended to `calls`."""
+    calls = calls if calls is not None else []
+    token = _collector.set(calls)
+    try:
+        yield calls
+    finally:
+        _collector.reset(token)
+
+@contextmanager
+def llm_call_labels(**labels: Any) -> Iterator[None]:
+    """Attributes (metric_definition_id, sample_index) stamped on calls made in this context."""
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+@contextmanager
+def llm_call(method: str, model: str) -> Iterator[LLMCallRecord]:
+    record = LLMCallRecord(method=method, model=model)
+    for key, value in _labels.get().items():
+        setattr(record, key, value)
+    token = _current_call.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        # Includes cancellation (e.g. an SSE client going away): the call did not complete
+        record.success = False
+        record.error = str(e)[:500] or type(e).__name__
+        raise
+    finally:
+        record.latency_ms = (time.perf_counter() - started) * 1000
+        _current_call.reset(token)
+        calls = _collector.get()
+        if calls is not None:
+            calls.append(record)
+
+def note_usage(usage: Any) -> None:
+    """Token usage from a Responses API or Chat Completions response."""
+    record = _current_call.get()
+    if record is None or usage is None:
+        return
+    input_tokens = getattr(usage, "input_tokens", None)
+    if input_tokens is None:
+        input_tokens = getattr(usage, "prompt_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    if output_tokens is None:
+        output_tokens = getattr(usage, "completion_tokens", None)
+    if isinstance(input_tokens, int):
+        record.input_tokens = (record.input_tokens or 0) + input_tokens
+    if isinstance(output_tokens, int):
+        record.output_tokens = (record.output_tokens or 0) + output_tokens
+    details = getattr(usage, "input_tokens_details", None) or getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None)
+    if isinstance(cached_tokens, int):
+        record.cached_input_tokens = (record.cached_input_tokens or 0) + cached_tokens
+
+def note_retry() -> None:
+    record = _current_call.get()
+    if record is not None:
+        record.retries += 1
+
+def note_cache_hit() -> None:
+    record = _current_call.get()
+    if record is not None:
+        record.cache_hit = True
@@ -1,5 +1,6 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, List, Optional
+from pydantic import BaseModel, PrivateAttr
 from app.schemas.metric import MetricDefinitionRead
 
 class MetricResultRead(BaseModel):
@@ -13,19 +14,41 @@ class MetricResultRead(BaseModel):
     raw_json: Optional[str] = None
     metric_definition: Optional[MetricDefinitionRead] = None
 
+class MetricSampleResultRead(BaseModel):
+    id: int
+    evaluation_run_id: int
+    metric_definition_id: int
+    sample_index: int
+    metric_name: str
+    score: float
+    explanation: Optional[str] = None
+    raw_json: Optional[str] = None
+
 class EvaluationRunCommitRequest(BaseModel):
     outputs: List[str]
     notes: Optional[str] = None
+    multi_sample: bool = False # Score every output instead of outputs[0]
+    preview_id: Optional[str] = None # Handle from /evaluate/preview; reused instead of re-evaluating
+    # Return a pending run right away and evaluate in the background. Default: whenever
+    # the commit needs LLM calls, i.e. unless a valid preview_id is reused; False waits inline.
+    background: Optional[bool] = None
 
 class EvaluationRunPreviewRequest(BaseModel):
     outputs: List[str]
     notes: Optional[str] = None
+    multi_sample: bool = False
 
 class EvaluationRunPreviewResponse(BaseModel):
     metric_results: List[dict] # Simplified list of results (definition_id, name, score, explanation)
     aggregated_score: Optional[float]
     gap_analysis: Optional[str] = None
     warnings: List[str]
+    # Multi-sample only: per-metric mean/stddev/min/max and the per-output results
+    metric_stats: List[dict] = []
+    sample_results: List[dict] = []
+    preview_id: Optional[str] = None # Pass to /evaluate/commit to persist these results as-is
+    # LLMCallRecords of the provider calls behind these results; persisted on commit, never serialized
+    _telemetry: List[Any] = PrivateAttr(default_factory=list)
 
 class AggregatedScoreRead(BaseModel):
     metric_id: int
@@ -41,4 +64,36 @@ class EvaluationRunRead(BaseModel):
     aggregated_score: Optional[float] = None
     gap_analysis: Optional[str] = None
     notes: Optional[str] = None
+    error_message: Optional[str] = None
     metric_results: List[MetricResultRead] = []
+    sample_results: List[MetricSampleResultRead] = []
+
+class EvaluationRunStatusRead(BaseModel):
+    id: int
+    test_case_id: int
+    version_number: int
+    status: str # pending, running, completed, failed
+    aggregated_score: Optional[float] = None
+    error_message: Optional[str] = None
+
+class BatchEvaluationItem(BaseModel):
+    test_case_id: int
+    outputs: List[str]
+    notes: Optional[str] = None
+
+class BatchEvaluationRequest(BaseModel):
+    items: List[BatchEvaluationItem]
+    multi_sample: bool = False
+    use_batch_api: bool = False # Judge through the provider's Batch API: cheaper, but can take hours
+
+class BatchEvaluationJobRead(BaseModel):
+    job_id: str
+    project_id: int
+    status: str
+    total: int
+    completed: int
+    failed: int
+    run_ids: List[int] = []
+    errors: List[dict] = []
+    created_at: datetime
+    finished_at: Optional[datetime] = None
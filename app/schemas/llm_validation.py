@@ -1,5 +1,22 @@
+from typing import List
 from pydantic import BaseModel
 
 class JudgeResult(BaseModel):
     score: float
     explanation: str
+
+class SampledJudgeResult(JudgeResult):
+    # Self-consistency judging: score is the mean of the sample scores
+    samples: int
+    scores: List[float]
+    stddev: float
+    variance: float
+    settled: bool # False when the sample cap was reached before the variance threshold
+
+class MetricJudgement(BaseModel):
+    metric_id: int
+    score: float
+    explanation: str
+
+class MultiJudgeResult(BaseModel):
+    results: List[MetricJudgement]
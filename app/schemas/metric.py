@@ -1,5 +1,5 @@
 from typing import Optional, List, Any
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, Field, model_validator
 from app.models.metric import MetricType, ScaleType, TargetDirection
 
 class MetricDefinitionCreate(BaseModel):
@@ -66,6 +66,13 @@ class MetricDefinitionRead(MetricDefinitionCreate):
     id: int
     test_case_id: int
     is_active: bool
+    judge_max_samples: int = 1
+    judge_variance_threshold: Optional[float] = None
+
+class MetricSamplingUpdate(BaseModel):
+    # Judge sampling is tuning, not part of the definition: it can change after confirmation
+    judge_max_samples: int = Field(ge=1)
+    judge_variance_threshold: Optional[float] = Field(default=None, ge=0)
 
 class MetricDesignIterationCreate(BaseModel):
     user_intent: str
@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+class LLMTelemetryRollup(BaseModel):
+    # Group key: the model name, metric_definition_id or project_id (None: calls without one, e.g. gap analysis)
+    key: Optional[str] = None
+    calls: int
+    latency_p50_ms: float
+    latency_p90_ms: float
+    latency_p99_ms: float
+    latency_mean_ms: float
+    avg_input_tokens: Optional[float] = None # Over calls that reported usage (cache hits and stubs don't)
+    avg_output_tokens: Optional[float] = None
+    total_input_tokens: int
+    total_output_tokens: int
+    total_cached_input_tokens: int
+    cached_input_ratio: Optional[float] = None # Share of input tokens served from the provider's prompt cache
+    retries: int
+    cache_hit_rate: float
+    error_rate: float
+
+class LLMTelemetryResponse(BaseModel):
+    group_by: str
+    since: datetime # Start of the window the rollups cover
+    truncated: bool = False # More calls in the window than TELEMETRY_MAX_CALLS: only the most recent were read
+    groups: List[LLMTelemetryRollup]
@@ -0,0 +1,72 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select, update
+
+from app.core.config import settings
+from app.models.evaluation import EvaluationRun
+from app.models.metric import MetricDefinition
+from app.models.test_case import TestCase
+from app.services.evaluation import evaluate_test_case, complete_evaluation_run
+from app.services.telemetry import persist_llm_calls
+
+logger = logging.getLogger("uvicorn")
+
+_executor = ThreadPoolExecutor(max_workers=max(1, settings.BACKGROUND_EVAL_WORKERS), thread_name_prefix="commit-eval")
+
+def submit_run_evaluation(bind: Engine, run_id: int, metric_ids: List[int], outputs: List[str], model_name: Optional[str] = None, multi_sample: bool = False) -> Future:
+    """Evaluates a pending run off the request thread. Follow it via GET /runs/{id}/status."""
+    return _executor.submit(run_pending_evaluation, bind, run_id, metric_ids, outputs, model_name, multi_sample)
+
+def fail_interrupted_runs(bind: Engine) -> int:
+    """
+    Startup recovery: the executor doesn't survive a restart, so runs left
+    pending or running by the previous process would never finish. Marks them
+    failed and returns how many there were.
+    """
+    with Session(bind) as session:
+        result = session.execute(
+            update(EvaluationRun)
+            .where(EvaluationRun.status.in_(["pending", "running"]))
+            .values(status="failed", error_message="Interrupted by a server restart")
+        )
+        session.commit()
+    if result.rowcount:
+        logger.warning(f"Marked {result.rowcount} interrupted evaluation runs as failed")
+    return result.rowcount
+
+def run_pending_evaluation(bind: Engine, run_id: int, metric_ids: List[int], outputs: List[str], model_name: Optional[str], multi_sample: bool) -> None:
+    """
+    Moves the run through running -> completed, or failed with error_message set.
+    Dashboards only read "completed" runs, so nothing partial is ever shown.
+    """
+    with Session(bind, expire_on_commit=False) as session:
+        run = session.get(EvaluationRun, run_id)
+        if not run or run.status != "pending":
+            return
+        run.status = "running"
+        session.add(run)
+        session.commit()
+
+        calls = []
+        try:
+            test_case = session.get(TestCase, run.test_case_id)
+            metrics = session.exec(select(MetricDefinition).where(MetricDefinition.id.in_(metric_ids))).all()
+            # Keep the metric order the request saw
+            order = {metric_id: i for i, metric_id in enumerate(metric_ids)}
+            metrics = sorted(metrics, key=lambda m: order[m.id])
+            eval_response = evaluate_test_case(test_case, metrics, outputs, model_name=model_name, multi_sample=multi_sample, calls=calls)
+            complete_evaluation_run(session, run, eval_response)
+        except Exception as e:
+            logger.error(f"Background evaluation of run {run_id} failed: {e}")
+            session.rollback()
+            run = session.get(EvaluationRun, run_id)
+            run.status = "failed"
+            run.error_message = str(e)
+            session.add(run)
+            # The calls made before the failure, on the failed run
+            test_case = session.get(TestCase, run.test_case_id)
+            persist_llm_calls(session, calls, test_case.project_id if test_case else None, run.test_case_id, run.id)
+            session.commit()
@@ -0,0 +1,293 @@
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select, update
+
+from app.core.config import settings
+from app.models.batch import BatchEvaluationJob
+from app.models.metric import MetricDefinition, MetricType
+from app.models.test_case import TestCase
+from app.providers.llm import JudgeResult, get_batch_judge
+from app.schemas.evaluation import BatchEvaluationItem, BatchEvaluationJobRead, EvaluationRunPreviewResponse
+from app.services.evaluation import build_judge_context, evaluate_test_case, prescreen_candidates, save_evaluation_run, select_candidates
+
+@dataclass
+class BatchJob:
+    id: str
+    project_id: int
+    total: int
+    status: str = "pending" # pending -> running -> completed / failed
+    completed: int = 0
+    failed: int = 0
+    run_ids: List[int] = field(default_factory=list)
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    def to_read(self) -> BatchEvaluationJobRead:
+        return BatchEvaluationJobRead(
+            job_id=self.id,
+            project_id=self.project_id,
+            status=self.status,
+            total=self.total,
+            completed=self.completed,
+            failed=self.failed,
+            run_ids=list(self.run_ids),
+            errors=list(self.errors),
+            created_at=self.created_at,
+            finished_at=self.finished_at
+        )
+
+    def save(self, session: Session) -> None:
+        """Stages the job row; it is written by the caller's next commit."""
+        session.merge(BatchEvaluationJob(
+            id=self.id,
+            project_id=self.project_id,
+            status=self.status,
+            total=self.total,
+            completed=self.completed,
+            failed=self.failed,
+            run_ids_json=json.dumps(self.run_ids),
+            errors_json=json.dumps(self.errors),
+            created_at=self.created_at,
+            finished_at=self.finished_at
+        ))
+
+logger = logging.getLogger("uvicorn")
+
+# The job thread owns the BatchJob; the table holds its last saved state, so
+# job ids keep working after a restart.
+_job_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch-job")
+
+def get_batch_job(session: Session, job_id: str) -> Optional[BatchEvaluationJobRead]:
+    # populate_existing: the row changes under this session while the job runs
+    row = session.get(BatchEvaluationJob, job_id, populate_existing=True)
+    if row is None:
+        return None
+    return BatchEvaluationJobRead(
+        job_id=row.id,
+        project_id=row.project_id,
+        status=row.status,
+        total=row.total,
+        completed=row.completed,
+        failed=row.failed,
+        run_ids=json.loads(row.run_ids_json),
+        errors=json.loads(row.errors_json),
+        created_at=row.created_at,
+        finished_at=row.finished_at
+    )
+
+def start_batch_job(bind: Engine, project_id: int, items: List[BatchEvaluationItem], model_name: Optional[str] = None, multi_sample: bool = False, use_batch_api: bool = False) -> BatchJob:
+    job = BatchJob(id=uuid.uuid4().hex, project_id=project_id, total=len(items))
+    with Session(bind) as session:
+        job.save(session)
+        session.commit()
+    _job_executor.submit(run_batch_job, bind, job, items, model_name, multi_sample, use_batch_api)
+    return job
+
+def fail_interrupted_jobs(bind: Engine) -> int:
+    """Startup recovery: jobs that were running when the process stopped never resume."""
+    with Session(bind) as session:
+        result = session.execute(
+            update(BatchEvaluationJob)
+            .where(BatchEvaluationJob.status.in_(["pending", "running"]))
+            .values(status="failed", finished_at=datetime.utcnow())
+        )
+        session.commit()
+    if result.rowcount:
+        logger.warning(f"Marked {result.rowcount} interrupted batch jobs as failed")
+    return result.rowcount
+
+def run_batch_job(bind: Engine, job: BatchJob, items: List[BatchEvaluationItem], model_name: Optional[str], multi_sample: bool, use_batch_api: bool = False) -> None:
+    """
+    Evaluates every item on a worker pool of settings.BATCH_EVAL_WORKERS and
+    commits finished runs in chunks of settings.BATCH_COMMIT_SIZE. With
+    use_batch_api the LLM calls go through the provider's Batch API instead
+    (see evaluate_items_offline).
+
+    All database access stays on this thread; workers only see preloaded,
+    non-expiring objects.
+    """
+    job.status = "running"
+    try:
+        with Session(bind, expire_on_commit=False) as session:
+            job.save(session)
+            session.commit()
+            test_case_ids = {item.test_case_id for item in items}
+            test_cases = {
+                tc.id: tc for tc in session.exec(
+                    select(TestCase).where(TestCase.id.in_(test_case_ids), TestCase.project_id == job.project_id)
+                ).all()
+            }
+            metrics_by_case: Dict[int, List[MetricDefinition]] = {tc_id: [] for tc_id in test_cases}
+            for metric in session.exec(
+                select(MetricDefinition).where(MetricDefinition.test_case_id.in_(list(test_cases)), MetricDefinition.is_active == True)
+            ).all():
+                metrics_by_case[metric.test_case_id].append(metric)
+            for tc in test_cases.values():
+                tc.examples # Load before handing the object to worker threads
+
+            if use_batch_api:
+                runnable = []
+                for index, item in enumerate(items):
+                    test_case = test_cases.get(item.test_case_id)
+                    if not test_case:
+                        _record_failure(job, index, item, "TestCase not found in project")
+                    elif not metrics_by_case[test_case.id]:
+                        _record_failure(job, index, item, "No active metrics for this test case")
+                    else:
+                        runnable.append((index, item, test_case, metrics_by_case[test_case.id]))
+                pending = []
+                for index, item, outcome in evaluate_items_offline(runnable, model_name, multi_sample):
+                    if isinstance(outcome, Exception):
+                        _record_failure(job, index, item, str(outcome))
+                        continue
+                    pending.append((item, outcome))
+                    if len(pending) >= settings.BATCH_COMMIT_SIZE:
+                        _commit_pending(session, job, pending)
+                        pending = []
+                _commit_pending(session, job, pending)
+                job.status = "completed"
+                return
+
+            pending = []
+            with ThreadPoolExecutor(max_workers=max(1, settings.BATCH_EVAL_WORKERS), thread_name_prefix="batch-eval") as pool:
+                futures = {}
+                for index, item in enumerate(items):
+                    test_case = test_cases.get(item.test_case_id)
+                    if not test_case:
+                        _record_failure(job, index, item, "TestCase not found in project")
+                        continue
+                    if not metrics_by_case[test_case.id]:
+                        _record_failure(job, index, item, "No active metrics for this test case")
+                        continue
+                    future = pool.submit(evaluate_test_case, test_case, metrics_by_case[test_case.id], item.outputs, model_name, multi_sample)
+                    futures[future] = (index, item)
+
+                for future in as_completed(futures):
+                    index, item = futures[future]
+                    try:
+                        pending.append((item, future.result()))
+                    except Exception as e:
+                        _record_failure(job, index, item, str(e))
+                        continue
+                    if len(pending) >= settings.BATCH_COMMIT_SIZE:
+                        _commit_pending(session, job, pending)
+                        pending = []
+            _commit_pending(session, job, pending)
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.errors.append({"error": str(e)})
+    finally:
+        job.finished_at = datetime.utcnow()
+        with Session(bind) as session:
+            job.save(session)
+            session.commit()
+
+class _PrecomputedProvider:
+    """
+    JudgeProvider replaying judge results fetched through the Batch API; gap
+    analysis is filled in afterwards.
+    """
+    supports_sampling = False
+
+    def __init__(self, judgements: Dict[Tuple[int, str], Union[JudgeResult, Exception]]):
+        self.judgements = judgements
+
+    def judge_metrics(self, metrics: List[MetricDefinition], candidate_text: str, test_case_context: str) -> Dict[int, JudgeResult]:
+        # Failed requests are left out, so judge_metric raises their error for the caller
+        results = {metric.id: self.judgements.get((metric.id, candidate_text)) for metric in metrics}
+        return {metric_id: result for metric_id, result in results.items() if isinstance(result, JudgeResult)}
+
+    def judge_metric(self, metric: MetricDefinition, candidate_text: str, test_case_context: str, sample: int = 0) -> JudgeResult:
+        result = self.judgements.get((metric.id, candidate_text))
+        if result is None:
+            raise RuntimeError("No batch result for this metric")
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def analyze_evaluation_results(self, test_case: TestCase, metric_results: List[Any]) -> str:
+        return ""
+
+def evaluate_items_offline(runnable: List[Tuple[int, BatchEvaluationItem, TestCase, List[MetricDefinition]]], model_name: Optional[str], multi_sample: bool) -> List[Tuple[int, BatchEvaluationItem, Union[EvaluationRunPreviewResponse, Exception]]]:
+    """
+    Bulk evaluation through the Batch API, in two submissions:
+
+    1. every (metric, candidate) judge call across all items,
+    2. one gap analysis per item, built from the judged results.
+
+    Scoring itself still goes through evaluate_test_case, fed by the batch
+    results, so offline runs aggregate exactly like interactive ones.
+    """
+    judge = get_batch_judge(override_model=model_name)
+
+    requests = []
+    keys: Dict[str, Tuple[int, int, str]] = {}
+    for index, item, test_case, metrics in runnable:
+        context_str = build_judge_context(test_case)
+        candidates = select_candidates(item.outputs, multi_sample)
+        screened = prescreen_candidates(test_case, candidates)
+        # Outputs failing the pre-screen are never judged, so they need no batch request
+        for candidate_text in dict.fromkeys(text for c, text in enumerate(candidates) if c not in screened):
+            for metric in metrics:
+                if metric.metric_type != MetricType.LLM_JUDGE:
+                    continue
+                custom_id = f"judge-{len(requests)}"
+                keys[custom_id] = (index, metric.id, candidate_text)
+                requests.append((custom_id, metric, candidate_text, context_str))
+    judged = judge.judge_metrics(requests)
+
+    judgements_by_item: Dict[int, Dict[Tuple[int, str], Union[JudgeResult, Exception]]] = {}
+    for custom_id, (index, metric_id, candidate_text) in keys.items():
+        judgements_by_item.setdefault(index, {})[(metric_id, candidate_text)] = judged[custom_id]
+
+    outcomes: List[Tuple[int, BatchEvaluationItem, Union[EvaluationRunPreviewResponse, Exception]]] = []
+    analysis_requests = []
+    for index, item, test_case, metrics in runnable:
+        provider = _PrecomputedProvider(judgements_by_item.get(index, {}))
+        try:
+            response = evaluate_test_case(test_case, metrics, item.outputs, model_name, multi_sample, provider=provider)
+        except Exception as e:
+            outcomes.append((index, item, e))
+            continue
+        outcomes.append((index, item, response))
+        analysis_requests.append((f"analysis-{index}", test_case, response.metric_results))
+
+    error: Optional[Exception] = None
+    try:
+        analyses = judge.analyze_evaluation_results(analysis_requests)
+    except Exception as e:
+        analyses = {}
+        error = e
+    for index, item, outcome in outcomes:
+        if isinstance(outcome, Exception):
+            continue
+        analysis = analyses.get(f"analysis-{index}")
+        if analysis is None or isinstance(analysis, Exception):
+            # Scores are still valid without the narrative, same as the interactive fallback
+            analysis = f"Gap analysis failed: {analysis if analysis is not None else error}"
+        outcome.gap_analysis = analysis
+    return outcomes
+
+def _record_failure(job: BatchJob, index: int, item: BatchEvaluationItem, error: str) -> None:
+    job.failed += 1
+    job.errors.append({"index": index, "test_case_id": item.test_case_id, "error": error})
+
+def _commit_pending(session: Session, job: BatchJob, pending: List[Any]) -> None:
+    if not pending:
+        return
+    runs = [save_evaluation_run(session, item.test_case_id, eval_response, notes=item.notes, commit=False) for item, eval_response in pending]
+    session.flush()
+    job.run_ids.extend(run.id for run in runs)
+    job.completed += len(runs)
+    # Progress is committed with the runs it counts
+    job.save(session)
+    session.commit()
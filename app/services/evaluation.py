@@ -1,132 +1,672 @@
+import asyncio
+import contextvars
 import json
-from typing import List, Optional, Dict, Any
-from app.models.evaluation import EvaluationRun, MetricResult
+import math
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from sqlmodel import Session, select, update
+from app.core.config import settings
+from app.models.evaluation import EvaluationRun, LLMCallTelemetry, MetricResult, MetricSampleResult
 from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
 from app.models.test_case import TestCase
 from app.services.llm import get_llm_provider
-from app.providers.llm import StubLLMProvider
+from app.services.prescreen import prescreen_output
+from app.services.profile import TestCaseProfile, get_test_case_profile
+from app.services.rules import compile_rule
+from app.services.telemetry import telemetry_row
+from app.providers.llm import AsyncLLMProvider, JudgeProvider, StubLLMProvider, get_async_llm_provider
+from app.providers.telemetry import LLMCallRecord, collect_llm_calls, llm_call_labels
 from app.schemas.evaluation import EvaluationRunPreviewResponse
+from app.schemas.llm_validation import JudgeResult, SampledJudgeResult
 
-def evaluate_test_case(test_case: TestCase, metrics: List[MetricDefinition], outputs: List[str], model_name: Optional[str] = None) -> EvaluationRunPreviewResponse:
+def _judge_llm_metric(provider: JudgeProvider, metric: MetricDefinition, candidate_text: str, context_str: str) -> Tuple[float, str, str, bool]:
     """
-    Deterministic stub for evaluation.
+    Runs a single LLM_JUDGE call and returns (score, explanation, raw_json, failed).
+    Errors are turned into a flagged 0.0 row so one failing metric never aborts
+    the whole evaluation.
     """
-    results = []
-    scores_for_aggregation = []
-    warnings = []
-    
-    # Instantiate provider once
-    provider = get_llm_provider(override_model=model_name)
-    
-    # Construct context context for judgment
-    context_str = f"Test Case: {test_case.name}\nDescription: {test_case.description}\nIntent: {test_case.user_intent}"
-    if test_case.examples:
-        context_str += "\nExamples:\n" + "\n".join([f"- {e.type}: {e.content}" for e in test_case.examples])
-
-    for metric in metrics:
-        score = 0.0
-        explanation = ""
-        raw_json = "{}"
-        
-        # Simple string processing on first output (or join them?)
-        # Requirement implies we evaluate "the output". If multiple, maybe we evaluate the set?
-        # Current stub used outputs[0]. Let's stick to outputs[0] for now or join. 
-        # Usually LLM eval evaluates a single response against criteria.
-        candidate_text = outputs[0] if outputs else ""
-        
-        if metric.metric_type == MetricType.LLM_JUDGE:
-            # Delegate to LLM Provider
-            try:
-                judge_result = provider.judge_metric(metric, candidate_text, context_str)
-                score = judge_result.score
-                explanation = judge_result.explanation
-                raw_json = json.dumps(judge_result.model_dump())
-            except Exception as e:
-                explanation = f"Error during LLM judgment: {str(e)}"
-                score = 0.0
-            
-            if metric.scale_type == ScaleType.BOUNDED:
-                scores_for_aggregation.append(score)
-
-        elif metric.metric_type == MetricType.DETERMINISTIC and metric.scale_type == ScaleType.UNBOUNDED:
-            # Count violations: "guaranteed", "risk-free", "100%"
-            # Keep this separate hardcoded, OR move to provider? 
-            # Provider interface has `judge_metric` which returns a score.
-            # But the deterministic logic (counting tokens) is currently hardcoded here.
-            # Let's keep the hardcoded logic for DETERMINISTIC for now as a fallback/hybrid, 
-            # unless the user wants *everything* through LLM (which might be overkill for regex).
-            # But wait, `judge_metric` in StubProvider returns deterministic hash.
-            # If we want REAL evaluation, we should use the provider for LLM_JUDGE.
-            
-            violations = 0
-            blocklist = ["guaranteed", "risk-free", "100%"]
-            for token in blocklist:
-                violations += candidate_text.lower().count(token)
-            
-            score = float(violations)
-            explanation = f"Found {violations} violations."
-            
-            if metric.target_direction == TargetDirection.LOWER_IS_BETTER:
-                # Invert score: 0 violations is perfect (100)
-                # Any violations is failure (0) - strict zero tolerance
-                # Could be made more granular (e.g. 100 - n*10), but strict is safer for "violations"
-                final_score = 100.0 if violations == 0 else 0.0
-                score = final_score
-                scores_for_aggregation.append(score)
-            else:
-                # Unbounded excluded from aggregate
-                warnings.append(f"Metric '{metric.name}' excluded from aggregate (unbounded).")
-            
-        elif metric.metric_type == MetricType.DETERMINISTIC and metric.scale_type == ScaleType.BOUNDED:
-            # Handle text length range checks with dynamic range from examples
-            text_len = len(candidate_text)
-            
-            # Find desired examples
-            desired_examples = [e for e in test_case.examples if e.type == "desired"]
-            
-            if desired_examples:
-                lengths = [len(e.content) for e in desired_examples]
-                # Calculate dynamic range with 10% buffer
-                min_len = min(lengths)
-                max_len = max(lengths)
-                
-                target_min = int(min_len * 0.9)
-                target_max = int(max_len * 1.1)
-                
-                origin_desc = f"derived from {len(desired_examples)} desired examples"
+    cap = _sample_cap(provider, metric)
+    try:
+        with llm_call_labels(metric_definition_id=metric.id):
+            if cap > 1:
+                return _judged(_judge_sampled(provider, metric, candidate_text, context_str, cap))
+            return _judged(provider.judge_metric(metric, candidate_text, context_str))
+    except Exception as e:
+        return _judge_failure(e)
+
+def _judged(judge_result: JudgeResult) -> Tuple[float, str, str, bool]:
+    return judge_result.score, judge_result.explanation, json.dumps(judge_result.model_dump()), False
+
+def _judge_failure(error: Exception) -> Tuple[float, str, str, bool]:
+    return 0.0, f"Error during LLM judgment: {str(error)}", json.dumps({"error": str(error)}), True
+
+def _sample_cap(provider: Any, metric: MetricDefinition) -> int:
+    """Judge calls allowed for the metric; 1 disables self-consistency sampling."""
+    if not provider.supports_sampling:
+        return 1
+    return max(1, min(metric.judge_max_samples or 1, settings.JUDGE_MAX_SAMPLES_LIMIT))
+
+def _next_wave(metric: MetricDefinition, scores: List[float], drawn: int, cap: int) -> int:
+    """Samples to draw next: 0 once the scores have settled or the cap is reached."""
+    if drawn >= cap or _settled(metric, scores):
+        return 0
+    return min(max(1, settings.JUDGE_SAMPLE_WAVE_SIZE), cap - drawn)
+
+def _settled(metric: MetricDefinition, scores: List[float]) -> bool:
+    threshold = metric.judge_variance_threshold if metric.judge_variance_threshold is not None else settings.JUDGE_VARIANCE_THRESHOLD
+    return len(scores) >= 2 and statistics.variance(scores) <= threshold
+
+def _sampled_result(metric: MetricDefinition, results: List[JudgeResult]) -> SampledJudgeResult:
+    scores = [r.score for r in results]
+    mean = statistics.mean(scores)
+    variance = statistics.variance(scores) if len(scores) > 1 else 0.0
+    # The explanation of the sample that agrees best with the final score
+    closest = min(results, key=lambda r: abs(r.score - mean))
+    return SampledJudgeResult(
+        score=mean,
+        explanation=closest.explanation,
+        samples=len(scores),
+        scores=scores,
+        stddev=math.sqrt(variance),
+        variance=variance,
+        settled=_settled(metric, scores)
+    )
+
+def _judge_sampled(provider: JudgeProvider, metric: MetricDefinition, candidate_text: str, context_str: str, cap: int) -> SampledJudgeResult:
+    """
+    Self-consistency judging: draws judge samples in parallel waves of
+    settings.JUDGE_SAMPLE_WAVE_SIZE until their variance is within the metric's
+    threshold or `cap` calls were made. Failed draws are skipped; only when
+    every draw fails does the judgement fail.
+    """
+    results: List[JudgeResult] = []
+    error: Optional[Exception] = None
+    drawn = 0
+    with ThreadPoolExecutor(max_workers=max(1, settings.JUDGE_SAMPLE_WAVE_SIZE)) as pool:
+        while wave := _next_wave(metric, [r.score for r in results], drawn, cap):
+            futures = [pool.submit(contextvars.copy_context().run, provider.judge_metric, metric, candidate_text, context_str, k) for k in range(drawn, drawn + wave)]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    error = e
+            drawn += wave
+    if not results:
+        raise error
+    return _sampled_result(metric, results)
+
+async def _judge_sampled_async(provider: AsyncLLMProvider, metric: MetricDefinition, candidate_text: str, context_str: str, cap: int, semaphore: asyncio.Semaphore) -> SampledJudgeResult:
+    """Async _judge_sampled; every draw takes its own semaphore slot."""
+    async def draw(k: int) -> JudgeResult:
+        async with semaphore:
+            return await provider.judge_metric(metric, candidate_text, context_str, sample=k)
+
+    results: List[JudgeResult] = []
+    error: Optional[Exception] = None
+    drawn = 0
+    while wave := _next_wave(metric, [r.score for r in results], drawn, cap):
+        for outcome in await asyncio.gather(*(draw(k) for k in range(drawn, drawn + wave)), return_exceptions=True):
+            if isinstance(outcome, Exception):
+                error = outcome
+            elif isinstance(outcome, BaseException):
+                raise outcome
             else:
-                # Fallback to metric definition
-                target_min = metric.scale_min if metric.scale_min is not None else 0
-                target_max = metric.scale_max if metric.scale_max is not None else float('inf')
-                origin_desc = "from metric definition"
-            
-            if target_min <= text_len <= target_max:
-                score = 100.0
-                explanation = f"Text length ({text_len} chars) is within range [{target_min}, {target_max}] ({origin_desc})."
+                results.append(outcome)
+        drawn += wave
+    if not results:
+        raise error
+    return _sampled_result(metric, results)
+
+def _judge_llm_metric_group(provider: JudgeProvider, metrics: List[MetricDefinition], candidate_text: str, context_str: str) -> Dict[int, JudgeResult]:
+    """
+    One multi-metric judge call, keyed by metric id. A failed call or an
+    unsupported provider yields {}, so every metric falls back to its own call.
+    """
+    try:
+        return provider.judge_metrics(metrics, candidate_text, context_str)
+    except Exception:
+        return {}
+
+def _submit(pool: ThreadPoolExecutor, sample_index: int, fn, *args):
+    """pool.submit carrying the caller's telemetry context, with calls labelled by sample."""
+    return pool.submit(contextvars.copy_context().run, _labelled, sample_index, fn, *args)
+
+def _labelled(sample_index: int, fn, *args):
+    with llm_call_labels(sample_index=sample_index):
+        return fn(*args)
+
+def _use_multi_metric_judge(judge_indexes: List[int]) -> bool:
+    return settings.EVAL_MULTI_METRIC_JUDGE and len(judge_indexes) > 1
+
+def _grouped_judge_indexes(provider: Any, metrics: List[MetricDefinition], judge_indexes: List[int]) -> List[int]:
+    """Metrics judged in one multi-metric call ([] when disabled); sampled metrics are always judged on their own."""
+    grouped = [i for i in judge_indexes if _sample_cap(provider, metrics[i]) == 1]
+    return grouped if _use_multi_metric_judge(grouped) else []
+
+def _score_deterministic_metric(metric: MetricDefinition, candidate_text: str, profile: TestCaseProfile) -> Tuple[float, str, bool, bool]:
+    """
+    Returns (score, explanation, include_in_aggregate, failed) for a DETERMINISTIC metric.
+
+    Structured rule_definitions go through the compiled rule engine; free-text
+    definitions keep the legacy blocklist / length-range heuristics. A rule that
+    could not be evaluated (invalid, over its time budget, sandbox unavailable)
+    is flagged as failed, like a failed judge call.
+    """
+    rule = compile_rule(metric)
+    if rule is not None:
+        outcome = rule.evaluate(candidate_text)
+        if outcome.error:
+            return 0.0, outcome.explanation, False, True
+        if outcome.passed is not None:
+            passed = outcome.passed
+        elif metric.target_direction == TargetDirection.LOWER_IS_BETTER:
+            passed = outcome.value == 0
+        else:
+            passed = outcome.value > 0
+
+        if metric.scale_type == ScaleType.UNBOUNDED and metric.target_direction != TargetDirection.LOWER_IS_BETTER:
+            # Raw count, excluded from aggregate
+            return outcome.value, outcome.explanation, False, False
+        return (100.0 if passed else 0.0), outcome.explanation, True, False
+
+    if metric.scale_type == ScaleType.UNBOUNDED:
+        # Count violations: "guaranteed", "risk-free", "100%"
+        violations = 0
+        blocklist = ["guaranteed", "risk-free", "100%"]
+        for token in blocklist:
+            violations += candidate_text.lower().count(token)
+
+        explanation = f"Found {violations} violations."
+
+        if metric.target_direction == TargetDirection.LOWER_IS_BETTER:
+            # Invert score: 0 violations is perfect (100)
+            # Any violations is failure (0) - strict zero tolerance
+            return (100.0 if violations == 0 else 0.0), explanation, True, False
+        # Unbounded excluded from aggregate
+        return float(violations), explanation, False, False
+
+    # BOUNDED: handle text length range checks with dynamic range from examples
+    text_len = len(candidate_text)
+
+    if profile.desired_count:
+        # Calculate dynamic range with 10% buffer
+        target_min = int(profile.desired_min_length * 0.9)
+        target_max = int(profile.desired_max_length * 1.1)
+        origin_desc = f"derived from {profile.desired_count} desired examples"
+    else:
+        # Fallback to metric definition
+        target_min = metric.scale_min if metric.scale_min is not None else 0
+        target_max = metric.scale_max if metric.scale_max is not None else float('inf')
+        origin_desc = "from metric definition"
+
+    if target_min <= text_len <= target_max:
+        return 100.0, f"Text length ({text_len} chars) is within range [{target_min}, {target_max}] ({origin_desc}).", True, False
+    return 0.0, f"Text length ({text_len} chars) is outside range [{target_min}, {target_max}] ({origin_desc}).", True, False
+
+def prescreen_candidates(test_case: TestCase, candidates: List[str]) -> Dict[int, str]:
+    """Candidates failing the local pre-screen, with the reason; {} unless settings.EVAL_PRESCREEN_ENABLED."""
+    if not settings.EVAL_PRESCREEN_ENABLED:
+        return {}
+    profile = get_test_case_profile(test_case)
+    screened = {}
+    for c, candidate_text in enumerate(candidates):
+        reason = prescreen_output(candidate_text, profile)
+        if reason:
+            screened[c] = reason
+    return screened
+
+def _worst_score(metric: MetricDefinition) -> float:
+    scale_min = metric.scale_min if metric.scale_min is not None else 0.0
+    if metric.scale_type == ScaleType.BOUNDED and metric.target_direction == TargetDirection.LOWER_IS_BETTER and metric.scale_max is not None:
+        return metric.scale_max
+    return scale_min
+
+def _init_scored(test_case: TestCase, metrics: List[MetricDefinition], candidates: List[str], screened: Optional[Dict[int, str]] = None) -> List[Tuple[List[Dict[str, Any]], List[Tuple[int, float]], List[str]]]:
+    """
+    Result skeleton per candidate with DETERMINISTIC metrics already scored.
+    LLM_JUDGE rows are filled in by _apply_judgements, except for `screened`
+    candidates: those fail every judge metric with the worst score, marked
+    "short_circuited", and are never sent to the judge.
+    """
+    profile = get_test_case_profile(test_case)
+    screened = screened or {}
+    scored = []
+    for c, candidate_text in enumerate(candidates):
+        # Every metric gets a result row; types without scoring logic keep the 0.0 default
+        results = [
+            {
+                "metric_definition_id": m.id,
+                "metric_name": m.name,
+                "score": 0.0,
+                "explanation": "",
+                "raw_json": "{}"
+            }
+            for m in metrics
+        ]
+        aggregation: List[Tuple[int, float]] = []
+        warnings: List[str] = []
+        for i, metric in enumerate(metrics):
+            if metric.metric_type != MetricType.DETERMINISTIC or metric.scale_type not in (ScaleType.UNBOUNDED, ScaleType.BOUNDED):
+                continue
+            score, explanation, include, failed = _score_deterministic_metric(metric, candidate_text, profile)
+            if failed:
+                warnings.append(f"Metric '{metric.name}' excluded from aggregate (rule not evaluated).")
+                results[i]["failed"] = True
+            elif include:
+                aggregation.append((i, score))
             else:
-                score = 0.0
-                explanation = f"Text length ({text_len} chars) is outside range [{target_min}, {target_max}] ({origin_desc})."
-                
-            scores_for_aggregation.append(score)
-        
-        results.append({
+                warnings.append(f"Metric '{metric.name}' excluded from aggregate (unbounded).")
+            results[i].update({"score": score, "explanation": explanation})
+        if c in screened:
+            reason = screened[c]
+            warnings.append(f"Output failed the pre-screen ({reason}); LLM judges skipped.")
+            for i in _judge_indexes(metrics):
+                score = _worst_score(metrics[i])
+                results[i].update({
+                    "score": score,
+                    "explanation": f"LLM judge skipped: output failed the pre-screen ({reason}).",
+                    "raw_json": json.dumps({"short_circuited": True, "prescreen": reason}),
+                    "short_circuited": True
+                })
+                if metrics[i].scale_type == ScaleType.BOUNDED:
+                    aggregation.append((i, score))
+        scored.append((results, aggregation, warnings))
+    return scored
+
+def _apply_judgements(scored: List[Tuple[List[Dict[str, Any]], List[Tuple[int, float]], List[str]]], metrics: List[MetricDefinition], judgements: Dict[Tuple[int, int], Tuple[float, str, str, bool]]) -> List[Tuple[List[Dict[str, Any]], List[float], List[str]]]:
+    """
+    Merges judge results keyed by (candidate index, metric index); results keep
+    the order of `metrics`. Failed judge calls are excluded from the aggregate
+    so an outage never reads as a genuine 0.0 score.
+    """
+    for (c, i), (score, explanation, raw_json, failed) in sorted(judgements.items()):
+        results, aggregation, warnings = scored[c]
+        if failed:
+            warnings.append(f"Metric '{metrics[i].name}' excluded from aggregate (judge call failed).")
+        elif metrics[i].scale_type == ScaleType.BOUNDED:
+            aggregation.append((i, score))
+        results[i].update({"score": score, "explanation": explanation, "raw_json": raw_json})
+        if failed:
+            results[i]["failed"] = True
+    return [
+        (results, [s for _, s in sorted(aggregation, key=lambda x: x[0])], warnings)
+        for results, aggregation, warnings in scored
+    ]
+
+def _judge_indexes(metrics: List[MetricDefinition]) -> List[int]:
+    return [i for i, m in enumerate(metrics) if m.metric_type == MetricType.LLM_JUDGE]
+
+def _score_outputs(provider: JudgeProvider, test_case: TestCase, metrics: List[MetricDefinition], candidates: List[str], context_str: str) -> List[Tuple[List[Dict[str, Any]], List[float], List[str]]]:
+    """
+    Scores each candidate against every metric and returns, per candidate,
+    (results, scores_for_aggregation, warnings).
+
+    LLM_JUDGE calls for all candidates share one thread pool bounded by
+    settings.EVAL_JUDGE_CONCURRENCY, so large sample sets are judged in parallel
+    batches. DETERMINISTIC metrics are computed inline while the judges are in flight.
+    Results keep the order of `metrics`.
+
+    With settings.EVAL_MULTI_METRIC_JUDGE, each candidate's judge metrics go out
+    as one call; metrics missing from its answer are judged individually.
+    """
+    judge_indexes = _judge_indexes(metrics)
+    grouped = _grouped_judge_indexes(provider, metrics, judge_indexes)
+    screened = prescreen_candidates(test_case, candidates)
+    pool = None
+    futures = {}
+    group_futures = {}
+    judgements = {}
+    total_judgements = len(judge_indexes) * (len(candidates) - len(screened))
+    if total_judgements:
+        pool = ThreadPoolExecutor(max_workers=max(1, min(settings.EVAL_JUDGE_CONCURRENCY, total_judgements)))
+    try:
+        for c, candidate_text in enumerate(candidates):
+            if c in screened:
+                continue
+            if grouped:
+                group_futures[c] = _submit(pool, c, _judge_llm_metric_group, provider, [metrics[i] for i in grouped], candidate_text, context_str)
+            for i in judge_indexes:
+                if i in grouped:
+                    continue
+                futures[(c, i)] = _submit(pool, c, _judge_llm_metric, provider, metrics[i], candidate_text, context_str)
+        scored = _init_scored(test_case, metrics, candidates, screened)
+        for c, group_future in group_futures.items():
+            judged = group_future.result()
+            for i in grouped:
+                if metrics[i].id in judged:
+                    judgements[(c, i)] = _judged(judged[metrics[i].id])
+                else:
+                    futures[(c, i)] = _submit(pool, c, _judge_llm_metric, provider, metrics[i], candidates[c], context_str)
+        judgements.update((key, future.result()) for key, future in futures.items())
+    finally:
+        if pool:
+            pool.shutdown(wait=True)
+    return _apply_judgements(scored, metrics, judgements)
+
+async def _judge_llm_metric_async(provider: AsyncLLMProvider, metric: MetricDefinition, candidate_text: str, context_str: str, semaphore: asyncio.Semaphore) -> Tuple[float, str, str, bool]:
+    """Async _judge_llm_metric; the semaphore bounds in-flight calls."""
+    cap = _sample_cap(provider, metric)
+    try:
+        with llm_call_labels(metric_definition_id=metric.id):
+            if cap > 1:
+                return _judged(await _judge_sampled_async(provider, metric, candidate_text, context_str, cap, semaphore))
+            async with semaphore:
+                return _judged(await provider.judge_metric(metric, candidate_text, context_str))
+    except Exception as e:
+        return _judge_failure(e)
+
+async def _judge_candidate_async(provider: AsyncLLMProvider, metrics: List[MetricDefinition], judge_indexes: List[int], c: int, candidate_text: str, context_str: str, semaphore: asyncio.Semaphore) -> List[Tuple[Tuple[int, int], Tuple[float, str, str, bool]]]:
+    """Multi-metric judging of one candidate, with concurrent per-metric fallback for whatever is missing."""
+    with llm_call_labels(sample_index=c):
+        async with semaphore:
+            try:
+                judged = await provider.judge_metrics([metrics[i] for i in judge_indexes], candidate_text, context_str)
+            except Exception:
+                judged = {}
+        missing = [i for i in judge_indexes if metrics[i].id not in judged]
+        fallback = await asyncio.gather(*(_judge_llm_metric_async(provider, metrics[i], candidate_text, context_str, semaphore) for i in missing))
+    results = {(c, i): _judged(judged[metrics[i].id]) for i in judge_indexes if metrics[i].id in judged}
+    results.update(((c, i), judgement) for i, judgement in zip(missing, fallback))
+    return sorted(results.items())
+
+def _summarize_samples(metrics: List[MetricDefinition], sample_results: List[List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Collapses per-output results into one result per metric (score = mean) and
+    the matching mean/stddev/min/max stats. Failed judge calls and rule evaluations are left out.
+    """
+    summary = []
+    stats = []
+    for i, metric in enumerate(metrics):
+        scores = [results[i]["score"] for results in sample_results if not results[i].get("failed")]
+        if not scores:
+            attempts = "judge calls" if metric.metric_type == MetricType.LLM_JUDGE else "rule evaluations"
+            summary.append({**sample_results[0][i], "explanation": f"All {len(sample_results)} {attempts} failed. {sample_results[0][i]['explanation']}"})
+            continue
+        metric_stats = {
+            "metric_definition_id": metric.id,
+            "metric_name": metric.name,
+            "count": len(scores),
+            "mean": statistics.fmean(scores),
+            "stddev": statistics.stdev(scores) if len(scores) > 1 else 0.0,
+            "min": min(scores),
+            "max": max(scores)
+        }
+        stats.append(metric_stats)
+        summary.append({
             "metric_definition_id": metric.id,
             "metric_name": metric.name,
-            "score": score,
-            "explanation": explanation,
-            "raw_json": raw_json
+            "score": metric_stats["mean"],
+            "explanation": f"Mean of {len(scores)} outputs (stddev {metric_stats['stddev']:.2f}, min {metric_stats['min']:.1f}, max {metric_stats['max']:.1f}).",
+            "raw_json": json.dumps(metric_stats)
         })
-    
-    aggregated_score = sum(scores_for_aggregation) / len(scores_for_aggregation) if scores_for_aggregation else None
-    
+    return summary, stats
 
-    # Generate Gap Analysis
-    provider = get_llm_provider()
-    gap_analysis = provider.analyze_evaluation_results(test_case, results)
+def build_judge_context(test_case: TestCase) -> str:
+    # Rendered once per test case and cached with its profile
+    return get_test_case_profile(test_case).context
+
+def select_candidates(outputs: List[str], multi_sample: bool) -> List[str]:
+    # Usually LLM eval evaluates a single response against criteria.
+    if multi_sample and outputs:
+        return list(outputs)
+    return [outputs[0] if outputs else ""]
+
+def _collect_results(metrics: List[MetricDefinition], scored: List[Tuple[List[Dict[str, Any]], List[float], List[str]]], multi_sample: bool) -> EvaluationRunPreviewResponse:
+    """Builds the response from scored candidates; gap_analysis is left for the caller."""
+    # Keep each distinct warning once across samples
+    warnings = list(dict.fromkeys(w for _, _, sample_warnings in scored for w in sample_warnings))
+
+    metric_stats = []
+    sample_results = []
+    if multi_sample:
+        results, metric_stats = _summarize_samples(metrics, [r for r, _, _ in scored])
+        per_sample_aggregates = [sum(agg) / len(agg) for _, agg, _ in scored if agg]
+        aggregated_score = statistics.fmean(per_sample_aggregates) if per_sample_aggregates else None
+        for index, (sample, _, _) in enumerate(scored):
+            sample_results.extend({**r, "sample_index": index} for r in sample)
+    else:
+        results, scores_for_aggregation, _ = scored[0]
+        aggregated_score = sum(scores_for_aggregation) / len(scores_for_aggregation) if scores_for_aggregation else None
 
     return EvaluationRunPreviewResponse(
         metric_results=results,
         aggregated_score=aggregated_score,
-        gap_analysis=gap_analysis,
-        warnings=warnings
+        gap_analysis="",
+        warnings=warnings,
+        metric_stats=metric_stats,
+        sample_results=sample_results
+    )
+
+def evaluate_test_case(test_case: TestCase, metrics: List[MetricDefinition], outputs: List[str], model_name: Optional[str] = None, multi_sample: bool = False, provider: Optional[JudgeProvider] = None, calls: Optional[List[LLMCallRecord]] = None) -> EvaluationRunPreviewResponse:
+    """
+    Scores the candidate output against every metric.
+
+    By default only outputs[0] is scored. With multi_sample=True every output is
+    scored; metric_results then hold the per-metric mean, metric_stats the
+    spread and sample_results the individual per-output results.
+
+    `provider` replaces the configured providers for both judging and gap
+    analysis (used by offline batch judging). Provider call records are
+    appended to `calls`, also when the evaluation fails.
+    """
+    # Instantiate provider once
+    judge_provider = provider or get_llm_provider(override_model=model_name)
+
+    context_str = build_judge_context(test_case)
+    candidates = select_candidates(outputs, multi_sample)
+
+    with collect_llm_calls(calls) as calls:
+        scored = _score_outputs(judge_provider, test_case, metrics, candidates, context_str)
+        response = _collect_results(metrics, scored, multi_sample)
+
+        # Generate Gap Analysis
+        analysis_provider = provider or get_llm_provider()
+        response.gap_analysis = analysis_provider.analyze_evaluation_results(test_case, response.metric_results)
+    response._telemetry = calls
+    return response
+
+async def stream_test_case_evaluation(test_case: TestCase, metrics: List[MetricDefinition], outputs: List[str], model_name: Optional[str] = None, multi_sample: bool = False, calls: Optional[List[LLMCallRecord]] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    evaluate_test_case for async routes, yielding (event, payload) pairs as
+    results arrive:
+
+    - "metric": one result row per metric (and per output with multi_sample),
+      DETERMINISTIC ones (and pre-screened judge rows) first, then each
+      LLM_JUDGE as its call completes
+    - "aggregate": aggregated_score, warnings and metric_stats
+    - "gap_analysis": the gap analysis text
+    - "result": the complete EvaluationRunPreviewResponse
+
+    Judge calls are awaited on the event loop, at most
+    settings.EVAL_JUDGE_CONCURRENCY at a time. Provider call records are
+    appended to `calls` as they finish, so a caller can keep the ones made
+    before a client disconnect.
+    """
+    judge_provider = get_async_llm_provider(override_model=model_name)
+
+    context_str = build_judge_context(test_case)
+    candidates = select_candidates(outputs, multi_sample)
+
+    screened = prescreen_candidates(test_case, candidates)
+    scored = _init_scored(test_case, metrics, candidates, screened)
+    judge_indexes = set(_judge_indexes(metrics))
+    for c, (results, _, _) in enumerate(scored):
+        for i, row in enumerate(results):
+            if i not in judge_indexes or c in screened:
+                yield "metric", _event_row(row, c, multi_sample)
+
+    semaphore = asyncio.Semaphore(max(1, settings.EVAL_JUDGE_CONCURRENCY))
+
+    async def judge(c: int, i: int) -> List[Tuple[Tuple[int, int], Tuple[float, str, str, bool]]]:
+        with llm_call_labels(sample_index=c):
+            return [((c, i), await _judge_llm_metric_async(judge_provider, metrics[i], candidates[c], context_str, semaphore))]
+
+    # Tasks copy the context they are created in, so the collector is only set
+    # around task creation (and the gap analysis), never across a yield
+    calls = calls if calls is not None else []
+    ordered_judges = sorted(judge_indexes)
+    grouped = _grouped_judge_indexes(judge_provider, metrics, ordered_judges)
+    with collect_llm_calls(calls):
+        # With multi-metric judging, one task per candidate: its grouped metrics arrive together
+        tasks = [
+            asyncio.ensure_future(_judge_candidate_async(judge_provider, metrics, grouped, c, candidate_text, context_str, semaphore))
+            for c, candidate_text in enumerate(candidates) if grouped and c not in screened
+        ]
+        tasks += [asyncio.ensure_future(judge(c, i)) for c in range(len(candidates)) for i in ordered_judges if i not in grouped and c not in screened]
+    judgements: Dict[Tuple[int, int], Tuple[float, str, str, bool]] = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for (c, i), judgement in await next_done:
+                judgements[(c, i)] = judgement
+                score, explanation, raw_json, failed = judgement
+                row = {**scored[c][0][i], "score": score, "explanation": explanation, "raw_json": raw_json}
+                if failed:
+                    row["failed"] = True
+                yield "metric", _event_row(row, c, multi_sample)
+    finally:
+        # The client may disconnect mid-stream: don't leave judge calls running
+        for task in tasks:
+            task.cancel()
+
+    response = _collect_results(metrics, _apply_judgements(scored, metrics, judgements), multi_sample)
+    yield "aggregate", {
+        "aggregated_score": response.aggregated_score,
+        "warnings": response.warnings,
+        "metric_stats": response.metric_stats
+    }
+
+    # Generate Gap Analysis
+    analysis_provider = get_async_llm_provider()
+    with collect_llm_calls(calls):
+        response.gap_analysis = await analysis_provider.analyze_evaluation_results(test_case, response.metric_results)
+    response._telemetry = calls
+    yield "gap_analysis", {"gap_analysis": response.gap_analysis}
+    yield "result", response
+
+def _event_row(row: Dict[str, Any], sample_index: int, multi_sample: bool) -> Dict[str, Any]:
+    return {**row, "sample_index": sample_index} if multi_sample else dict(row)
+
+async def evaluate_test_case_async(test_case: TestCase, metrics: List[MetricDefinition], outputs: List[str], model_name: Optional[str] = None, multi_sample: bool = False, calls: Optional[List[LLMCallRecord]] = None) -> EvaluationRunPreviewResponse:
+    """
+    evaluate_test_case for async routes. Judge calls are awaited on the event
+    loop, so a worker can hold many evaluations in flight without using a
+    thread for each call. Results are identical to the sync path.
+    """
+    async for event, payload in stream_test_case_evaluation(test_case, metrics, outputs, model_name, multi_sample, calls):
+        if event == "result":
+            return payload
+    raise RuntimeError("Evaluation stream ended without a result")
+
+def _next_version_number(session: Session, test_case_id: int) -> int:
+    """
+    Increments the test case's version counter in the caller's transaction.
+    The UPDATE takes the write lock, so concurrent commits for the same test
+    case get distinct versions; the counter and the run commit (or roll back)
+    together.
+    """
+    version = session.execute(
+        update(TestCase)
+        .where(TestCase.id == test_case_id)
+        .values(last_version_number=TestCase.last_version_number + 1)
+        .returning(TestCase.last_version_number)
+    ).scalar()
+    if version is None:
+        raise ValueError("TestCase not found")
+    return version
+
+def _add_results(session: Session, run: EvaluationRun, eval_response: EvaluationRunPreviewResponse) -> None:
+    run.aggregated_score = eval_response.aggregated_score
+    run.gap_analysis = eval_response.gap_analysis
+    session.add(run)
+
+    # Create Results
+    metric_results = {}
+    for res in eval_response.metric_results:
+        metric_results[res["metric_definition_id"]] = MetricResult(
+            evaluation_run_id=run.id,
+            metric_definition_id=res["metric_definition_id"],
+            score=res["score"],
+            reasoning=res["explanation"], # Mapping explanation to reasoning
+            metric_name=res["metric_name"],
+            explanation=res["explanation"],
+            raw_json=res["raw_json"]
+        )
+        session.add(metric_results[res["metric_definition_id"]])
+
+    # Per-output results (multi-sample runs only)
+    for res in eval_response.sample_results:
+        session.add(MetricSampleResult(
+            evaluation_run_id=run.id,
+            metric_definition_id=res["metric_definition_id"],
+            sample_index=res["sample_index"],
+            score=res["score"],
+            reasoning=res["explanation"],
+            metric_name=res["metric_name"],
+            explanation=res["explanation"],
+            raw_json=res["raw_json"]
+        ))
+
+    _add_telemetry(session, run, metric_results, eval_response._telemetry)
+
+def _add_telemetry(session: Session, run: EvaluationRun, metric_results: Dict[int, MetricResult], calls: List[Any]) -> None:
+    """
+    Provider call records of the run; judge calls are linked to their metric's
+    MetricResult. Calls already stored by a preview are linked, not copied.
+    """
+    if not calls:
+        return
+    session.flush()
+    test_case = session.get(TestCase, run.test_case_id)
+    project_id = test_case.project_id if test_case else None
+    for call in calls:
+        metric_result = metric_results.get(call.metric_definition_id)
+        metric_result_id = metric_result.id if metric_result else None
+        row = session.get(LLMCallTelemetry, call.telemetry_id) if call.telemetry_id is not None else None
+        if row is not None:
+            row.evaluation_run_id = run.id
+            row.metric_result_id = metric_result_id
+            session.add(row)
+        else:
+            session.add(telemetry_row(call, project_id, run.test_case_id, run.id, metric_result_id))
+
+def save_evaluation_run(session: Session, test_case_id: int, eval_response: EvaluationRunPreviewResponse, notes: Optional[str] = None, commit: bool = True) -> EvaluationRun:
+    """
+    Persists an evaluation as the next version of the test case, with its metric
+    (and multi-sample) results. With commit=False the caller owns the
+    transaction, so many runs can be written in one commit.
+    """
+    run = EvaluationRun(
+        test_case_id=test_case_id,
+        version_number=_next_version_number(session, test_case_id),
+        status="completed",
+        notes=notes
+    )
+    session.add(run)
+    session.flush()
+    _add_results(session, run, eval_response)
+
+    if commit:
+        session.commit()
+        session.refresh(run)
+    return run
+
+def create_pending_run(session: Session, test_case_id: int, notes: Optional[str] = None) -> EvaluationRun:
+    """Reserves the next version as a "pending" run; results are filled in by complete_evaluation_run."""
+    run = EvaluationRun(
+        test_case_id=test_case_id,
+        version_number=_next_version_number(session, test_case_id),
+        status="pending",
+        notes=notes
     )
+    session.add(run)
+    session.commit()
+    session.refresh(run)
+    return run
+
+def complete_evaluation_run(session: Session, run: EvaluationRun, eval_response: EvaluationRunPreviewResponse) -> EvaluationRun:
+    _add_results(session, run, eval_response)
+    run.status = "completed"
+    session.commit()
+    session.refresh(run)
+    return run
@@ -0,0 +1,39 @@
+"""
+Local pre-screen run before LLM judging (settings.EVAL_PRESCREEN_ENABLED).
+
+Catches outputs that are obviously broken without spending a judge call: empty,
+truncated or runaway length compared to the desired examples, a near-verbatim
+copy of a "current" (known flawed) example, or lexically unrelated to every
+desired example (typically the wrong language or garbage). Each check is
+skipped when the test case has no examples to compare against.
+"""
+from typing import Optional
+
+from app.core.config import settings
+from app.services.profile import TestCaseProfile
+from app.services.vectorizer import cosine_similarity, hash_vector
+
+def prescreen_output(candidate_text: str, profile: TestCaseProfile) -> Optional[str]:
+    """Reason the output fails the pre-screen, or None if it should be judged."""
+    if not candidate_text.strip():
+        return "empty output"
+
+    length = len(candidate_text)
+    if profile.desired_count:
+        if length < profile.desired_min_length * settings.PRESCREEN_MIN_LENGTH_RATIO:
+            return f"truncated: {length} chars, the shortest desired example has {profile.desired_min_length}"
+        if length > profile.desired_max_length * settings.PRESCREEN_MAX_LENGTH_RATIO:
+            return f"length outlier: {length} chars, the longest desired example has {profile.desired_max_length}"
+
+    if not profile.desired_texts and not profile.current_texts:
+        return None
+    vector = hash_vector(candidate_text)
+    desired_similarity = max((cosine_similarity(vector, v) for v in profile.desired_vectors), default=None)
+    current_similarity = max((cosine_similarity(vector, v) for v in profile.current_vectors), default=None)
+
+    if current_similarity is not None and current_similarity >= settings.PRESCREEN_COPY_SIMILARITY:
+        if desired_similarity is None or current_similarity > desired_similarity:
+            return f"copy of a current (flawed) example: similarity {current_similarity:.2f}"
+    if desired_similarity is not None and desired_similarity < settings.PRESCREEN_MIN_SIMILARITY:
+        return f"unrelated to the desired examples (wrong language?): similarity {desired_similarity:.2f}"
+    return None
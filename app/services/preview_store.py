@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.models.metric import MetricDefinition
+from app.providers.cache import metric_fingerprint
+from app.schemas.evaluation import EvaluationRunPreviewResponse
+from app.services.profile import TestCaseProfile
+
+def metric_set_fingerprint(metrics: List[MetricDefinition]) -> str:
+    """Changes whenever a metric is added, removed, or its definition edited."""
+    payload = sorted(([m.id, metric_fingerprint(m)] for m in metrics), key=lambda x: x[0])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def profile_fingerprint(profile: TestCaseProfile) -> str:
+    """Changes with the test case's fields and examples: the judge context holds all of them."""
+    return hashlib.sha256(profile.context.encode("utf-8")).hexdigest()
+
+@dataclass
+class StoredPreview:
+    test_case_id: int
+    metrics_fingerprint: str
+    profile_fingerprint: str
+    outputs: List[str]
+    multi_sample: bool
+    model_name: Optional[str]
+    response: EvaluationRunPreviewResponse
+    expires_at: float
+
+class PreviewStore:
+    """
+    In-process, short-lived store of preview results so a commit can persist
+    exactly what the user previewed without re-running the judges.
+    Handles are single use and expire after `ttl_seconds`.
+    """
+    def __init__(self, ttl_seconds: int = 600, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, StoredPreview] = {}
+        self._lock = threading.Lock()
+
+    def put(self, test_case_id: int, metrics: List[MetricDefinition], profile: TestCaseProfile, outputs: List[str], multi_sample: bool, model_name: Optional[str], response: EvaluationRunPreviewResponse) -> StoredPreview:
+        now = time.time()
+        entry = StoredPreview(
+            test_case_id=test_case_id,
+            metrics_fingerprint=metric_set_fingerprint(metrics),
+            profile_fingerprint=profile_fingerprint(profile),
+            outputs=list(outputs),
+            multi_sample=multi_sample,
+            model_name=model_name,
+            response=response,
+            expires_at=now + self.ttl_seconds
+        )
+        preview_id = uuid.uuid4().hex
+        with self._lock:
+            self._purge(now)
+            if len(self._entries) >= self.max_entries:
+                # Drop the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k].expires_at)
+                del self._entries[oldest]
+            self._entries[preview_id] = entry
+        response.preview_id = preview_id
+        return entry
+
+    def take(self, preview_id: str, test_case_id: int, metrics: List[MetricDefinition], profile: TestCaseProfile, outputs: List[str], multi_sample: bool, model_name: Optional[str]) -> Optional[EvaluationRunPreviewResponse]:
+        """
+        Returns the stored response if the handle is still valid for this exact
+        request, otherwise None (caller should evaluate from scratch).
+        """
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(preview_id)
+            if not entry:
+                return None
+            if (entry.test_case_id != test_case_id
+                    or entry.outputs != list(outputs)
+                    or entry.multi_sample != multi_sample
+                    or entry.model_name != model_name
+                    or entry.metrics_fingerprint != metric_set_fingerprint(metrics)
+                    or entry.profile_fingerprint != profile_fingerprint(profile)):
+                return None
+            del self._entries[preview_id]
+        return entry.response
+
+    def _purge(self, now: float) -> None:
+        expired = [k for k, v in self._entries.items() if v.expires_at < now]
+        for k in expired:
+            del self._entries[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+preview_store = PreviewStore(ttl_seconds=settings.PREVIEW_TTL_SECONDS)
@@ -0,0 +1,98 @@
+"""
+Per-test-case evaluation profile.
+
+Everything an evaluation derives from a test case and its examples (the judge
+context and the desired-example length range) is computed once and kept in an
+LRU keyed by test case identity and its own fields. Changing the name,
+description or intent therefore yields a new key. Example changes don't touch
+the test case row, so `create_example` invalidates explicitly. A cache hit
+never loads `test_case.examples`.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from typing import Optional, Tuple
+
+from app.models.test_case import ExampleType, TestCase
+from app.services.vectorizer import SparseVector, hash_vector
+
+@dataclass(frozen=True)
+class TestCaseProfile:
+    context: str # Judge context: test case fields followed by every example
+    example_count: int
+    desired_count: int
+    # Length range of the desired examples, None without any
+    desired_min_length: Optional[int] = None
+    desired_max_length: Optional[int] = None
+    desired_texts: Tuple[str, ...] = ()
+    current_texts: Tuple[str, ...] = ()
+
+    # Vectorized on first use: only the pre-screen needs them
+    @cached_property
+    def desired_vectors(self) -> Tuple[SparseVector, ...]:
+        return tuple(hash_vector(text) for text in self.desired_texts)
+
+    @cached_property
+    def current_vectors(self) -> Tuple[SparseVector, ...]:
+        return tuple(hash_vector(text) for text in self.current_texts)
+
+def build_test_case_profile(test_case: TestCase) -> TestCaseProfile:
+    examples = test_case.examples
+    context = f"Test Case: {test_case.name}\nDescription: {test_case.description}\nIntent: {test_case.user_intent}"
+    if examples:
+        context += "\nExamples:\n" + "\n".join([f"- {e.type}: {e.content}" for e in examples])
+    desired_texts = tuple(e.content for e in examples if e.type == ExampleType.DESIRED)
+    desired_lengths = [len(text) for text in desired_texts]
+    return TestCaseProfile(
+        context=context,
+        example_count=len(examples),
+        desired_count=len(desired_lengths),
+        desired_min_length=min(desired_lengths) if desired_lengths else None,
+        desired_max_length=max(desired_lengths) if desired_lengths else None,
+        desired_texts=desired_texts,
+        current_texts=tuple(e.content for e in examples if e.type == ExampleType.CURRENT)
+    )
+
+class TestCaseProfileCache:
+    """LRU of profiles keyed by (id, created_at, name, description, user_intent)."""
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Optional[int], Optional[datetime], str, Optional[str], Optional[str]], TestCaseProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, test_case: TestCase) -> TestCaseProfile:
+        if test_case.id is None:
+            return build_test_case_profile(test_case)
+        # created_at tells a new test case apart from a deleted one whose id was reused
+        key = (test_case.id, test_case.created_at, test_case.name, test_case.description, test_case.user_intent)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        profile = build_test_case_profile(test_case)
+        with self._lock:
+            self._entries[key] = profile
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, test_case_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == test_case_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+profile_cache = TestCaseProfileCache()
+
+def get_test_case_profile(test_case: TestCase) -> TestCaseProfile:
+    return profile_cache.get(test_case)
+
+def invalidate_test_case_profile(test_case_id: int) -> None:
+    """Call after adding, changing or removing an example of the test case."""
+    profile_cache.invalidate(test_case_id)
@@ -0,0 +1,140 @@
+import multiprocessing
+import queue
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+# Stdlib-only on purpose: worker processes import this module on spawn and
+# should not pay for the app's settings/models imports.
+
+STARTUP_TIMEOUT = 30.0
+# Upper bound for handing the text to a worker; only the match itself counts against a rule's budget
+TRANSFER_TIMEOUT = 30.0
+
+class SandboxError(Exception):
+    """The pattern was not evaluated: timeout, no free worker, a crashed worker or a failing pattern."""
+
+class SandboxTimeout(SandboxError):
+    pass
+
+class SandboxBusy(SandboxError):
+    pass
+
+def _worker_loop(conn) -> None:
+    patterns: Dict[Tuple[str, int], "re.Pattern"] = {}
+    conn.send("ready")
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        source, flags, text = message
+        # Received: the parent starts the match budget from here
+        conn.send("started")
+        try:
+            key = (source, flags)
+            if key not in patterns:
+                if len(patterns) > 256:
+                    patterns.clear()
+                patterns[key] = re.compile(source, flags)
+            conn.send((True, sum(1 for _ in patterns[key].finditer(text))))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Startup time must not count against a rule's budget
+        try:
+            if not self.conn.poll(STARTUP_TIMEOUT):
+                raise SandboxError("rule worker failed to start")
+            self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.kill()
+            raise SandboxError(f"rule worker failed to start: {e!r}")
+        except SandboxError:
+            self.kill()
+            raise
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def run(self, source: str, flags: int, text: str, timeout: float) -> int:
+        self.conn.send((source, flags, text))
+        if not self.conn.poll(TRANSFER_TIMEOUT):
+            raise SandboxBusy("rule worker did not accept the text")
+        self.conn.recv()
+        if not self.conn.poll(timeout):
+            raise SandboxTimeout()
+        ok, value = self.conn.recv()
+        if not ok:
+            raise SandboxError(value)
+        return value
+
+class RegexSandbox:
+    """
+    Runs untrusted regexes in helper processes so a catastrophic pattern can be
+    killed once it exceeds its time budget. A stdlib `re` match holds the GIL
+    and cannot be interrupted from another thread, so a process is the only
+    reliable boundary.
+    """
+    def __init__(self, size: int = 2):
+        self.size = size
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if not self._started:
+                # Workers start lazily, on the first slot taken
+                for _ in range(self.size):
+                    self._idle.put(None)
+                self._started = True
+
+    def count_matches(self, source: str, flags: int, text: str, timeout: float, wait: float = 5.0) -> int:
+        self._ensure_started()
+        try:
+            worker = self._idle.get(timeout=wait)
+        except queue.Empty:
+            raise SandboxBusy("rule workers busy")
+        try:
+            if worker is None or not worker.alive():
+                worker = None
+                worker = _Worker(self._ctx)
+            try:
+                return worker.run(source, flags, text, timeout)
+            except (EOFError, OSError) as e:
+                # The worker died mid-call; the next caller starts a fresh one
+                worker.kill()
+                worker = None
+                raise SandboxError(f"rule worker crashed: {e!r}")
+            except (SandboxTimeout, SandboxBusy):
+                # Still busy with this call: only a fresh worker is safe to reuse
+                worker.kill()
+                worker = None
+                raise
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.kill()
+        with self._lock:
+            self._started = False
+
+sandbox = RegexSandbox()
@@ -9,6 +9,7 @@ from app.models.report import Report, ReportScope
 from app.schemas.report import ReportContent, ReportContentMetricDelta, ReportRequest, ReportResponse
 
 from app.providers.llm import get_llm_provider
+from app.services.telemetry import record_llm_calls
 
 def generate_narrative_for_test_case(content: ReportContent, model_name: Optional[str] = None) -> str:
     provider = get_llm_provider(override_model=model_name)
@@ -19,7 +20,8 @@ def create_test_case_report(session: Session, test_case_id: int, start: Optional
     if not test_case:
         raise ValueError("TestCase not found")
         
-    query = select(EvaluationRun).where(EvaluationRun.test_case_id == test_case_id)
+    # Pending, running and failed runs have no results to compare
+    query = select(EvaluationRun).where(EvaluationRun.test_case_id == test_case_id).where(EvaluationRun.status == "completed")
     
     if start_version and end_version:
         query = query.where(EvaluationRun.version_number >= start_version).where(EvaluationRun.version_number <= end_version)
@@ -109,7 +111,8 @@ def create_test_case_report(session: Session, test_case_id: int, start: Optional
     }
     
     provider = get_llm_provider(override_model=model_name)
-    narrative = provider.generate_report_narrative(context_data)
+    with record_llm_calls(session.get_bind(), test_case.project_id, test_case_id):
+        narrative = provider.generate_report_narrative(context_data)
     
     report = Report(
         scope_type=ReportScope.TEST_CASE,
@@ -151,6 +154,7 @@ def create_project_report(session: Session, project_id: int, start: datetime, en
             
             runs = session.exec(select(EvaluationRun)
                         .where(EvaluationRun.test_case_id == tc.id)
+                        .where(EvaluationRun.status == "completed")
                         .where(EvaluationRun.created_at >= start)
                         .where(EvaluationRun.created_at <= end)
                         .order_by(EvaluationRun.created_at.asc())).all()
@@ -212,6 +216,7 @@ def generate_test_case_word_report(session: Session, report_id: int) -> io.Bytes
     # Assuming start_date/end_date inclusive
     runs = session.exec(select(EvaluationRun)
         .where(EvaluationRun.test_case_id == test_case_id)
+        .where(EvaluationRun.status == "completed")
         .where(EvaluationRun.created_at >= report.start_date)
         .where(EvaluationRun.created_at <= report.end_date)
         .order_by(EvaluationRun.created_at.asc())
@@ -242,7 +247,8 @@ def generate_test_case_word_report(session: Session, report_id: int) -> io.Bytes
              
              results_dicts = [{"metric_name": mr.metric_name, "score": mr.score, "explanation": mr.explanation} for mr in r.metric_results]
              
-             analysis = provider.analyze_evaluation_results(test_case, results_dicts)
+             with record_llm_calls(session.get_bind(), test_case.project_id if test_case else None, test_case_id, r.id):
+                 analysis = provider.analyze_evaluation_results(test_case, results_dicts)
              r.gap_analysis = analysis
              session.add(r)
              session.commit()
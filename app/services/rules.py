@@ -0,0 +1,271 @@
+r"""
+Rule engine for DETERMINISTIC metrics.
+
+`MetricDefinition.rule_definition` may hold a JSON object:
+
+    {"type": "regex", "pattern": "\\bguaranteed\\b", "flags": "i", "max": 0}
+    {"type": "substrings", "values": ["guaranteed", "risk-free"], "case_sensitive": false}
+    {"type": "word_count", "min": 50, "max": 120}
+    {"type": "char_count", "max": 280}
+    {"type": "sentence_count", "min": 2}
+
+Every rule measures a number (match count or length); the optional `min`/`max`
+keys are numeric bounds that decide pass/fail. A plain string starting with
+"regex:" is accepted as a regex rule. Anything else is free text, which
+`compile_rule` reports as None so the caller can use its legacy heuristics.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.metric import MetricDefinition
+from app.services.regex_sandbox import sandbox, SandboxError, SandboxTimeout
+
+try:
+    # Optional: the `regex` package supports a per-call timeout, which lets us
+    # enforce the time budget in-process. Without it, untrusted patterns run in
+    # the killable helper processes of app.services.regex_sandbox.
+    import regex as regex_module
+except ImportError:
+    regex_module = None
+
+COUNT_TYPES = {"word_count", "char_count", "sentence_count"}
+RULE_TYPES = {"regex", "substrings"} | COUNT_TYPES
+
+# Nested quantifiers such as (a+)+ or (\w*)* are the classic catastrophic-backtracking shapes
+NESTED_QUANTIFIER = re.compile(r"\((?:[^()\\]|\\.)*[+*}]\)[+*{]")
+SENTENCE = re.compile(r"[^.!?\n]*[^\s.!?][^.!?\n]*(?:[.!?]+|$)")
+# A pattern that overruns its budget this many times in a row is skipped for SUSPEND_SECONDS,
+# so a catastrophic regex can't stall every evaluation, but one slow call doesn't disable it
+TIMEOUT_STRIKES = 3
+SUSPEND_SECONDS = 300.0
+
+class RuleError(ValueError):
+    pass
+
+@dataclass
+class RuleOutcome:
+    value: float
+    passed: Optional[bool] # None when the rule has no bounds
+    explanation: str
+    error: Optional[str] = None
+
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Builds a single regex from a prefix trie of the words, so hundreds of
+    literals are matched in one left-to-right scan instead of trying every
+    alternative at every position. Longer words win over their prefixes.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        ends_here = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted((k, v) for k, v in node.items() if k != "")]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if ends_here else body
+
+    return build(trie)
+
+def _parse_flags(flags: str) -> int:
+    value = 0
+    for f in flags or "":
+        if f == "i":
+            value |= re.IGNORECASE
+        elif f == "m":
+            value |= re.MULTILINE
+        elif f == "s":
+            value |= re.DOTALL
+        else:
+            raise RuleError(f"Unsupported regex flag '{f}'")
+    return value
+
+@dataclass
+class CompiledRule:
+    rule_type: str
+    description: str
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    pattern: Any = None
+    untrusted: bool = False # User/LLM-written regex: enforce the time budget
+    disabled_reason: Optional[str] = None # Invalid rule, never evaluated
+    timeouts: int = 0 # Consecutive budget overruns
+    suspended_until: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def measure(self, text: str) -> float:
+        if self.rule_type == "char_count":
+            return float(len(text))
+        if self.rule_type == "word_count":
+            return float(len(text.split()))
+        if self.rule_type == "sentence_count":
+            return float(sum(1 for _ in SENTENCE.finditer(text)))
+        if self.untrusted and regex_module is not None:
+            try:
+                return float(sum(1 for _ in self.pattern.finditer(text, timeout=settings.RULE_TIME_BUDGET_MS / 1000)))
+            except TimeoutError:
+                raise _BudgetExceeded()
+        if self.untrusted:
+            return _measure_with_budget(self.pattern, text)
+        return float(sum(1 for _ in self.pattern.finditer(text)))
+
+    def evaluate(self, text: str) -> RuleOutcome:
+        """Outcomes with `error` set measured nothing: callers must not score them."""
+        if self.disabled_reason:
+            return RuleOutcome(0.0, None, f"Rule disabled: {self.disabled_reason}", error=self.disabled_reason)
+        if self.suspended_until > time.monotonic():
+            reason = f"suspended after {TIMEOUT_STRIKES} consecutive overruns of the {settings.RULE_TIME_BUDGET_MS}ms time budget"
+            return RuleOutcome(0.0, None, f"Rule not evaluated: {reason}", error=reason)
+        try:
+            value = self.measure(text)
+        except _BudgetExceeded:
+            reason = f"exceeded {settings.RULE_TIME_BUDGET_MS}ms time budget"
+            with self._lock:
+                self.timeouts += 1
+                if self.timeouts >= TIMEOUT_STRIKES:
+                    self.suspended_until = time.monotonic() + SUSPEND_SECONDS
+                    self.timeouts = 0
+            return RuleOutcome(0.0, None, f"Rule not evaluated: {reason}", error=reason)
+        except _BudgetUnavailable as e:
+            return RuleOutcome(0.0, None, f"Rule not evaluated: {e}", error=str(e))
+        if self.timeouts:
+            with self._lock:
+                self.timeouts = 0
+
+        passed = None
+        if self.min_value is not None or self.max_value is not None:
+            passed = (self.min_value is None or value >= self.min_value) and (self.max_value is None or value <= self.max_value)
+        bounds = ""
+        if passed is not None:
+            bounds = f" (allowed [{self.min_value if self.min_value is not None else '-inf'}, {self.max_value if self.max_value is not None else 'inf'}])"
+        return RuleOutcome(value, passed, f"{self.description}: {value:g}{bounds}.")
+
+class _BudgetExceeded(Exception):
+    pass
+
+class _BudgetUnavailable(Exception):
+    pass
+
+def _measure_with_budget(pattern: Any, text: str) -> float:
+    try:
+        return float(sandbox.count_matches(pattern.pattern, pattern.flags, text, settings.RULE_TIME_BUDGET_MS / 1000))
+    except SandboxTimeout:
+        raise _BudgetExceeded()
+    except SandboxError as e:
+        raise _BudgetUnavailable(str(e))
+
+def _bound(spec: Dict[str, Any], key: str) -> Optional[float]:
+    if spec.get(key) is None:
+        return None
+    try:
+        return float(spec[key])
+    except (TypeError, ValueError):
+        raise RuleError(f"'{key}' must be a number")
+
+def parse_rule_definition(rule_definition: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Returns the rule spec as a dict, or None for free-text definitions."""
+    if not rule_definition:
+        return None
+    text = rule_definition.strip()
+    if text.lower().startswith("regex:"):
+        return {"type": "regex", "pattern": text[len("regex:"):].strip()}
+    if not text.startswith("{"):
+        return None
+    try:
+        spec = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(spec, dict) or spec.get("type") not in RULE_TYPES:
+        return None
+    return spec
+
+def build_rule(spec: Dict[str, Any]) -> CompiledRule:
+    rule_type = spec["type"]
+    min_value = _bound(spec, "min")
+    max_value = _bound(spec, "max")
+
+    if rule_type in COUNT_TYPES:
+        return CompiledRule(rule_type, rule_type.replace("_", " ").capitalize(), min_value, max_value)
+
+    if rule_type == "substrings":
+        values = spec.get("values") or []
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise RuleError("'values' must be a list of strings")
+        case_sensitive = bool(spec.get("case_sensitive", False))
+        words = sorted({v if case_sensitive else v.lower() for v in values if v})
+        if not words:
+            raise RuleError("'values' must contain at least one non-empty string")
+        pattern = re.compile(_trie_pattern(words), 0 if case_sensitive else re.IGNORECASE)
+        return CompiledRule(rule_type, f"Occurrences of {len(words)} blocked terms", min_value, max_value, pattern=pattern)
+
+    source = spec.get("pattern")
+    if not isinstance(source, str) or not source:
+        raise RuleError("'pattern' must be a non-empty string")
+    flags = _parse_flags(spec.get("flags", ""))
+    if regex_module is not None:
+        try:
+            pattern = regex_module.compile(source, flags)
+        except regex_module.error as e:
+            raise RuleError(f"Invalid regex: {e}")
+    else:
+        if NESTED_QUANTIFIER.search(source):
+            raise RuleError("Regex rejected: nested quantifiers can backtrack catastrophically")
+        try:
+            pattern = re.compile(source, flags)
+        except re.error as e:
+            raise RuleError(f"Invalid regex: {e}")
+    return CompiledRule(rule_type, f"Matches of /{source}/", min_value, max_value, pattern=pattern, untrusted=True)
+
+class RuleCache:
+    """LRU of compiled rules keyed by (metric id, hash of rule_definition)."""
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Optional[int], str], Optional[CompiledRule]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, metric: MetricDefinition) -> Optional[CompiledRule]:
+        definition = metric.rule_definition or ""
+        key = (metric.id, hashlib.sha256(definition.encode("utf-8")).hexdigest())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        spec = parse_rule_definition(definition)
+        if spec is None:
+            rule = None
+        else:
+            try:
+                rule = build_rule(spec)
+            except RuleError as e:
+                rule = CompiledRule(spec.get("type", "invalid"), "Invalid rule", disabled_reason=str(e))
+
+        with self._lock:
+            self._entries[key] = rule
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rule
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+rule_cache = RuleCache()
+
+def compile_rule(metric: MetricDefinition) -> Optional[CompiledRule]:
+    """Compiled rule for the metric, or None if its rule_definition is free text."""
+    return rule_cache.get(metric)
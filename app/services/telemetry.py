@@ -0,0 +1,167 @@
+import math
+import statistics
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, delete, select
+from app.core.config import settings
+from app.models.evaluation import LLMCallTelemetry
+from app.providers.telemetry import LLMCallRecord, collect_llm_calls
+from app.schemas.telemetry import LLMTelemetryResponse, LLMTelemetryRollup
+
+GROUP_COLUMNS = {
+    "model": LLMCallTelemetry.model,
+    "metric": LLMCallTelemetry.metric_definition_id,
+    "project": LLMCallTelemetry.project_id
+}
+
+def telemetry_row(call: LLMCallRecord, project_id: Optional[int], test_case_id: Optional[int], evaluation_run_id: Optional[int] = None, metric_result_id: Optional[int] = None) -> LLMCallTelemetry:
+    return LLMCallTelemetry(
+        created_at=call.created_at,
+        project_id=project_id,
+        test_case_id=test_case_id,
+        evaluation_run_id=evaluation_run_id,
+        metric_result_id=metric_result_id,
+        metric_definition_id=call.metric_definition_id,
+        sample_index=call.sample_index,
+        method=call.method,
+        model=call.model,
+        latency_ms=call.latency_ms,
+        input_tokens=call.input_tokens,
+        output_tokens=call.output_tokens,
+        cached_input_tokens=call.cached_input_tokens,
+        retries=call.retries,
+        cache_hit=call.cache_hit,
+        success=call.success,
+        error=call.error
+    )
+
+def persist_llm_calls(session: Session, calls: List[LLMCallRecord], project_id: Optional[int] = None, test_case_id: Optional[int] = None, evaluation_run_id: Optional[int] = None) -> None:
+    """
+    Stores calls made outside a committed run: previews, metric design and
+    report narratives. Written by the caller's next commit. Each record keeps
+    its row id, so a preview committed by handle links its rows to the run
+    instead of storing them twice.
+    """
+    # A snapshot: cancelled calls may still be appended while this runs
+    pending = [call for call in list(calls) if call.telemetry_id is None]
+    rows = [telemetry_row(call, project_id, test_case_id, evaluation_run_id) for call in pending]
+    if not rows:
+        return
+    session.add_all(rows)
+    session.flush()
+    for call, row in zip(pending, rows):
+        call.telemetry_id = row.id
+
+def store_llm_calls(bind: Engine, calls: List[LLMCallRecord], project_id: Optional[int] = None, test_case_id: Optional[int] = None, evaluation_run_id: Optional[int] = None) -> None:
+    """persist_llm_calls in a transaction of its own, independent of the request's."""
+    with Session(bind) as session:
+        persist_llm_calls(session, calls, project_id, test_case_id, evaluation_run_id)
+        session.commit()
+
+@contextmanager
+def record_llm_calls(bind: Engine, project_id: Optional[int] = None, test_case_id: Optional[int] = None, evaluation_run_id: Optional[int] = None) -> Iterator[List[LLMCallRecord]]:
+    """Collects the provider calls made in the block and stores them on exit, failed calls included."""
+    with collect_llm_calls() as calls:
+        try:
+            yield calls
+        finally:
+            if calls:
+                store_llm_calls(bind, calls, project_id, test_case_id, evaluation_run_id)
+
+def delete_llm_calls_outside_runs(session: Session, project_id: Optional[int] = None, test_case_id: Optional[int] = None) -> None:
+    """Rows of runs go with their run; call before deleting a project or test case."""
+    query = delete(LLMCallTelemetry).where(LLMCallTelemetry.evaluation_run_id.is_(None))
+    if project_id is not None:
+        query = query.where(LLMCallTelemetry.project_id == project_id)
+    if test_case_id is not None:
+        query = query.where(LLMCallTelemetry.test_case_id == test_case_id)
+    session.exec(query)
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+# Only what _rollup reads: the error text and foreign keys stay on disk
+ROLLUP_COLUMNS = (
+    LLMCallTelemetry.latency_ms,
+    LLMCallTelemetry.input_tokens,
+    LLMCallTelemetry.output_tokens,
+    LLMCallTelemetry.cached_input_tokens,
+    LLMCallTelemetry.retries,
+    LLMCallTelemetry.cache_hit,
+    LLMCallTelemetry.success
+)
+
+def _rollup(key: Optional[str], rows: List[Any]) -> LLMTelemetryRollup:
+    latencies = sorted(r.latency_ms for r in rows)
+    input_tokens = [r.input_tokens for r in rows if r.input_tokens is not None]
+    output_tokens = [r.output_tokens for r in rows if r.output_tokens is not None]
+    cached_tokens = sum(r.cached_input_tokens or 0 for r in rows)
+    return LLMTelemetryRollup(
+        key=key,
+        calls=len(rows),
+        latency_p50_ms=percentile(latencies, 50),
+        latency_p90_ms=percentile(latencies, 90),
+        latency_p99_ms=percentile(latencies, 99),
+        latency_mean_ms=statistics.mean(latencies),
+        avg_input_tokens=statistics.mean(input_tokens) if input_tokens else None,
+        avg_output_tokens=statistics.mean(output_tokens) if output_tokens else None,
+        total_input_tokens=sum(input_tokens),
+        total_output_tokens=sum(output_tokens),
+        total_cached_input_tokens=cached_tokens,
+        cached_input_ratio=cached_tokens / sum(input_tokens) if sum(input_tokens) else None,
+        retries=sum(r.retries for r in rows),
+        cache_hit_rate=sum(1 for r in rows if r.cache_hit) / len(rows),
+        error_rate=sum(1 for r in rows if not r.success) / len(rows)
+    )
+
+def get_llm_telemetry_rollups(
+    session: Session,
+    group_by: str = "model",
+    project_id: Optional[int] = None,
+    test_case_id: Optional[int] = None,
+    metric_definition_id: Optional[int] = None,
+    model: Optional[str] = None,
+    since: Optional[datetime] = None
+) -> LLMTelemetryResponse:
+    """
+    Latency percentiles, token usage, retries, cache-hit and error rates of
+    persisted LLM calls, grouped by model, metric or project. Percentiles are
+    computed in Python: SQLite has no percentile aggregate. The read is
+    bounded: calls since `since` (default: the last
+    TELEMETRY_DEFAULT_WINDOW_DAYS), at most TELEMETRY_MAX_CALLS of the most
+    recent ones.
+    """
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_COLUMNS)}")
+    if since is None:
+        since = datetime.utcnow() - timedelta(days=settings.TELEMETRY_DEFAULT_WINDOW_DAYS)
+
+    group_column = GROUP_COLUMNS[group_by]
+    query = select(group_column.label("group_key"), *ROLLUP_COLUMNS).where(LLMCallTelemetry.created_at >= since)
+    if project_id is not None:
+        query = query.where(LLMCallTelemetry.project_id == project_id)
+    if test_case_id is not None:
+        query = query.where(LLMCallTelemetry.test_case_id == test_case_id)
+    if metric_definition_id is not None:
+        query = query.where(LLMCallTelemetry.metric_definition_id == metric_definition_id)
+    if model is not None:
+        query = query.where(LLMCallTelemetry.model == model)
+    # One extra row tells whether the cap cut the window short
+    query = query.order_by(LLMCallTelemetry.created_at.desc()).limit(settings.TELEMETRY_MAX_CALLS + 1)
+
+    rows = session.exec(query).all()
+    truncated = len(rows) > settings.TELEMETRY_MAX_CALLS
+    groups: Dict[Optional[str], List[Any]] = {}
+    for row in rows[:settings.TELEMETRY_MAX_CALLS]:
+        groups.setdefault(None if row.group_key is None else str(row.group_key), []).append(row)
+
+    return LLMTelemetryResponse(
+        group_by=group_by,
+        since=since,
+        truncated=truncated,
+        groups=[_rollup(key, rows) for key, rows in sorted(groups.items(), key=lambda item: (item[0] is None, item[0] or ""))]
+    )
@@ -0,0 +1,36 @@
+"""
+Hashing vectorizer for cheap lexical similarity, stdlib only.
+
+Texts become L2-normalised sparse vectors of hashed character n-grams (the
+"hashing trick": no vocabulary to fit or store). Character n-grams make the
+similarity robust to inflection and tokenization, and also tell languages and
+scripts apart, which is what the pre-screen needs.
+"""
+import math
+import re
+import zlib
+from typing import Dict
+
+SparseVector = Dict[int, float]
+
+_WHITESPACE = re.compile(r"\s+")
+
+def hash_vector(text: str, ngram: int = 3, buckets: int = 1 << 18) -> SparseVector:
+    normalized = _WHITESPACE.sub(" ", text.lower()).strip()
+    if not normalized:
+        return {}
+    normalized = f" {normalized} "
+    counts: Dict[int, float] = {}
+    for start in range(max(1, len(normalized) - ngram + 1)):
+        h = zlib.crc32(normalized[start:start + ngram].encode("utf-8"))
+        # The top bit picks the sign, so colliding n-grams tend to cancel out instead of adding up
+        bucket, sign = h % buckets, (1.0 if h & 0x80000000 else -1.0)
+        counts[bucket] = counts.get(bucket, 0.0) + sign
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return {k: v / norm for k, v in counts.items() if v} if norm else {}
+
+def cosine_similarity(a: SparseVector, b: SparseVector) -> float:
+    """Dot product of two normalised vectors, so in [-1, 1] (~0 for unrelated texts)."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
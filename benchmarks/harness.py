@@ -0,0 +1,97 @@
+"""
+Measurement and comparison helpers for the benchmark runner.
+
+Each case is timed over several iterations after a warmup (latency
+percentiles), SQL statements are counted on the engine, and peak Python
+memory comes from one extra iteration under tracemalloc, so its overhead
+doesn't skew the timings.
+"""
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services.telemetry import percentile
+
+class QueryCounter:
+    """Counts statements executed on an engine while attached."""
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args: Any) -> None:
+        self.count += 1
+
+    @contextmanager
+    def attached(self) -> Iterator["QueryCounter"]:
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+def measure(fn: Callable[[], Any], engine: Engine, iterations: int = 5, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    counter = QueryCounter(engine)
+    latencies: List[float] = []
+    queries: List[int] = []
+    for _ in range(iterations):
+        with counter.attached():
+            started = time.perf_counter()
+            fn()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "min_ms": round(latencies[0], 3),
+        "max_ms": round(latencies[-1], 3),
+        "queries": max(queries),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], max_regression: float = 1.25, noise_ms: float = 5.0) -> List[Dict[str, Any]]:
+    """
+    Matches results on (case, scale) and reports p50 latency, query count and
+    peak memory ratios. A row regresses when its query count or its p50
+    latency grew by more than max_regression; latency changes under noise_ms
+    are ignored, so millisecond cases don't flap. Cases missing from either
+    side are skipped.
+    """
+    previous = {(r["case"], r["scale"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before: Optional[Dict[str, Any]] = previous.get((result["case"], result["scale"]))
+        if before is None:
+            continue
+        ratios = {
+            key: (result[key] / before[key] if before[key] else None)
+            for key in ("p50_ms", "queries", "peak_memory_kb")
+        }
+        slower = result["p50_ms"] - before["p50_ms"] > noise_ms and (ratios["p50_ms"] or 0) > max_regression
+        more_queries = result["queries"] > before["queries"] * max_regression
+        rows.append({
+            "case": result["case"],
+            "scale": result["scale"],
+            **{f"{key}_ratio": round(value, 3) if value is not None else None for key, value in ratios.items()},
+            "regressed": slower or more_queries,
+        })
+    return rows
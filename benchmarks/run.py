@@ -0,0 +1,194 @@
+"""
+End-to-end benchmarks of the hot service paths.
+
+For each scale (runs per test case x metrics per test case) a fresh SQLite
+database is seeded with synthetic data, then every case is timed:
+
+- evaluate_test_case with the stub provider and with the OpenAI provider
+  against the local fake server (app.providers.fake_openai), so the HTTP
+  client, pool and scheduler are included
+- get_test_case_dashboard / get_project_dashboard
+- create_test_case_report / create_project_report
+- generate_test_case_word_report
+
+Results (latency percentiles, SQL statement count, peak Python memory) are
+written as JSON; a table goes to stderr. Compare two builds with --compare:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+
+The exit status is 1 when a case's p50 latency or query count grew by more
+than --max-regression (latency changes under --noise-ms are ignored).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import SecretStr
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import create_db_engine
+from app.models.metric import MetricDefinition
+from app.models.test_case import TestCase
+from app.providers.llm import provider_registry
+from app.services.dashboard import get_project_dashboard, get_test_case_dashboard
+from app.services.evaluation import evaluate_test_case
+from app.services.report import create_project_report, create_test_case_report, generate_test_case_word_report
+from benchmarks.harness import compare, measure
+from benchmarks.seed import SeededData, seed
+
+# 10000x20 is worth a run before deploying, but takes several minutes per case
+DEFAULT_SCALES = "10x5,1000x5,1000x20"
+OUTPUTS = [
+    "Thanks for your patience! Your refund was issued today and should arrive within five business days.",
+    "Your refund is on its way; expect it within a week. Let me know if anything else comes up.",
+    "Refund is guaranteed, risk-free, no questions asked!!!",
+]
+
+def parse_scales(value: str) -> List[Tuple[int, int]]:
+    scales = []
+    for item in value.split(","):
+        runs, _, metrics = item.strip().partition("x")
+        scales.append((int(runs), int(metrics)))
+    return scales
+
+@contextmanager
+def llm_settings(**overrides: Any) -> Iterator[None]:
+    """Temporarily overrides settings and drops pooled providers built for the old ones."""
+    saved = {key: getattr(settings, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    provider_registry.close()
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            setattr(settings, key, value)
+        provider_registry.close()
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_cases(engine, data: SeededData, fake_base_url: Optional[str]) -> List[Tuple[str, Callable[[], Any], Dict[str, Any]]]:
+    """(name, callable, settings overrides) per case. Each call opens its own session, like a request would."""
+    test_case_id = data.test_case_ids[0]
+
+    def with_session(fn: Callable[[Session], Any]) -> Callable[[], Any]:
+        def call() -> Any:
+            with Session(engine) as session:
+                return fn(session)
+        return call
+
+    # Evaluation reads no rows itself: load its inputs once, the way the routes hand them over
+    eval_session = Session(engine)
+    test_case = eval_session.exec(select(TestCase).where(TestCase.id == test_case_id).options(selectinload(TestCase.examples))).one()
+    metrics = eval_session.exec(select(MetricDefinition).where(MetricDefinition.test_case_id == test_case_id)).all()
+
+    def evaluate() -> Any:
+        return evaluate_test_case(test_case, metrics, OUTPUTS, multi_sample=True)
+
+    with Session(engine) as session:
+        report_id = create_test_case_report(session, test_case_id).id
+
+    stub = {"LLM_MODE": "stub", "LLM_CACHE_ENABLED": False}
+    cases = [("evaluate_test_case[stub]", evaluate, stub)]
+    if fake_base_url:
+        cases.append(("evaluate_test_case[fake]", evaluate, {
+            "LLM_MODE": "openai", "LLM_CACHE_ENABLED": False,
+            "OPENAI_API_KEY": SecretStr("benchmark"), "OPENAI_BASE_URL": fake_base_url
+        }))
+    cases += [
+        ("get_test_case_dashboard", with_session(lambda s: get_test_case_dashboard(s, test_case_id)), stub),
+        ("get_project_dashboard", with_session(lambda s: get_project_dashboard(s, data.project_id)), stub),
+        ("create_test_case_report", with_session(lambda s: create_test_case_report(s, test_case_id)), stub),
+        ("create_project_report", with_session(lambda s: create_project_report(s, data.project_id, data.start, data.end)), stub),
+        ("generate_test_case_word_report", with_session(lambda s: generate_test_case_word_report(s, report_id).getvalue()), stub),
+    ]
+    return cases
+
+def run(scales: List[Tuple[int, int]], iterations: int, warmup: int, test_cases: int, fake_base_url: Optional[str], only: Optional[List[str]]) -> Dict[str, Any]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="llm-eval-bench-") as tmp:
+        for runs, metric_count in scales:
+            scale = f"{runs}x{metric_count}"
+            # Same engine profile (pragmas, pool) as the app
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, scale)}.db")
+            data = seed(engine, runs, metric_count, test_cases=test_cases)
+            for name, fn, overrides in build_cases(engine, data, fake_base_url):
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                with llm_settings(**overrides):
+                    result = {"case": name, "scale": scale, "runs": runs, "metrics": metric_count, **measure(fn, engine, iterations, warmup)}
+                print(f"{scale:>10}  {name:<32} p50 {result['p50_ms']:>10.1f} ms  p90 {result['p90_ms']:>10.1f} ms  "
+                      f"{result['queries']:>7} queries  {result['peak_memory_kb']:>10.0f} KB", file=sys.stderr)
+                results.append(result)
+            engine.dispose()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "test_cases": test_cases,
+            "fake_openai": fake_base_url is not None,
+        },
+        "results": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the hot service paths.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"Comma-separated RUNSxMETRICS (default: {DEFAULT_SCALES})")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--test-cases", type=int, default=2, help="Test cases in the project, each seeded at the full scale")
+    parser.add_argument("--cases", help="Comma-separated case name prefixes to run")
+    parser.add_argument("--no-fake", action="store_true", help="Skip the fake OpenAI server cases")
+    parser.add_argument("--fake-latency-ms", type=float, default=50.0, help="Median latency of the fake server (lognormal)")
+    parser.add_argument("--output", help="JSON results path (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=1.25)
+    parser.add_argument("--noise-ms", type=float, default=5.0, help="p50 changes smaller than this never count as regressions")
+    args = parser.parse_args(argv)
+
+    only = args.cases.split(",") if args.cases else None
+    if args.no_fake:
+        report = run(parse_scales(args.scales), args.iterations, args.warmup, args.test_cases, None, only)
+    else:
+        from app.providers.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+        config = FakeOpenAIConfig(latency_ms=args.fake_latency_ms, latency_distribution="lognormal", latency_spread=0.3, seed=0)
+        with FakeOpenAIServer(config) as server:
+            report = run(parse_scales(args.scales), args.iterations, args.warmup, args.test_cases, server.base_url, only)
+            report["meta"]["fake_openai_latency_ms"] = args.fake_latency_ms
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report, args.max_regression, args.noise_ms)
+        for row in report["comparison"]:
+            flag = "REGRESSED" if row["regressed"] else ""
+            print(f"{row['scale']:>10}  {row['case']:<32} p50 x{row['p50_ms_ratio']}  queries x{row['queries_ratio']}  "
+                  f"memory x{row['peak_memory_kb_ratio']}  {flag}", file=sys.stderr)
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    return 1 if any(row["regressed"] for row in report.get("comparison", [])) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Synthetic data for the benchmarks: one project whose test cases each have
+`metrics` metric definitions (every fourth one deterministic, the rest
+LLM_JUDGE), three examples and `runs` completed runs with one result per
+metric. Rows go in with bulk inserts and explicit ids, so the database must
+be empty.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel
+
+from app.models.evaluation import EvaluationRun, MetricResult
+from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+from app.models.project import Project
+from app.models.test_case import Example, ExampleType, TestCase
+
+START = datetime(2025, 1, 1)
+CHUNK = 5000
+
+@dataclass
+class SeededData:
+    project_id: int
+    test_case_ids: List[int]
+    runs: int
+    metrics: int
+    start: datetime
+    end: datetime
+
+def _insert(session: Session, model, rows: List[dict]) -> None:
+    for i in range(0, len(rows), CHUNK):
+        session.execute(insert(model), rows[i:i + CHUNK])
+
+def seed(engine: Engine, runs: int, metrics: int, test_cases: int = 2, seed: int = 0) -> SeededData:
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(seed)
+    end = START + timedelta(hours=runs)
+    with Session(engine) as session:
+        session.execute(insert(Project), [{"id": 1, "name": "Benchmark Project", "description": "Synthetic data", "created_at": START}])
+        _insert(session, TestCase, [
+            {"id": tc, "project_id": 1, "name": f"Test case {tc}", "description": "Support answers",
+             "user_intent": "Short, polite and correct answers", "created_at": START, "last_version_number": runs}
+            for tc in range(1, test_cases + 1)
+        ])
+        _insert(session, Example, [
+            {"test_case_id": tc, "content": content, "type": kind, "created_at": START}
+            for tc in range(1, test_cases + 1)
+            for content, kind in (
+                ("Thanks for reaching out! Your refund was issued today and should arrive within five days.", ExampleType.DESIRED),
+                ("Sorry about the delay. I have escalated your ticket and you will hear back within 24 hours.", ExampleType.DESIRED),
+                ("Refund is guaranteed, risk-free, no questions asked!!!", ExampleType.CURRENT),
+            )
+        ])
+
+        definitions = []
+        for tc in range(1, test_cases + 1):
+            for m in range(metrics):
+                metric_id = (tc - 1) * metrics + m + 1
+                if m % 4 == 3:
+                    definitions.append({
+                        "id": metric_id, "test_case_id": tc, "name": f"Length {m}", "description": "Word count",
+                        "metric_type": MetricType.DETERMINISTIC, "scale_type": ScaleType.UNBOUNDED,
+                        "target_direction": TargetDirection.HIGHER_IS_BETTER,
+                        "rule_definition": '{"type": "word_count", "min": 5, "max": 200}'
+                    })
+                else:
+                    definitions.append({
+                        "id": metric_id, "test_case_id": tc, "name": f"Judge {m}", "description": "Quality",
+                        "metric_type": MetricType.LLM_JUDGE, "scale_type": ScaleType.BOUNDED,
+                        "scale_min": 0, "scale_max": 100, "target_direction": TargetDirection.HIGHER_IS_BETTER,
+                        "evaluation_prompt": f"Rate aspect {m} of the answer from 0 to 100."
+                    })
+        _insert(session, MetricDefinition, definitions)
+
+        run_rows, result_rows = [], []
+        for tc in range(1, test_cases + 1):
+            for version in range(1, runs + 1):
+                run_id = (tc - 1) * runs + version
+                scores = [rng.uniform(40, 95) for _ in range(metrics)]
+                run_rows.append({
+                    "id": run_id, "test_case_id": tc, "version_number": version, "status": "completed",
+                    "created_at": START + timedelta(hours=version - 1), "aggregated_score": sum(scores) / metrics,
+                    "gap_analysis": "Synthetic gap analysis."
+                })
+                for m, score in enumerate(scores):
+                    result_rows.append({
+                        "evaluation_run_id": run_id, "metric_definition_id": (tc - 1) * metrics + m + 1,
+                        "metric_name": f"Metric {m}", "score": score, "explanation": "Synthetic result."
+                    })
+            # Flush per test case to bound memory at the largest scales
+            _insert(session, EvaluationRun, run_rows)
+            _insert(session, MetricResult, result_rows)
+            run_rows, result_rows = [], []
+        session.commit()
+    return SeededData(project_id=1, test_case_ids=list(range(1, test_cases + 1)), runs=runs, metrics=metrics, start=START, end=end)
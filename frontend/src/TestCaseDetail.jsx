@@ -243,14 +243,29 @@ export default function TestCaseDetail() {
         }
         setEvalLoading(true);
         try {
-            await fetchWithAuth(`/api/v1/testcases/${id}/evaluate/commit`, {
+            const res = await fetchWithAuth(`/api/v1/testcases/${id}/evaluate/commit`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     outputs: uploadedFiles.map(f => f.content),
+                    preview_id: previewResult ? previewResult.preview_id : null,
                     notes: "Manual run via UI with files: " + uploadedFiles.map(f => f.name).join(", ")
                 })
             });
+            if (!res.ok) throw new Error(`Commit failed: ${res.status}`);
+            let run = await res.json();
+            // Without a reusable preview the run is evaluated in the background
+            while (run.status === "pending" || run.status === "running") {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const statusRes = await fetchWithAuth(`/api/v1/runs/${run.id}/status`);
+                if (!statusRes.ok) throw new Error(`Status check failed: ${statusRes.status}`);
+                run = await statusRes.json();
+            }
+            if (run.status === "failed") {
+                alert("Evaluation failed: " + (run.error_message || "unknown error"));
+                setEvalLoading(false);
+                return;
+            }
             alert("Evaluation Committed! Version bumped.");
             setPreviewResult(null);
             setUploadedFiles([]);
@@ -0,0 +1,242 @@
+"""
+HTTP load test for a running instance of the API.
+
+Virtual users log in through /auth/login, then loop over a weighted mix of
+dashboard reads, evaluation previews, preview+commit pairs and report
+requests. Concurrency is stepped through --users (e.g. 1,5,10,25), each stage
+running for --duration seconds, so the output shows where latency starts to
+degrade. Per stage and endpoint it reports request count, errors,
+throughput, latency percentiles and a latency histogram, as JSON.
+
+Run the app against a stub or fake LLM so the numbers measure this service
+rather than the provider:
+
+    LLM_MODE=stub uvicorn app.main:app --port 8080
+    # or: python -m app.providers.fake_openai --port 8081 --latency-ms 800
+    #     LLM_MODE=openai OPENAI_API_KEY=x OPENAI_BASE_URL=http://127.0.0.1:8081/v1 uvicorn app.main:app --port 8080
+
+    python scripts/load_test.py --base-url http://127.0.0.1:8080 --setup --users 1,5,10,25 --duration 30 --output load.json
+
+--setup registers the user if needed and creates a project, a test case with
+confirmed metrics and two committed runs. Without it, pass --project-id and
+--test-case-id of existing data the user can access.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+API = "/api/v1"
+DEFAULT_MIX = "testcase_dashboard=30,project_dashboard=15,preview=25,commit=15,report=10,runs=5"
+HISTOGRAM_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+OUTPUTS = [
+    "Thanks for reaching out! Your refund was issued today and should arrive within five business days.",
+    "Sorry for the wait. I escalated your ticket and you will hear back from us within 24 hours.",
+    "Refund is guaranteed, risk-free, no questions asked!!!",
+]
+
+@dataclass
+class Target:
+    project_id: int
+    test_case_id: int
+
+@dataclass
+class Recorder:
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    statuses: Dict[str, Dict[int, int]] = field(default_factory=dict)
+
+    def add(self, endpoint: str, status: int, latency_ms: float) -> None:
+        self.latencies.setdefault(endpoint, []).append(latency_ms)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[status] = counts.get(status, 0) + 1
+        if status == 0 or status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    return values[max(1, math.ceil(p / 100 * len(values))) - 1]
+
+def histogram(values: List[float]) -> Dict[str, int]:
+    counts = {f"<={bucket}ms": 0 for bucket in HISTOGRAM_BUCKETS_MS}
+    counts[f">{HISTOGRAM_BUCKETS_MS[-1]}ms"] = 0
+    for value in values:
+        bucket = next((b for b in HISTOGRAM_BUCKETS_MS if value <= b), None)
+        counts[f"<={bucket}ms" if bucket is not None else f">{HISTOGRAM_BUCKETS_MS[-1]}ms"] += 1
+    return counts
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Any]:
+    endpoints = {}
+    for endpoint, values in sorted(recorder.latencies.items()):
+        ordered = sorted(values)
+        endpoints[endpoint] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(endpoint, 0),
+            "statuses": recorder.statuses[endpoint],
+            "throughput_rps": round(len(ordered) / duration, 3),
+            "p50_ms": round(percentile(ordered, 50), 1),
+            "p90_ms": round(percentile(ordered, 90), 1),
+            "p99_ms": round(percentile(ordered, 99), 1),
+            "max_ms": round(ordered[-1], 1),
+            "histogram": histogram(ordered),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / duration, 3),
+        "endpoints": endpoints,
+    }
+
+async def request(client: httpx.AsyncClient, recorder: Recorder, endpoint: str, method: str, path: str, **kwargs: Any) -> Optional[httpx.Response]:
+    """Times one request under `endpoint`; transport errors count as status 0."""
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+    except httpx.HTTPError:
+        recorder.add(endpoint, 0, (time.perf_counter() - started) * 1000)
+        return None
+    recorder.add(endpoint, response.status_code, (time.perf_counter() - started) * 1000)
+    return response
+
+async def login(client: httpx.AsyncClient, recorder: Recorder, email: str, password: str) -> Dict[str, str]:
+    response = await request(client, recorder, "POST /auth/login", "POST", f"{API}/auth/login", data={"username": email, "password": password})
+    if response is None or response.status_code != 200:
+        raise RuntimeError(f"Login failed for {email}: {response.status_code if response is not None else 'no response'}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def run_action(action: str, client: httpx.AsyncClient, recorder: Recorder, headers: Dict[str, str], target: Target, rng: random.Random) -> None:
+    tc, project = target.test_case_id, target.project_id
+    outputs = {"outputs": [rng.choice(OUTPUTS)]}
+    if action == "testcase_dashboard":
+        await request(client, recorder, "GET /testcases/{id}/dashboard", "GET", f"{API}/testcases/{tc}/dashboard", headers=headers)
+    elif action == "project_dashboard":
+        await request(client, recorder, "GET /projects/{id}/dashboard", "GET", f"{API}/projects/{project}/dashboard", headers=headers)
+    elif action == "runs":
+        await request(client, recorder, "GET /testcases/{id}/runs", "GET", f"{API}/testcases/{tc}/runs", headers=headers)
+    elif action == "preview":
+        await request(client, recorder, "POST /testcases/{id}/evaluate/preview", "POST", f"{API}/testcases/{tc}/evaluate/preview", json=outputs, headers=headers)
+    elif action == "commit":
+        # The UI flow: preview, then commit the previewed results by handle
+        preview = await request(client, recorder, "POST /testcases/{id}/evaluate/preview", "POST", f"{API}/testcases/{tc}/evaluate/preview", json=outputs, headers=headers)
+        preview_id = preview.json().get("preview_id") if preview is not None and preview.status_code == 200 else None
+        await request(client, recorder, "POST /testcases/{id}/evaluate/commit", "POST", f"{API}/testcases/{tc}/evaluate/commit",
+                      json={**outputs, "preview_id": preview_id, "notes": "load test"}, headers=headers)
+    elif action == "report":
+        await request(client, recorder, "POST /testcases/{id}/report", "POST", f"{API}/testcases/{tc}/report", json={"format": "json"}, headers=headers)
+    elif action == "report_docx":
+        await request(client, recorder, "POST /testcases/{id}/report (docx)", "POST", f"{API}/testcases/{tc}/report", json={"format": "docx"}, headers=headers)
+    else:
+        raise ValueError(f"Unknown action: {action}")
+
+async def virtual_user(index: int, client: httpx.AsyncClient, recorder: Recorder, target: Target, mix: List[Tuple[str, float]],
+                       email: str, password: str, deadline: float, think_time: float, seed: int) -> None:
+    rng = random.Random(seed * 1000 + index)
+    headers = await login(client, recorder, email, password)
+    actions, weights = zip(*mix)
+    while time.monotonic() < deadline:
+        await run_action(rng.choices(actions, weights)[0], client, recorder, headers, target, rng)
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+async def setup(client: httpx.AsyncClient, email: str, password: str) -> Target:
+    """Registers the user if needed and creates a project, a test case with confirmed metrics and two runs."""
+    recorder = Recorder()
+    await client.post(f"{API}/auth/register", json={"email": email, "password": password, "full_name": "Load Test"})
+    headers = await login(client, recorder, email, password)
+
+    async def post(path: str, **kwargs: Any) -> Any:
+        response = await client.post(f"{API}{path}", headers=headers, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    project = await post("/projects/", json={"name": "Load test", "description": "Created by scripts/load_test.py"})
+    test_case = await post(f"/projects/{project['id']}/testcases", json={"name": "Support reply", "description": "Polite, correct support answers"})
+    for content, kind in ((OUTPUTS[0], "desired"), (OUTPUTS[1], "desired"), (OUTPUTS[2], "current")):
+        await post(f"/testcases/{test_case['id']}/examples", json={"content": content, "type": kind})
+    iteration = await post(f"/testcases/{test_case['id']}/metric-design", json={"user_intent": "Short, polite and correct answers"})
+    await post(f"/testcases/{test_case['id']}/metric-design/{iteration['id']}/confirm")
+    for output in OUTPUTS[:2]:
+        await post(f"/testcases/{test_case['id']}/evaluate/commit", json={"outputs": [output], "notes": "load test baseline", "background": False})
+    return Target(project_id=project["id"], test_case_id=test_case["id"])
+
+def parse_mix(value: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in value.split(","):
+        action, _, weight = item.strip().partition("=")
+        mix.append((action, float(weight or 1)))
+    return mix
+
+async def run_load_test(base_url: str, stages: List[int], duration: float, mix: List[Tuple[str, float]], email: str, password: str,
+                        target: Optional[Target] = None, think_time: float = 0.0, seed: int = 0,
+                        transport: Optional[httpx.AsyncBaseTransport] = None) -> Dict[str, Any]:
+    """Runs every stage and returns the JSON report. `transport` lets tests drive an in-process app."""
+    limits = httpx.Limits(max_connections=max(stages), max_keepalive_connections=max(stages))
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits, transport=transport) as client:
+        if target is None:
+            target = await setup(client, email, password)
+        results = []
+        for users in stages:
+            recorder = Recorder()
+            started = time.monotonic()
+            deadline = started + duration
+            await asyncio.gather(*(
+                virtual_user(i, client, recorder, target, mix, email, password, deadline, think_time, seed)
+                for i in range(users)
+            ))
+            stage = {"users": users, "duration_s": round(time.monotonic() - started, 3), **summarize(recorder, time.monotonic() - started)}
+            results.append(stage)
+            for endpoint, stats in stage["endpoints"].items():
+                print(f"{users:>4} users  {endpoint:<42} {stats['requests']:>6} req  {stats['errors']:>4} err  "
+                      f"{stats['throughput_rps']:>8.2f} rps  p50 {stats['p50_ms']:>8.1f}  p90 {stats['p90_ms']:>8.1f}  p99 {stats['p99_ms']:>8.1f} ms",
+                      file=sys.stderr)
+    return {
+        "base_url": base_url,
+        "project_id": target.project_id,
+        "test_case_id": target.test_case_id,
+        "mix": dict(mix),
+        "think_time_s": think_time,
+        "stages": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test a running API instance.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--setup", action="store_true", help="Create the user and test data first")
+    parser.add_argument("--project-id", type=int)
+    parser.add_argument("--test-case-id", type=int)
+    parser.add_argument("--users", default="1,5,10", help="Comma-separated concurrency stages")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per stage")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted actions (default: {DEFAULT_MIX}); also: report_docx")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a user's requests, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON report path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    target = None
+    if not args.setup:
+        if args.project_id is None or args.test_case_id is None:
+            parser.error("pass --setup, or both --project-id and --test-case-id")
+        target = Target(project_id=args.project_id, test_case_id=args.test_case_id)
+    stages = [int(users) for users in args.users.split(",")]
+    report = asyncio.run(run_load_test(args.base_url, stages, args.duration, parse_mix(args.mix), args.email, args.password,
+                                       target=target, think_time=args.think_time, seed=args.seed))
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
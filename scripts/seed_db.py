@@ -86,6 +86,8 @@ def seed():
         session.commit()
         session.add(MetricResult(evaluation_run_id=r3.id, metric_definition_id=m1.id, score=90.0))
         session.add(MetricResult(evaluation_run_id=r3.id, metric_definition_id=m2.id, score=500.0))
+        tc.last_version_number = 3
+        session.add(tc)
         
         session.commit()
         print("Seeding complete!")
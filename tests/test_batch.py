@@ -0,0 +1,137 @@
+import time
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.models.project import Project
+from app.models.test_case import TestCase
+from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+from app.models.evaluation import EvaluationRun
+
+def wait_for_job(client: TestClient, project_id: int, job_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/projects/{project_id}/evaluate/batch/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("Batch job did not finish in time")
+
+def test_batch_evaluation_job(auth_client: TestClient, session: Session):
+    project = Project(name="Batch Project")
+    other_project = Project(name="Other Project")
+    session.add(project)
+    session.add(other_project)
+    session.commit()
+
+    cases = []
+    for name in ["Batch A", "Batch B"]:
+        tc = TestCase(name=name, project_id=project.id)
+        session.add(tc)
+        session.commit()
+        session.add(MetricDefinition(
+            test_case_id=tc.id, name="Judge", description="Desc",
+            metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED,
+            scale_min=0, scale_max=100, target_direction=TargetDirection.HIGHER_IS_BETTER,
+            evaluation_prompt="Score it."
+        ))
+        session.commit()
+        cases.append(tc)
+    no_metrics = TestCase(name="No Metrics", project_id=project.id)
+    foreign = TestCase(name="Foreign", project_id=other_project.id)
+    session.add(no_metrics)
+    session.add(foreign)
+    session.commit()
+
+    items = [
+        {"test_case_id": cases[0].id, "outputs": ["a" * 10], "notes": "nightly"},
+        {"test_case_id": cases[1].id, "outputs": ["a" * 20]},
+        {"test_case_id": cases[0].id, "outputs": ["a" * 30]},
+        {"test_case_id": no_metrics.id, "outputs": ["x"]},
+        {"test_case_id": foreign.id, "outputs": ["x"]},
+    ]
+    response = auth_client.post(f"/api/v1/projects/{project.id}/evaluate/batch", json={"items": items})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["total"] == 5
+
+    job = wait_for_job(auth_client, project.id, job["job_id"])
+    assert job["status"] == "completed"
+    assert job["completed"] == 3
+    assert job["failed"] == 2
+    assert sorted(e["test_case_id"] for e in job["errors"]) == sorted([no_metrics.id, foreign.id])
+
+    runs = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == cases[0].id)).all()
+    assert sorted(r.version_number for r in runs) == [1, 2]
+    assert sorted(r.aggregated_score for r in runs) == [10.0, 30.0]
+    assert len(job["run_ids"]) == 3
+
+    # Jobs are scoped to their project
+    assert auth_client.get(f"/api/v1/projects/{other_project.id}/evaluate/batch/{job['job_id']}").status_code == 404
+
+def test_batch_evaluation_via_batch_api(auth_client: TestClient, session: Session):
+    project = Project(name="Offline Project")
+    session.add(project)
+    session.commit()
+    tc = TestCase(name="Offline", project_id=project.id)
+    session.add(tc)
+    session.commit()
+    session.add(MetricDefinition(
+        test_case_id=tc.id, name="Judge", description="Desc",
+        metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED,
+        scale_min=0, scale_max=100, target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    ))
+    session.commit()
+
+    items = [
+        {"test_case_id": tc.id, "outputs": ["a" * 12]},
+        {"test_case_id": tc.id, "outputs": ["a" * 40]},
+        {"test_case_id": tc.id + 1000, "outputs": ["x"]},
+    ]
+    response = auth_client.post(f"/api/v1/projects/{project.id}/evaluate/batch", json={"items": items, "use_batch_api": True})
+    assert response.status_code == 202
+
+    job = wait_for_job(auth_client, project.id, response.json()["job_id"])
+    assert job["status"] == "completed"
+    assert job["completed"] == 2
+    assert job["failed"] == 1
+
+    runs = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == tc.id)).all()
+    # The local batch backend scores like the stub judge: length % 100
+    assert sorted(r.aggregated_score for r in runs) == [12.0, 40.0]
+    assert all(r.gap_analysis == "Stub Gap Analysis from local batch backend." for r in runs)
+
+def test_batch_judge_reports_failed_requests():
+    from app.models.metric import MetricDefinition as Metric
+    from app.providers.llm import BatchJudge, LocalBatchBackend
+
+    def responder(body):
+        if "boom" in body["messages"][-1]["content"]:
+            raise ValueError("model overloaded")
+        return '{"score": 7, "explanation": "ok"}'
+
+    metric = Metric(id=1, test_case_id=1, name="Judge", description="Desc", metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED, target_direction=TargetDirection.HIGHER_IS_BETTER)
+    judge = BatchJudge(LocalBatchBackend(responder), model="gpt-4o", poll_interval=0)
+    results = judge.judge_metrics([("a", metric, "fine", "ctx"), ("b", metric, "boom", "ctx")])
+    assert results["a"].score == 7
+    assert isinstance(results["b"], Exception)
+    assert "model overloaded" in str(results["b"])
+
+def test_batch_jobs_survive_a_restart(auth_client: TestClient, session: Session):
+    from app.models.batch import BatchEvaluationJob
+    from app.services.batch import fail_interrupted_jobs
+
+    project = Project(name="Restart Batch Project")
+    session.add(project)
+    session.commit()
+    session.add(BatchEvaluationJob(id="done", project_id=project.id, status="completed", total=1, completed=1, run_ids_json="[7]"))
+    session.add(BatchEvaluationJob(id="cut-off", project_id=project.id, status="running", total=4, completed=2))
+    session.commit()
+
+    # Read from the table, not from the process that ran the job
+    job = auth_client.get(f"/api/v1/projects/{project.id}/evaluate/batch/done").json()
+    assert (job["status"], job["run_ids"]) == ("completed", [7])
+
+    assert fail_interrupted_jobs(session.get_bind()) == 1
+    job = auth_client.get(f"/api/v1/projects/{project.id}/evaluate/batch/cut-off").json()
+    assert (job["status"], job["completed"]) == ("failed", 2)
+    assert job["finished_at"] is not None
@@ -0,0 +1,28 @@
+import json
+
+from benchmarks.harness import compare
+from benchmarks.run import main
+
+def test_benchmark_runner_writes_comparable_results(tmp_path):
+    output = tmp_path / "results.json"
+    args = ["--scales", "3x4", "--iterations", "1", "--warmup", "0", "--no-fake",
+            "--cases", "evaluate_test_case,get_,create_", "--output", str(output)]
+    assert main(args) == 0
+
+    report = json.loads(output.read_text())
+    cases = {r["case"] for r in report["results"]}
+    assert cases == {
+        "evaluate_test_case[stub]", "get_test_case_dashboard", "get_project_dashboard",
+        "create_test_case_report", "create_project_report"
+    }
+    dashboard = next(r for r in report["results"] if r["case"] == "get_test_case_dashboard")
+    assert dashboard["scale"] == "3x4"
+    assert dashboard["queries"] > 0
+    assert dashboard["p50_ms"] > 0 and dashboard["peak_memory_kb"] > 0
+
+    # Same build: nothing regresses on query counts
+    assert not any(row["regressed"] for row in compare(report, report))
+    doubled = json.loads(json.dumps(report))
+    for result in doubled["results"]:
+        result["queries"] *= 2
+    assert next(row for row in compare(report, doubled) if row["case"] == "get_test_case_dashboard")["regressed"]
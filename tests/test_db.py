@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from sqlmodel import Session, SQLModel, select
+
+from app.core.db import create_db_engine, engine_profile
+from app.models.project import Project
+
+def test_file_engine_applies_the_sqlite_profile(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    profile = engine_profile(engine)
+    assert profile["echo"] is False
+    assert profile["journal_mode"] == "wal"
+    assert profile["synchronous"] == "NORMAL"
+    assert profile["busy_timeout_ms"] == 5000
+    assert profile["cache_size"] == -65536
+    assert profile["pool"] == "QueuePool" and profile["pool_size"] == 10
+
+    # WAL: a reader sees the last commit while a write transaction is open
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as writer, Session(engine) as reader:
+        writer.add(Project(name="Committed"))
+        writer.commit()
+        writer.add(Project(name="Pending"))
+        writer.flush()
+        assert [p.name for p in reader.exec(select(Project)).all()] == ["Committed"]
+    engine.dispose()
+
+def test_engine_profile_follows_settings(tmp_path):
+    with patch("app.core.config.settings.SQLITE_JOURNAL_MODE", "DELETE"), \
+         patch("app.core.config.settings.SQLITE_SYNCHRONOUS", "FULL"), \
+         patch("app.core.config.settings.DB_ECHO", True), \
+         patch("app.core.config.settings.DB_POOL_SIZE", 3):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+        profile = engine_profile(engine)
+    assert profile["journal_mode"] == "delete"
+    assert profile["synchronous"] == "FULL"
+    assert profile["echo"] is True
+    assert profile["pool_size"] == 3
+    engine.dispose()
@@ -1,5 +1,6 @@
+import json
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, select
 from app.models.project import Project
 from app.models.test_case import TestCase, Example
 from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
@@ -73,7 +74,7 @@ def test_evaluation_workflow(auth_client: TestClient, session: Session):
     # 2. Test Commit
     response = auth_client.post(
         f"/api/v1/testcases/{test_case.id}/evaluate/commit",
-        json={"outputs": ["Desired baseline content"], "notes": "First run"}
+        json={"outputs": ["Desired baseline content"], "notes": "First run", "background": False}
     )
     assert response.status_code == 200
     run_data = response.json()
@@ -83,7 +84,7 @@ def test_evaluation_workflow(auth_client: TestClient, session: Session):
     # 3. Test Commit Second Run (Version Increment)
     response = auth_client.post(
         f"/api/v1/testcases/{test_case.id}/evaluate/commit",
-        json={"outputs": ["Different content"], "notes": "Second run"}
+        json={"outputs": ["Different content"], "notes": "Second run", "background": False}
     )
     assert response.status_code == 200
     run_data_2 = response.json()
@@ -115,3 +116,509 @@ def test_preview_fail_no_metrics(auth_client: TestClient, session: Session):
         json={"outputs": ["test"]}
     )
     assert response.status_code == 409
+
+def test_multi_sample_evaluation(auth_client: TestClient, session: Session):
+    project = Project(name="Multi Sample Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Multi Sample Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+
+    judge = MetricDefinition(
+        test_case_id=test_case.id,
+        name="Stub Judge",
+        description="Stub scores by length",
+        metric_type=MetricType.LLM_JUDGE,
+        scale_type=ScaleType.BOUNDED,
+        scale_min=0,
+        scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    )
+    session.add(judge)
+    session.commit()
+
+    # Stub judge scores len(text) % 100 -> 10 and 30
+    outputs = ["a" * 10, "a" * 30]
+
+    response = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/preview",
+        json={"outputs": outputs, "multi_sample": True}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["metric_results"]) == 1
+    assert data["metric_results"][0]["score"] == 20.0
+    assert data["aggregated_score"] == 20.0
+    stats = data["metric_stats"][0]
+    assert stats["count"] == 2
+    assert stats["min"] == 10.0
+    assert stats["max"] == 30.0
+    assert round(stats["stddev"], 2) == 14.14
+    assert [r["sample_index"] for r in data["sample_results"]] == [0, 1]
+
+    # Single-sample mode still only looks at outputs[0]
+    response = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/preview",
+        json={"outputs": outputs}
+    )
+    assert response.json()["aggregated_score"] == 10.0
+    assert response.json()["sample_results"] == []
+
+    # Commit stores one run with the mean plus one row per output
+    response = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+        json={"outputs": outputs, "multi_sample": True, "background": False}
+    )
+    assert response.status_code == 200
+    run_data = response.json()
+    assert run_data["version_number"] == 1
+    assert run_data["aggregated_score"] == 20.0
+    assert len(run_data["metric_results"]) == 1
+    assert sorted(r["score"] for r in run_data["sample_results"]) == [10.0, 30.0]
+
+def test_commit_reuses_preview(auth_client: TestClient, session: Session):
+    from unittest.mock import patch
+    from app.providers.llm import AsyncStubLLMProvider
+
+    project = Project(name="Preview Handle Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Preview Handle Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    judge = MetricDefinition(
+        test_case_id=test_case.id, name="Judge", description="Desc",
+        metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED,
+        scale_min=0, scale_max=100, target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    )
+    session.add(judge)
+    session.commit()
+
+    provider = AsyncStubLLMProvider()
+    with patch.object(provider, "judge_metric", wraps=provider.judge_metric) as judge_spy:
+        with patch("app.services.evaluation.get_async_llm_provider", return_value=provider):
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/evaluate/preview",
+                json={"outputs": ["Some output"]}
+            )
+            preview = response.json()
+            assert preview["preview_id"]
+            assert judge_spy.call_count == 1
+
+            # Same outputs + valid handle: persisted without any judge call
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+                json={"outputs": ["Some output"], "preview_id": preview["preview_id"]}
+            )
+            assert response.status_code == 200
+            assert response.json()["aggregated_score"] == preview["aggregated_score"]
+            assert judge_spy.call_count == 1
+
+            # Handles are single use: a second commit re-evaluates
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+                json={"outputs": ["Some output"], "preview_id": preview["preview_id"], "background": False}
+            )
+            assert response.json()["version_number"] == 2
+            assert judge_spy.call_count == 2
+
+            # Metric set changed since the preview: fall back to a fresh evaluation
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/evaluate/preview",
+                json={"outputs": ["Some output"]}
+            )
+            preview_id = response.json()["preview_id"]
+            judge.evaluation_prompt = "Score it differently."
+            session.add(judge)
+            session.commit()
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+                json={"outputs": ["Some output"], "preview_id": preview_id, "background": False}
+            )
+            assert response.status_code == 200
+            assert judge_spy.call_count == 4
+
+            # Examples changed since the preview: the judge context differs, so re-evaluate
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/evaluate/preview",
+                json={"outputs": ["Some output"]}
+            )
+            preview_id = response.json()["preview_id"]
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/examples",
+                json={"content": "A better output", "type": "desired"}
+            )
+            assert response.status_code == 200
+            response = auth_client.post(
+                f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+                json={"outputs": ["Some output"], "preview_id": preview_id, "background": False}
+            )
+            assert response.status_code == 200
+            assert judge_spy.call_count == 6
+
+def test_commit_writes_off_the_event_loop(auth_client: TestClient, session: Session):
+    import asyncio
+    from unittest.mock import patch
+    from app.services import evaluation
+
+    project = Project(name="Loop Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Loop Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    session.add(MetricDefinition(
+        test_case_id=test_case.id, name="Judge", description="Desc",
+        metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED,
+        scale_min=0, scale_max=100, target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    ))
+    session.commit()
+
+    loops = []
+    def save(*args, **kwargs):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return original(*args, **kwargs)
+
+    original = evaluation.save_evaluation_run
+    with patch("app.services.evaluation.save_evaluation_run", side_effect=save):
+        response = auth_client.post(f"/api/v1/testcases/{test_case.id}/evaluate/commit", json={"outputs": ["text"], "background": False})
+    assert response.status_code == 200
+    assert response.json()["metric_results"]
+    # Ran in a worker thread, not on the event loop
+    assert loops == [None]
+
+def poll_run_status(client: TestClient, session: Session, run_id: int, timeout: float = 10.0) -> dict:
+    import time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        # The test shares one session with the app, drop its cached copy of the run
+        session.expire_all()
+        status = client.get(f"/api/v1/runs/{run_id}/status").json()
+        if status["status"] in ("completed", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError("Run did not finish in time")
+
+def test_background_commit(auth_client: TestClient, session: Session):
+    from unittest.mock import patch
+
+    project = Project(name="Background Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Background Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    session.add(MetricDefinition(
+        test_case_id=test_case.id, name="Judge", description="Desc",
+        metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED,
+        scale_min=0, scale_max=100, target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    ))
+    session.commit()
+
+    # Needs LLM calls and has no preview to reuse: background by default
+    response = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+        json={"outputs": ["a" * 42]}
+    )
+    assert response.status_code == 200
+    run = response.json()
+    assert run["status"] == "pending"
+    assert run["version_number"] == 1
+    assert run["metric_results"] == []
+
+    status = poll_run_status(auth_client, session, run["id"])
+    assert status["status"] == "completed"
+    assert status["aggregated_score"] == 42.0
+    session.expire_all()
+    assert len(auth_client.get(f"/api/v1/runs/{run['id']}").json()["metric_results"]) == 1
+
+    # Failures are recorded on the run instead of being lost
+    with patch("app.services.background.evaluate_test_case", side_effect=Exception("Judge exploded")):
+        response = auth_client.post(
+            f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+            json={"outputs": ["text"], "background": True}
+        )
+        run = response.json()
+        assert run["version_number"] == 2
+        status = poll_run_status(auth_client, session, run["id"])
+    assert status["status"] == "failed"
+    assert "Judge exploded" in status["error_message"]
+
+def test_interrupted_runs_are_failed_at_startup(auth_client: TestClient, session: Session):
+    from app.services.background import fail_interrupted_runs
+
+    project = Project(name="Restart Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Restart Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    for version, status in enumerate(["completed", "pending", "running"], start=1):
+        session.add(EvaluationRun(test_case_id=test_case.id, version_number=version, status=status, aggregated_score=50.0))
+    session.commit()
+
+    # Only completed runs are listed
+    assert [r["version_number"] for r in auth_client.get(f"/api/v1/testcases/{test_case.id}/runs").json()] == [1]
+
+    assert fail_interrupted_runs(session.get_bind()) == 2
+    session.expire_all()
+    runs = session.exec(select(EvaluationRun).where(EvaluationRun.test_case_id == test_case.id).order_by(EvaluationRun.version_number)).all()
+    assert [r.status for r in runs] == ["completed", "failed", "failed"]
+    assert runs[1].error_message == "Interrupted by a server restart"
+
+def parse_sse(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_preview_stream(auth_client: TestClient, session: Session):
+    project = Project(name="Stream Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Stream Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    for name in ["Judge A", "Judge B"]:
+        session.add(MetricDefinition(
+            test_case_id=test_case.id, name=name, description="Desc",
+            metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED,
+            scale_min=0, scale_max=100, target_direction=TargetDirection.HIGHER_IS_BETTER,
+            evaluation_prompt="Score it."
+        ))
+    session.add(MetricDefinition(
+        test_case_id=test_case.id, name="Length", description="Desc",
+        metric_type=MetricType.DETERMINISTIC, scale_type=ScaleType.UNBOUNDED,
+        target_direction=TargetDirection.HIGHER_IS_BETTER,
+        rule_definition='{"type": "char_count"}'
+    ))
+    session.commit()
+
+    response = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/preview/stream",
+        json={"outputs": ["a" * 25]}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names == ["metric", "metric", "metric", "aggregate", "gap_analysis", "result"]
+    # Deterministic results need no LLM call and come first
+    assert events[0][1]["metric_name"] == "Length"
+    assert events[0][1]["score"] == 25.0
+    assert sorted(e[1]["metric_name"] for e in events[1:3]) == ["Judge A", "Judge B"]
+    assert events[3][1]["aggregated_score"] == 25.0
+
+    result = events[-1][1]
+    assert result["gap_analysis"] == events[4][1]["gap_analysis"]
+    assert [r["metric_name"] for r in result["metric_results"]] == ["Judge A", "Judge B", "Length"]
+    assert result["preview_id"]
+
+    # The final event is a regular preview: it can be committed as-is
+    response = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+        json={"outputs": ["a" * 25], "preview_id": result["preview_id"]}
+    )
+    assert response.json()["aggregated_score"] == 25.0
+
+    response = auth_client.post(f"/api/v1/testcases/{test_case.id + 1000}/evaluate/preview/stream", json={"outputs": ["x"]})
+    assert response.status_code == 404
+
+def test_commit_persists_llm_telemetry(auth_client: TestClient, session: Session):
+    from sqlmodel import select
+    from app.models.evaluation import LLMCallTelemetry, MetricResult
+
+    project = Project(name="Telemetry Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Telemetry Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    judge = MetricDefinition(
+        test_case_id=test_case.id, name="Judge", description="Stub judge",
+        metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER, evaluation_prompt="Score it."
+    )
+    session.add(judge)
+    session.commit()
+
+    response = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+        json={"outputs": ["a" * 10, "a" * 30], "multi_sample": True, "background": False}
+    )
+    assert response.status_code == 200
+    run_id = response.json()["id"]
+
+    calls = session.exec(select(LLMCallTelemetry).where(LLMCallTelemetry.evaluation_run_id == run_id)).all()
+    judge_calls = sorted((c for c in calls if c.method == "judge_metric"), key=lambda c: c.sample_index)
+    assert [c.sample_index for c in judge_calls] == [0, 1]
+    metric_result = session.exec(select(MetricResult).where(MetricResult.evaluation_run_id == run_id)).one()
+    assert all(c.metric_result_id == metric_result.id for c in judge_calls)
+    assert all(c.project_id == project.id and c.success and c.latency_ms >= 0 for c in calls)
+    # Gap analysis is recorded too, without a metric
+    gap = [c for c in calls if c.method == "analyze_evaluation_results"]
+    assert len(gap) == 1 and gap[0].metric_result_id is None
+
+    response = auth_client.get("/api/v1/llm/telemetry", params={"group_by": "metric", "test_case_id": test_case.id})
+    assert response.status_code == 200
+    groups = {g["key"]: g for g in response.json()["groups"]}
+    assert groups[str(judge.id)]["calls"] == 2
+    assert groups[str(judge.id)]["latency_p50_ms"] <= groups[str(judge.id)]["latency_p99_ms"]
+    assert groups[str(judge.id)]["error_rate"] == 0.0
+    assert groups[None]["calls"] == 1
+
+    response = auth_client.get("/api/v1/llm/telemetry", params={"group_by": "nonsense"})
+    assert response.status_code == 400
+
+def test_preview_and_metric_design_calls_are_recorded(auth_client: TestClient, session: Session):
+    from app.models.evaluation import LLMCallTelemetry
+
+    project = Project(name="Preview Telemetry Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Preview Telemetry Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+
+    def calls():
+        session.expire_all()
+        return session.exec(select(LLMCallTelemetry).where(LLMCallTelemetry.test_case_id == test_case.id).order_by(LLMCallTelemetry.id)).all()
+
+    assert auth_client.post(f"/api/v1/testcases/{test_case.id}/metric-design", json={"user_intent": "Be helpful"}).status_code == 200
+    assert [(c.method, c.project_id, c.evaluation_run_id) for c in calls()] == [("generate_metric_proposals", project.id, None)]
+
+    session.add(MetricDefinition(
+        test_case_id=test_case.id, name="Judge", description="Desc",
+        metric_type=MetricType.LLM_JUDGE, scale_type=ScaleType.BOUNDED,
+        scale_min=0, scale_max=100, target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    ))
+    session.commit()
+    preview = auth_client.post(f"/api/v1/testcases/{test_case.id}/evaluate/preview", json={"outputs": ["a" * 10]}).json()
+    preview_calls = [c for c in calls() if c.method != "generate_metric_proposals"]
+    assert sorted(c.method for c in preview_calls) == ["analyze_evaluation_results", "judge_metric"]
+    assert all(c.evaluation_run_id is None for c in preview_calls)
+
+    # Committing the preview links its rows to the run instead of storing them again
+    run = auth_client.post(
+        f"/api/v1/testcases/{test_case.id}/evaluate/commit",
+        json={"outputs": ["a" * 10], "preview_id": preview["preview_id"]}
+    ).json()
+    linked = [c for c in calls() if c.method != "generate_metric_proposals"]
+    assert [c.id for c in linked] == [c.id for c in preview_calls]
+    assert all(c.evaluation_run_id == run["id"] for c in linked)
+    assert next(c for c in linked if c.method == "judge_metric").metric_result_id is not None
+
+    # Rows outside runs don't block deleting the test case
+    assert auth_client.delete(f"/api/v1/testcases/{test_case.id}").status_code == 204
+    assert calls() == []
+
+def test_telemetry_rollups_read_a_bounded_window(session: Session):
+    from datetime import datetime, timedelta
+    from unittest.mock import patch
+    from app.core.config import settings
+    from app.models.evaluation import LLMCallTelemetry
+    from app.services.telemetry import get_llm_telemetry_rollups
+
+    project = Project(name="Window Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Window Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    run = EvaluationRun(test_case_id=test_case.id, version_number=1, status="completed")
+    session.add(run)
+    session.commit()
+    now = datetime.utcnow()
+    for days_ago, latency in [(30, 999.0), (2, 30.0), (1, 20.0), (0, 10.0)]:
+        session.add(LLMCallTelemetry(
+            created_at=now - timedelta(days=days_ago), project_id=project.id, test_case_id=test_case.id,
+            evaluation_run_id=run.id, method="judge_metric", model="gpt-4o", latency_ms=latency
+        ))
+    session.commit()
+
+    # Without since: the default window leaves out the month-old call
+    rollups = get_llm_telemetry_rollups(session, project_id=project.id)
+    assert (rollups.groups[0].calls, rollups.groups[0].latency_p99_ms, rollups.truncated) == (3, 30.0, False)
+
+    # The cap keeps the most recent calls and says so
+    with patch.object(settings, "TELEMETRY_MAX_CALLS", 2):
+        rollups = get_llm_telemetry_rollups(session, project_id=project.id, since=now - timedelta(days=60))
+    assert (rollups.groups[0].calls, rollups.groups[0].latency_p99_ms, rollups.truncated) == (2, 20.0, True)
+
+def test_test_case_profile_is_cached_until_examples_change(auth_client: TestClient, session: Session):
+    from unittest.mock import patch
+    from app.services import profile
+
+    project = Project(name="Profile Project")
+    session.add(project)
+    session.commit()
+    test_case = TestCase(name="Profile Case", project_id=project.id)
+    session.add(test_case)
+    session.commit()
+    length = MetricDefinition(
+        test_case_id=test_case.id, name="Length", description="Length range", metric_type=MetricType.DETERMINISTIC,
+        scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER, rule_definition="Length within the desired range."
+    )
+    session.add(length)
+    session.commit()
+    response = auth_client.post(f"/api/v1/testcases/{test_case.id}/examples", json={"content": "a" * 100, "type": "desired"})
+    assert response.status_code == 200
+
+    def preview():
+        response = auth_client.post(f"/api/v1/testcases/{test_case.id}/evaluate/preview", json={"outputs": ["a" * 20]})
+        assert response.status_code == 200
+        return response.json()["metric_results"][0]
+
+    with patch("app.services.profile.build_test_case_profile", wraps=profile.build_test_case_profile) as build:
+        assert preview()["explanation"].endswith("range [90, 110] (derived from 1 desired examples).")
+        preview()
+        assert build.call_count == 1
+
+        # A new example invalidates the profile: the range now covers both examples
+        auth_client.post(f"/api/v1/testcases/{test_case.id}/examples", json={"content": "a" * 20, "type": "desired"})
+        result = preview()
+        assert build.call_count == 2
+        assert result["score"] == 100.0
+        assert "range [18, 110]" in result["explanation"]
+
+def test_concurrent_commits_get_distinct_versions(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from app.core.db import create_db_engine
+    from app.core.migrations import run_migrations
+    from app.schemas.evaluation import EvaluationRunPreviewResponse
+    from app.services.evaluation import save_evaluation_run
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    run_migrations(engine)
+    with Session(engine) as session:
+        project = Project(name="Concurrent Project")
+        session.add(project)
+        session.commit()
+        test_case = TestCase(name="Concurrent Case", project_id=project.id)
+        session.add(test_case)
+        session.commit()
+        test_case_id = test_case.id
+
+    def commit(_):
+        with Session(engine) as session:
+            eval_response = EvaluationRunPreviewResponse(metric_results=[], aggregated_score=50.0, warnings=[])
+            return save_evaluation_run(session, test_case_id, eval_response).version_number
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        versions = list(pool.map(commit, range(24)))
+    assert sorted(versions) == list(range(1, 25))
+    with Session(engine) as session:
+        assert session.get(TestCase, test_case_id).last_version_number == 24
+    engine.dispose()
@@ -0,0 +1,86 @@
+import asyncio
+from unittest.mock import patch
+
+import openai
+import pytest
+from pydantic import SecretStr
+
+from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+from app.models.test_case import TestCase
+from app.providers.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from app.providers.llm import AsyncOpenAILLMProvider, LLMProviderRegistry, TelemetryLLMProvider
+from app.providers.telemetry import collect_llm_calls
+
+def make_metric(metric_id):
+    return MetricDefinition(
+        id=metric_id, name=f"Judge {metric_id}", description="Desc", metric_type=MetricType.LLM_JUDGE,
+        scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    )
+
+def make_test_case():
+    return TestCase(name="TC", description="Desc", project_id=1)
+
+@pytest.fixture
+def fake_server():
+    with FakeOpenAIServer(FakeOpenAIConfig(seed=1)) as server:
+        with patch("app.core.config.settings.OPENAI_API_KEY", SecretStr("test-key")), \
+             patch("app.core.config.settings.OPENAI_BASE_URL", server.base_url), \
+             patch("app.core.config.settings.LLM_MODE", "openai"), \
+             patch("app.core.config.settings.LLM_SCHEDULER_ENABLED", False), \
+             patch("app.core.config.settings.LLM_MAX_RETRIES", 0):
+            yield server
+
+def test_fake_server_answers_through_the_client_stack(fake_server):
+    registry = LLMProviderRegistry()
+    provider = registry.get("fake-model")
+
+    result = provider.judge_metric(make_metric(1), "Candidate", "Ctx")
+    assert result.score == float(len("Candidate"))
+    judged = provider.judge_metrics([make_metric(1), make_metric(2)], "Candidate", "Ctx")
+    assert set(judged) == {1, 2}
+    assert provider.generate_metric_proposals("Intent", make_test_case()).gap_analysis
+    assert provider.analyze_evaluation_results(make_test_case(), []).startswith("Fake completion")
+
+    async def judge_async():
+        async_provider = AsyncOpenAILLMProvider(override_model="fake-model")
+        return await async_provider.judge_metric(make_metric(1), "Candidate!", "Ctx")
+    assert asyncio.run(judge_async()).score == float(len("Candidate!"))
+
+    stats = fake_server.stats.snapshot()
+    assert stats["requests"] == 5
+    assert stats["statuses"] == {200: 5}
+    assert stats["input_tokens"] > 0 and stats["output_tokens"] > 0
+    registry.close()
+
+def test_fake_server_reports_prompt_cache_hits(fake_server):
+    provider = TelemetryLLMProvider(LLMProviderRegistry().get("fake-model"))
+    context = "Example output. " * 400 # Pushes the system prompt past the 1024-token cache minimum
+    with collect_llm_calls() as calls:
+        provider.judge_metric(make_metric(1), "Candidate", context)
+        provider.judge_metric(make_metric(2), "Candidate", context)
+    assert calls[0].cached_input_tokens == 0
+    assert calls[1].cached_input_tokens >= 1024
+
+def test_fake_server_injects_errors(fake_server):
+    provider = LLMProviderRegistry().get("fake-model")
+    fake_server.config.server_error_rate = 1.0
+    with pytest.raises(openai.InternalServerError):
+        provider.judge_metric(make_metric(1), "Candidate", "Ctx")
+
+    fake_server.config.server_error_rate = 0.0
+    fake_server.config.rate_limit_rate = 1.0
+    with pytest.raises(openai.RateLimitError):
+        provider.judge_metric(make_metric(1), "Candidate", "Ctx")
+    assert fake_server.stats.statuses == {500: 1, 429: 1}
+
+def test_fake_server_rejects_malformed_bodies(fake_server):
+    import httpx
+
+    for content in (b"{not json", b"[1, 2]"):
+        response = httpx.post(f"{fake_server.base_url}/chat/completions", content=content, headers={"content-type": "application/json"})
+        assert response.status_code == 400
+        assert response.json()["error"]["type"] == "invalid_request_error"
+    # Not counted as simulated traffic
+    assert fake_server.stats.snapshot()["requests"] == 0
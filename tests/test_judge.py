@@ -94,3 +94,307 @@ def test_evaluation_fallback(session: Session):
                     res = run.metric_results[0]
                     assert "Error during LLM judgment" in res["explanation"]
                     # assert res["score"] is not None # Stub score (it is 0.0)
+
+def test_evaluation_judges_concurrently_in_order(session: Session):
+    import time
+    proj = Project(name="P_Concurrent")
+    session.add(proj)
+    session.commit()
+    tc = TestCase(name="T_Concurrent", description="Intent", project_id=proj.id)
+    session.add(tc)
+    session.commit()
+    session.refresh(tc)
+
+    metrics = []
+    for i in range(4):
+        m = MetricDefinition(
+            name=f"Judge{i}", description="Desc", test_case_id=tc.id,
+            metric_type=MetricType.LLM_JUDGE,
+            scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+            target_direction=TargetDirection.HIGHER_IS_BETTER,
+            evaluation_prompt="Prompt"
+        )
+        session.add(m)
+        metrics.append(m)
+    session.commit()
+
+    class SlowProvider(StubLLMProvider):
+        def judge_metric(self, metric, candidate_text, test_case_context):
+            time.sleep(0.2)
+            if metric.name == "Judge2":
+                raise Exception("API Error")
+            return JudgeResult(score=float(metric.name[-1]) * 10, explanation=metric.name)
+
+    with patch("app.core.config.settings.EVAL_JUDGE_CONCURRENCY", 4):
+        with patch("app.services.evaluation.get_llm_provider", return_value=SlowProvider()):
+            start = time.monotonic()
+            run = evaluate_test_case(tc, metrics, ["Candidate text"])
+            elapsed = time.monotonic() - start
+
+    # 4 judges x 0.2s run in parallel, not back to back
+    assert elapsed < 0.6
+    assert [r["metric_name"] for r in run.metric_results] == ["Judge0", "Judge1", "Judge2", "Judge3"]
+    assert run.metric_results[1]["score"] == 10.0
+    assert "Error during LLM judgment" in run.metric_results[2]["explanation"]
+    assert run.metric_results[2]["score"] == 0.0
+
+def test_async_evaluation_bounds_in_flight_judges(session: Session):
+    import asyncio
+    import time
+    from app.providers.llm import AsyncStubLLMProvider
+    from app.services.evaluation import evaluate_test_case_async
+
+    proj = Project(name="P_Async")
+    session.add(proj)
+    session.commit()
+    tc = TestCase(name="T_Async", description="Intent", project_id=proj.id)
+    session.add(tc)
+    session.commit()
+    session.refresh(tc)
+
+    metrics = []
+    for i in range(6):
+        m = MetricDefinition(
+            name=f"Judge{i}", description="Desc", test_case_id=tc.id,
+            metric_type=MetricType.LLM_JUDGE,
+            scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+            target_direction=TargetDirection.HIGHER_IS_BETTER,
+            evaluation_prompt="Prompt"
+        )
+        session.add(m)
+        metrics.append(m)
+    session.commit()
+
+    class SlowAsyncProvider(AsyncStubLLMProvider):
+        in_flight = 0
+        peak = 0
+
+        async def judge_metric(self, metric, candidate_text, test_case_context):
+            SlowAsyncProvider.in_flight += 1
+            SlowAsyncProvider.peak = max(SlowAsyncProvider.peak, SlowAsyncProvider.in_flight)
+            await asyncio.sleep(0.1)
+            SlowAsyncProvider.in_flight -= 1
+            if metric.name == "Judge2":
+                raise Exception("API Error")
+            return JudgeResult(score=float(metric.name[-1]) * 10, explanation=metric.name)
+
+    with patch("app.core.config.settings.EVAL_JUDGE_CONCURRENCY", 3):
+        with patch("app.services.evaluation.get_async_llm_provider", return_value=SlowAsyncProvider()):
+            start = time.monotonic()
+            run = asyncio.run(evaluate_test_case_async(tc, metrics, ["a", "bb"], multi_sample=True))
+            elapsed = time.monotonic() - start
+
+    # 12 judge calls, 3 at a time, on one thread
+    assert SlowAsyncProvider.peak == 3
+    assert elapsed < 0.8
+    assert [r["metric_name"] for r in run.metric_results] == [f"Judge{i}" for i in range(6)]
+    assert run.metric_results[1]["score"] == 10.0
+    assert run.metric_results[2]["score"] == 0.0
+    assert len(run.sample_results) == 12
+    assert run.gap_analysis.startswith("Stub Gap Analysis")
+
+def test_failed_judge_is_excluded_from_aggregate(session: Session):
+    proj = Project(name="P_Failed")
+    session.add(proj)
+    session.commit()
+    tc = TestCase(name="T_Failed", description="Intent", project_id=proj.id)
+    session.add(tc)
+    session.commit()
+    session.refresh(tc)
+
+    metrics = []
+    for name in ["Healthy", "Throttled"]:
+        m = MetricDefinition(
+            name=name, description="Desc", test_case_id=tc.id,
+            metric_type=MetricType.LLM_JUDGE,
+            scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+            target_direction=TargetDirection.HIGHER_IS_BETTER,
+            evaluation_prompt="Prompt"
+        )
+        session.add(m)
+        metrics.append(m)
+    session.commit()
+
+    class ThrottledProvider(StubLLMProvider):
+        def judge_metric(self, metric, candidate_text, test_case_context):
+            if metric.name == "Throttled":
+                raise Exception("429 Too Many Requests")
+            return JudgeResult(score=80.0, explanation="fine")
+
+    with patch("app.services.evaluation.get_llm_provider", return_value=ThrottledProvider()):
+        run = evaluate_test_case(tc, metrics, ["Candidate text"])
+
+    # The outage must not drag the score down as if it were a real 0.0
+    assert run.aggregated_score == 80.0
+    assert run.metric_results[1]["failed"] is True
+    assert "429" in run.metric_results[1]["raw_json"]
+    assert "Metric 'Throttled' excluded from aggregate (judge call failed)." in run.warnings
+
+def test_multi_metric_judge_falls_back_for_missing_metrics(session: Session):
+    import asyncio
+    from app.providers.llm import AsyncStubLLMProvider
+    from app.services.evaluation import evaluate_test_case_async
+
+    proj = Project(name="P_Multi")
+    session.add(proj)
+    session.commit()
+    tc = TestCase(name="T_Multi", description="Intent", project_id=proj.id)
+    session.add(tc)
+    session.commit()
+    session.refresh(tc)
+
+    metrics = []
+    for i in range(3):
+        m = MetricDefinition(
+            name=f"Judge{i}", description="Desc", test_case_id=tc.id,
+            metric_type=MetricType.LLM_JUDGE,
+            scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+            target_direction=TargetDirection.HIGHER_IS_BETTER,
+            evaluation_prompt="Prompt"
+        )
+        session.add(m)
+        metrics.append(m)
+    session.commit()
+
+    calls = {"multi": 0, "single": []}
+
+    class PartialProvider(StubLLMProvider):
+        def judge_metrics(self, requested, candidate_text, test_case_context):
+            calls["multi"] += 1
+            # Judge2 is left out of the answer
+            return {m.id: JudgeResult(score=50.0 + int(m.name[-1]), explanation="multi") for m in requested if m.name != "Judge2"}
+
+        def judge_metric(self, metric, candidate_text, test_case_context):
+            calls["single"].append(metric.name)
+            return JudgeResult(score=90.0, explanation="single")
+
+    with patch("app.core.config.settings.EVAL_MULTI_METRIC_JUDGE", True):
+        with patch("app.services.evaluation.get_llm_provider", return_value=PartialProvider()):
+            run = evaluate_test_case(tc, metrics, ["Candidate text"])
+
+    assert calls == {"multi": 1, "single": ["Judge2"]}
+    assert [r["score"] for r in run.metric_results] == [50.0, 51.0, 90.0]
+    assert run.aggregated_score == (50.0 + 51.0 + 90.0) / 3
+
+    class BrokenAsyncProvider(AsyncStubLLMProvider):
+        async def judge_metrics(self, requested, candidate_text, test_case_context):
+            raise Exception("schema mismatch")
+
+    with patch("app.core.config.settings.EVAL_MULTI_METRIC_JUDGE", True):
+        with patch("app.services.evaluation.get_async_llm_provider", return_value=BrokenAsyncProvider()):
+            run = asyncio.run(evaluate_test_case_async(tc, metrics, ["a" * 30, "a" * 10], multi_sample=True))
+
+    # The whole group failed, so every metric was judged on its own
+    assert len(run.sample_results) == 6
+    assert [r["score"] for r in run.metric_results] == [20.0, 20.0, 20.0]
+
+def test_self_consistency_sampling_stops_early(session: Session):
+    import asyncio
+    import json
+    import threading
+    from app.providers.llm import AsyncStubLLMProvider
+    from app.services.evaluation import evaluate_test_case_async
+
+    proj = Project(name="P_Sampling")
+    session.add(proj)
+    session.commit()
+    tc = TestCase(name="T_Sampling", description="Intent", project_id=proj.id)
+    session.add(tc)
+    session.commit()
+    session.refresh(tc)
+
+    metrics = []
+    for name in ["Stable", "Contested"]:
+        m = MetricDefinition(
+            name=name, description="Desc", test_case_id=tc.id,
+            metric_type=MetricType.LLM_JUDGE,
+            scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+            target_direction=TargetDirection.HIGHER_IS_BETTER,
+            evaluation_prompt="Prompt", judge_max_samples=5, judge_variance_threshold=10.0
+        )
+        session.add(m)
+        metrics.append(m)
+    session.commit()
+
+    lock = threading.Lock()
+    calls = {"Stable": [], "Contested": []}
+
+    def answer(metric, sample):
+        with lock:
+            calls[metric.name].append(sample)
+        if metric.name == "Stable":
+            return JudgeResult(score=80.0 + sample % 2, explanation="stable")
+        # Alternates between 40 and 60: never settles
+        return JudgeResult(score=40.0 + 20 * (sample % 2), explanation="contested")
+
+    class SampledProvider(StubLLMProvider):
+        def judge_metric(self, metric, candidate_text, test_case_context, sample=0):
+            return answer(metric, sample)
+
+    class AsyncSampledProvider(AsyncStubLLMProvider):
+        async def judge_metric(self, metric, candidate_text, test_case_context, sample=0):
+            return answer(metric, sample)
+
+    with patch("app.services.evaluation.get_llm_provider", return_value=SampledProvider()):
+        run = evaluate_test_case(tc, metrics, ["Candidate text"])
+    stable, contested = [json.loads(r["raw_json"]) for r in run.metric_results]
+    # One wave of two agreeing samples is enough
+    assert sorted(calls["Stable"]) == [0, 1]
+    assert stable["samples"] == 2 and stable["settled"] is True
+    assert run.metric_results[0]["score"] == 80.5
+    # The contested metric runs into the cap: waves of 2, 2 and 1
+    assert sorted(calls["Contested"]) == [0, 1, 2, 3, 4]
+    assert contested["samples"] == 5 and contested["settled"] is False
+    assert contested["scores"] == [40.0, 60.0, 40.0, 60.0, 40.0]
+    assert run.metric_results[1]["score"] == 48.0
+    assert round(contested["stddev"], 2) == 10.95
+
+    calls = {"Stable": [], "Contested": []}
+    with patch("app.services.evaluation.get_async_llm_provider", return_value=AsyncSampledProvider()):
+        async_run = asyncio.run(evaluate_test_case_async(tc, metrics, ["Candidate text"]))
+    assert [r["raw_json"] for r in async_run.metric_results] == [r["raw_json"] for r in run.metric_results]
+    assert len(calls["Stable"]) == 2 and len(calls["Contested"]) == 5
+
+    # A provider that can't sample is judged once per metric, also behind the registry's wrappers
+    from app.providers.cache import CachedLLMProvider
+    from app.providers.llm import TelemetryLLMProvider
+    from app.providers.scheduler import LLMScheduler, ScheduledLLMProvider
+
+    class SingleAnswerProvider(SampledProvider):
+        supports_sampling = False
+
+    calls = {"Stable": [], "Contested": []}
+    wrapped = TelemetryLLMProvider(ScheduledLLMProvider(CachedLLMProvider(SingleAnswerProvider(), MagicMock()), LLMScheduler()))
+    assert wrapped.supports_sampling is False
+    with patch("app.services.evaluation.get_llm_provider", return_value=TelemetryLLMProvider(SingleAnswerProvider())):
+        evaluate_test_case(tc, metrics, ["Candidate text"])
+    assert calls == {"Stable": [0], "Contested": [0]}
+
+def test_metric_sampling_update(client, session: Session):
+    proj = Project(name="P_SamplingApi")
+    session.add(proj)
+    session.commit()
+    tc = TestCase(name="T_SamplingApi", description="Intent", project_id=proj.id)
+    session.add(tc)
+    session.commit()
+    judge = MetricDefinition(
+        name="Judge", description="Desc", test_case_id=tc.id, metric_type=MetricType.LLM_JUDGE,
+        scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER, evaluation_prompt="Prompt"
+    )
+    rule = MetricDefinition(
+        name="Rule", description="Desc", test_case_id=tc.id, metric_type=MetricType.DETERMINISTIC,
+        scale_type=ScaleType.UNBOUNDED, target_direction=TargetDirection.LOWER_IS_BETTER, rule_definition="Count 'x'."
+    )
+    session.add(judge)
+    session.add(rule)
+    session.commit()
+
+    response = client.put(f"/api/v1/metrics/{judge.id}/sampling", json={"judge_max_samples": 4, "judge_variance_threshold": 4.0})
+    assert response.status_code == 200
+    assert response.json()["judge_max_samples"] == 4
+    assert response.json()["judge_variance_threshold"] == 4.0
+
+    assert client.put(f"/api/v1/metrics/{judge.id}/sampling", json={"judge_max_samples": 0}).status_code == 422
+    assert client.put(f"/api/v1/metrics/{judge.id}/sampling", json={"judge_max_samples": 1000}).status_code == 400
+    assert client.put(f"/api/v1/metrics/{rule.id}/sampling", json={"judge_max_samples": 3}).status_code == 400
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+from app.providers.cache import CachedLLMProvider, LLMResponseCache
+from app.providers.llm import StubLLMProvider, TelemetryLLMProvider, get_llm_provider
+from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+from app.models.test_case import TestCase
+
+class CountingProvider(StubLLMProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def judge_metric(self, metric, candidate_text, test_case_context, sample=0):
+        self.calls += 1
+        return super().judge_metric(metric, candidate_text, test_case_context, sample)
+
+    def analyze_evaluation_results(self, test_case, metric_results):
+        self.calls += 1
+        return super().analyze_evaluation_results(test_case, metric_results)
+
+def make_metric(prompt="Score it."):
+    return MetricDefinition(
+        name="Judge", description="Desc", metric_type=MetricType.LLM_JUDGE,
+        scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt=prompt
+    )
+
+def test_cache_hits_identical_inputs(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.db"))
+    inner = CountingProvider()
+    provider = CachedLLMProvider(inner, cache)
+
+    first = provider.judge_metric(make_metric(), "Candidate", "Ctx")
+    second = provider.judge_metric(make_metric(), "Candidate", "Ctx")
+    assert first == second
+    assert inner.calls == 1
+
+    # Any change to the metric definition or inputs is a different key
+    provider.judge_metric(make_metric(prompt="Other prompt"), "Candidate", "Ctx")
+    provider.judge_metric(make_metric(), "Candidate!", "Ctx")
+    assert inner.calls == 3
+
+    tc = TestCase(name="TC", project_id=1)
+    results = [{"metric_name": "Judge", "score": 50.0, "explanation": "ok"}]
+    assert provider.analyze_evaluation_results(tc, results) == provider.analyze_evaluation_results(tc, results)
+    assert inner.calls == 4
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 4
+    assert stats["entries"] == 4
+
+def test_cache_keeps_judge_samples_apart(tmp_path):
+    inner = CountingProvider()
+    provider = CachedLLMProvider(inner, LLMResponseCache(str(tmp_path / "cache.db")))
+    # Self-consistency draws are distinct calls; repeating a draw is a hit
+    for sample in [0, 1, 2, 1]:
+        provider.judge_metric(make_metric(), "Candidate", "Ctx", sample=sample)
+    assert inner.calls == 3
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    CachedLLMProvider(CountingProvider(), LLMResponseCache(path)).judge_metric(make_metric(), "Text", "Ctx")
+
+    inner = CountingProvider()
+    CachedLLMProvider(inner, LLMResponseCache(path)).judge_metric(make_metric(), "Text", "Ctx")
+    assert inner.calls == 0
+
+def test_cache_age_and_size_eviction(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.db"), max_entries=2, ttl_seconds=60)
+    with patch("app.providers.cache.time.time", return_value=1000.0):
+        cache.set("a", "m", "model", "A")
+    with patch("app.providers.cache.time.time", return_value=1100.0):
+        # Expired entries read as misses
+        assert cache.get("a") is None
+        cache.set("b", "m", "model", "B")
+        cache.set("c", "m", "model", "C")
+        cache.set("d", "m", "model", "D")
+        cache.evict()
+    assert cache.stats()["entries"] == 2
+
+def test_get_llm_provider_wraps_when_enabled(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.db"))
+    with patch("app.core.config.settings.LLM_CACHE_ENABLED", True):
+        with patch("app.providers.cache.get_llm_cache", return_value=cache):
+            provider = get_llm_provider()
+    # Telemetry is the outermost layer; the cache sits directly beneath it
+    assert isinstance(provider, TelemetryLLMProvider)
+    assert isinstance(provider.inner, CachedLLMProvider)
+    assert isinstance(provider.inner.inner, StubLLMProvider)
+
+def test_cache_hits_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = LLMResponseCache(path)
+    cache.set("a", "m", "model", "A")
+    with patch("app.providers.cache.time.time", return_value=5000.0):
+        assert cache.get("a") == "A"
+        assert cache.get("a") == "A"
+
+    # Hits stay in memory until the next write or flush
+    reader = LLMResponseCache(path)
+    assert reader._conn.execute("SELECT hits FROM llm_cache WHERE key = 'a'").fetchone()[0] == 0
+    cache.flush()
+    assert reader._conn.execute("SELECT hits, last_used_at FROM llm_cache WHERE key = 'a'").fetchone() == (2, 5000.0)
+
+def test_cache_keys_change_with_the_prompt_version(tmp_path):
+    inner = CountingProvider()
+    provider = CachedLLMProvider(inner, LLMResponseCache(str(tmp_path / "cache.db")))
+    provider.judge_metric(make_metric(), "Candidate", "Ctx")
+    # Answers to a previous prompt wording are not served
+    with patch("app.providers.cache.PROMPT_VERSION", 999):
+        provider.judge_metric(make_metric(), "Candidate", "Ctx")
+    assert inner.calls == 2
@@ -1,8 +1,9 @@
+import asyncio
 import pytest
 from unittest.mock import MagicMock, patch
 from pydantic import SecretStr
 from app.core.config import Settings
-from app.providers.llm import OpenAILLMProvider, get_llm_provider, StubLLMProvider
+from app.providers.llm import OpenAILLMProvider, get_llm_provider, StubLLMProvider, TelemetryLLMProvider
 from app.models.test_case import TestCase
 from app.schemas.metric import StructuredLLMResponse
 
@@ -10,7 +11,8 @@ def test_default_is_stub():
     # settings.LLM_MODE default is "stub"
     with patch("app.core.config.settings.LLM_MODE", "stub"):
         provider = get_llm_provider()
-        assert isinstance(provider, StubLLMProvider)
+        assert isinstance(provider, TelemetryLLMProvider)
+        assert isinstance(provider.inner, StubLLMProvider)
 
 def test_config_validation_fail_fast():
     # If LLM_MODE is openai but no key
@@ -87,3 +89,155 @@ def test_openai_report_narrative_mock_call():
             provider.generate_report_narrative(MockContent())
             
             mock_create.assert_called_once()
+
+def test_async_openai_judge_mock_call():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+    from app.providers.llm import AsyncOpenAILLMProvider, AsyncStubLLMProvider, AsyncTelemetryLLMProvider, get_async_llm_provider
+    from app.schemas.llm_validation import JudgeResult
+
+    with patch("app.core.config.settings.LLM_MODE", "stub"):
+        provider = get_async_llm_provider()
+        assert isinstance(provider, AsyncTelemetryLLMProvider)
+        assert isinstance(provider.inner, AsyncStubLLMProvider)
+
+    with patch("app.core.config.settings.OPENAI_API_KEY", SecretStr("test-key")):
+        with patch("openai.AsyncOpenAI") as mock_openai_cls:
+            mock_client = MagicMock()
+            mock_openai_cls.return_value = mock_client
+            mock_client.responses.parse = AsyncMock(return_value=MagicMock(output_parsed=JudgeResult(score=42, explanation="ok")))
+
+            provider = AsyncOpenAILLMProvider(override_model="gpt-4o-mini")
+            metric = MetricDefinition(
+                name="Tone", description="Desc", metric_type=MetricType.LLM_JUDGE,
+                scale_type=ScaleType.BOUNDED, target_direction=TargetDirection.HIGHER_IS_BETTER
+            )
+            result = asyncio.run(provider.judge_metric(metric, "Candidate", "Context"))
+
+            assert result.score == 42
+            call_kwargs = mock_client.responses.parse.await_args[1]
+            assert call_kwargs["model"] == "gpt-4o-mini"
+            assert call_kwargs["text_format"] == JudgeResult
+
+def test_provider_registry_shares_client():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from app.providers.llm import LLMProviderRegistry
+
+    registry = LLMProviderRegistry()
+    with patch("app.core.config.settings.LLM_MODE", "stub"):
+        assert registry.get() is registry.get()
+
+    with patch("app.core.config.settings.OPENAI_API_KEY", SecretStr("test-key")), patch("app.core.config.settings.LLM_SCHEDULER_ENABLED", False):
+        with patch("app.core.config.settings.LLM_MODE", "openai"):
+            with patch("openai.OpenAI") as mock_openai_cls, patch("openai.AsyncOpenAI") as mock_async_cls:
+                mock_async_cls.return_value.close = AsyncMock()
+                default = registry.get()
+                mini = registry.get("gpt-4o-mini")
+                assert registry.get("gpt-4o-mini") is mini
+                assert default is not mini
+                assert mini.model == "gpt-4o-mini"
+                # One client (and connection pool) for every model
+                assert mock_openai_cls.call_count == 1
+                assert default.client is mini.client
+
+                async def use_async():
+                    first = registry.get_async("gpt-4o-mini")
+                    assert registry.get_async("gpt-4o-mini") is first
+                    assert registry.get_async().client is first.client
+                    await registry.aclose()
+
+                asyncio.run(use_async())
+                assert mock_async_cls.call_count == 1
+                mock_async_cls.return_value.close.assert_awaited_once()
+                mock_openai_cls.return_value.close.assert_called_once()
+                # Closed registries start over
+                assert registry.get() is not default
+
+def test_openai_multi_metric_judge_validates_ids():
+    from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+    from app.schemas.llm_validation import MetricJudgement, MultiJudgeResult
+
+    with patch("app.core.config.settings.OPENAI_API_KEY", SecretStr("test-key")):
+        with patch("openai.OpenAI") as mock_openai_cls:
+            mock_client = MagicMock()
+            mock_openai_cls.return_value = mock_client
+            mock_client.responses.parse.return_value = MagicMock(output_parsed=MultiJudgeResult(results=[
+                MetricJudgement(metric_id=1, score=70, explanation="first"),
+                MetricJudgement(metric_id=1, score=10, explanation="duplicate"),
+                MetricJudgement(metric_id=99, score=50, explanation="not requested"),
+            ]))
+
+            metrics = [
+                MetricDefinition(
+                    id=metric_id, name=f"M{metric_id}", description="Desc", metric_type=MetricType.LLM_JUDGE,
+                    scale_type=ScaleType.BOUNDED, target_direction=TargetDirection.HIGHER_IS_BETTER
+                )
+                for metric_id in (1, 2)
+            ]
+            judged = OpenAILLMProvider().judge_metrics(metrics, "Candidate", "Shared test case context")
+
+            assert mock_client.responses.parse.call_count == 1
+            prompt = "\n".join(m["content"] for m in mock_client.responses.parse.call_args[1]["input"])
+            assert prompt.count("Shared test case context") == 1 and "Metric ID: 2" in prompt
+            assert list(judged) == [1]
+            assert judged[1].explanation == "first"
+
+def test_llm_call_telemetry_records_usage_and_errors():
+    from types import SimpleNamespace
+    from app.providers.telemetry import collect_llm_calls, llm_call, llm_call_labels, note_retry, note_usage
+
+    with collect_llm_calls() as calls:
+        with llm_call_labels(metric_definition_id=7):
+            with llm_call("judge_metric", "gpt-4o-mini"):
+                # Responses API naming
+                note_usage(SimpleNamespace(input_tokens=120, output_tokens=30, input_tokens_details=SimpleNamespace(cached_tokens=100)))
+                note_retry()
+        with llm_call("generate_report_narrative", "gpt-4o-mini"):
+            # Chat Completions naming
+            note_usage(SimpleNamespace(prompt_tokens=50, completion_tokens=5, prompt_tokens_details=None))
+        with pytest.raises(RuntimeError):
+            with llm_call("judge_metric", "gpt-4o-mini"):
+                raise RuntimeError("boom")
+
+    assert [(c.input_tokens, c.output_tokens) for c in calls] == [(120, 30), (50, 5), (None, None)]
+    assert calls[0].metric_definition_id == 7 and calls[0].retries == 1
+    assert [c.cached_input_tokens for c in calls] == [100, None, None]
+    assert calls[1].metric_definition_id is None
+    assert not calls[2].success and calls[2].error == "boom"
+
+    # A cancelled call (e.g. an SSE client going away) did not succeed either
+    async def cancelled_call():
+        with llm_call("judge_metric", "gpt-4o-mini"):
+            await asyncio.sleep(10)
+    async def cancel_it():
+        task = asyncio.ensure_future(cancelled_call())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    with collect_llm_calls() as calls:
+        asyncio.run(cancel_it())
+    assert not calls[0].success and calls[0].error == "CancelledError"
+
+def test_judge_prompts_share_a_cacheable_prefix():
+    from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+    from app.providers.llm import build_judge_messages
+
+    def metric(name):
+        return MetricDefinition(
+            name=name, description=f"{name} description", metric_type=MetricType.LLM_JUDGE,
+            scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+            target_direction=TargetDirection.HIGHER_IS_BETTER, evaluation_prompt=f"Judge {name}."
+        )
+
+    context = "Long test case context " * 50
+    tone = build_judge_messages(metric("Tone"), "Candidate", context)
+    clarity = build_judge_messages(metric("Clarity"), "Candidate", context)
+    # Everything up to the metric text is identical across metrics: instructions, context, output
+    assert tone[0] == clarity[0]
+    assert context in tone[0]["content"]
+    shared = tone[1]["content"][:tone[1]["content"].index("Metric Name")]
+    assert "Candidate" in shared and clarity[1]["content"].startswith(shared)
+    assert "Tone" not in tone[0]["content"] + shared
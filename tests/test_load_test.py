@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+
+from app.core.db import get_session
+from app.main import app
+from scripts.load_test import parse_mix, run_load_test
+
+def test_load_test_reports_every_endpoint_of_the_mix(session):
+    app.dependency_overrides[get_session] = lambda: session
+    try:
+        report = asyncio.run(run_load_test(
+            "http://testserver", stages=[1], duration=1.0, mix=parse_mix("testcase_dashboard=1,commit=1,report=1"),
+            email="load@example.com", password="secret", transport=httpx.ASGITransport(app=app)
+        ))
+    finally:
+        app.dependency_overrides.clear()
+
+    stage = report["stages"][0]
+    assert stage["users"] == 1
+    assert stage["errors"] == 0
+    endpoints = stage["endpoints"]
+    assert endpoints["POST /auth/login"]["requests"] == 1
+    assert stage["requests"] > 1
+    # Commits go through a preview first
+    assert set(endpoints) <= {
+        "POST /auth/login", "GET /testcases/{id}/dashboard", "POST /testcases/{id}/evaluate/preview",
+        "POST /testcases/{id}/evaluate/commit", "POST /testcases/{id}/report"
+    }
+    for stats in endpoints.values():
+        assert sum(stats["histogram"].values()) == stats["requests"]
+        assert stats["p50_ms"] <= stats["p99_ms"] <= stats["max_ms"]
@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import inspect
+from sqlmodel import SQLModel
+
+from app.core.db import create_db_engine
+from app.core.migrations import LATEST_VERSION, MIGRATIONS, run_migrations
+from benchmarks.harness import QueryCounter
+
+def _indexes(engine):
+    inspector = inspect(engine)
+    return {
+        (table, index["name"], tuple(index["column_names"]))
+        for table in inspector.get_table_names() if table != "schema_version"
+        for index in inspector.get_indexes(table)
+    }
+
+def test_fresh_database_is_migrated_once(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS]
+    assert ("evaluationrun", "ix_evaluationrun_test_case_status_version", ("test_case_id", "status", "version_number")) in _indexes(engine)
+    assert ("metricresult", "ix_metricresult_run_metric", ("evaluation_run_id", "metric_definition_id")) in _indexes(engine)
+
+    # Current schema: the version check only, no reflection or DDL
+    with QueryCounter(engine).attached() as counter:
+        assert run_migrations(engine) == []
+    assert counter.count == 2
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT MAX(version) FROM schema_version").scalar() == LATEST_VERSION
+    engine.dispose()
+
+def test_unversioned_database_is_brought_up_to_date(tmp_path):
+    reference = create_db_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    SQLModel.metadata.create_all(reference)
+
+    # A database from before versioning: created by an older create_all, missing later columns and indexes
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for name in ("ix_evaluationrun_test_case_status_version", "ix_metricresult_run_metric", "ix_testcase_project_id"):
+            connection.exec_driver_sql(f"DROP INDEX {name}")
+        connection.exec_driver_sql("ALTER TABLE evaluationrun DROP COLUMN error_message")
+        connection.exec_driver_sql("ALTER TABLE metricdefinition DROP COLUMN judge_variance_threshold")
+        connection.exec_driver_sql("ALTER TABLE testcase DROP COLUMN last_version_number")
+        connection.exec_driver_sql("DROP INDEX ux_evaluationrun_test_case_version")
+        connection.exec_driver_sql("INSERT INTO project (name, created_at) VALUES ('Legacy', '2024-01-01 00:00:00')")
+        connection.exec_driver_sql("INSERT INTO testcase (name, project_id, created_at) VALUES ('Legacy case', 1, '2024-01-01 00:00:00')")
+        for version in (1, 2, 7):
+            connection.exec_driver_sql(f"INSERT INTO evaluationrun (test_case_id, version_number, status, created_at) VALUES (1, {version}, 'completed', '2024-01-01 00:00:00')")
+
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS]
+    columns = {c["name"] for c in inspect(engine).get_columns("evaluationrun")}
+    assert "error_message" in columns
+    assert _indexes(engine) == _indexes(reference)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT name FROM project").scalars().all() == ["Legacy"]
+        # The version counter continues from the highest existing run
+        assert connection.exec_driver_sql("SELECT last_version_number FROM testcase").scalar() == 7
+    engine.dispose()
+    reference.dispose()
+
+def test_frozen_baseline_plus_migrations_match_the_models(tmp_path):
+    reference = create_db_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    SQLModel.metadata.create_all(reference)
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    run_migrations(engine)
+
+    # A model change without a migration shows up here
+    def columns(db_engine):
+        inspector = inspect(db_engine)
+        return {
+            table: {c["name"] for c in inspector.get_columns(table)}
+            for table in inspector.get_table_names() if table != "schema_version"
+        }
+    assert columns(engine) == columns(reference)
+    assert _indexes(engine) == _indexes(reference)
+    engine.dispose()
+    reference.dispose()
+
+def test_concurrent_startups_apply_each_migration_once(tmp_path):
+    engines = [create_db_engine(f"sqlite:///{tmp_path / 'app.db'}") for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=len(engines)) as pool:
+        applied = list(pool.map(run_migrations, engines))
+    assert sorted(v for versions in applied for v in versions) == [m.version for m in MIGRATIONS]
+    with engines[0].connect() as connection:
+        assert connection.exec_driver_sql("SELECT COUNT(*) FROM schema_version").scalar() == LATEST_VERSION
+    for engine in engines:
+        engine.dispose()
+
+def test_duplicate_run_versions_stop_migrating_until_resolved(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ux_evaluationrun_test_case_version")
+        connection.exec_driver_sql("INSERT INTO project (name, created_at) VALUES ('Legacy', '2024-01-01 00:00:00')")
+        connection.exec_driver_sql("INSERT INTO testcase (name, project_id, created_at, last_version_number) VALUES ('Legacy case', 1, '2024-01-01 00:00:00', 0)")
+        for run_id in (1, 2):
+            connection.exec_driver_sql(f"INSERT INTO evaluationrun (id, test_case_id, version_number, status, created_at) VALUES ({run_id}, 1, 3, 'completed', '2024-01-01 00:00:00')")
+
+    with pytest.raises(RuntimeError, match="duplicated"):
+        run_migrations(engine)
+    with engine.connect() as connection:
+        # Stopped at migration 7, the one that requires unique run versions
+        assert connection.exec_driver_sql("SELECT MAX(version) FROM schema_version").scalar() == 6
+
+    # Fixing the data lets the next startup create the index
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM evaluationrun WHERE id = 2")
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS if m.version >= 7]
+    assert ("evaluationrun", "ux_evaluationrun_test_case_version", ("test_case_id", "version_number")) in _indexes(engine)
+    engine.dispose()
+
+def test_telemetry_rows_survive_the_nullable_rebuild(tmp_path):
+    from app.core.migrations import _v1_tables
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    _v1_tables().create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO llmcalltelemetry (created_at, test_case_id, evaluation_run_id, method, model, latency_ms, retries, cache_hit, success) "
+            "VALUES ('2024-01-01 00:00:00', 1, 1, 'judge_metric', 'gpt-4o', 12.5, 0, 0, 1)"
+        )
+    run_migrations(engine)
+
+    with engine.begin() as connection:
+        assert connection.exec_driver_sql("SELECT method, latency_ms FROM llmcalltelemetry").all() == [("judge_metric", 12.5)]
+        # Calls outside a run have neither a run nor necessarily a test case
+        connection.exec_driver_sql(
+            "INSERT INTO llmcalltelemetry (created_at, method, model, latency_ms, retries, cache_hit, success) "
+            "VALUES ('2024-01-02 00:00:00', 'generate_report_narrative', 'gpt-4o', 3.0, 0, 0, 1)"
+        )
+    assert {index[1] for index in _indexes(engine) if index[0] == "llmcalltelemetry"} == {
+        "ix_llmcalltelemetry_created_at", "ix_llmcalltelemetry_evaluation_run_id", "ix_llmcalltelemetry_project_created_at",
+        "ix_llmcalltelemetry_model_created_at", "ix_llmcalltelemetry_metric_created_at"
+    }
+    engine.dispose()
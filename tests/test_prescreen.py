@@ -0,0 +1,83 @@
+import json
+from unittest.mock import patch
+from sqlmodel import Session
+from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+from app.models.project import Project
+from app.models.test_case import Example, TestCase
+from app.providers.llm import StubLLMProvider
+from app.schemas.llm_validation import JudgeResult
+from app.services.evaluation import evaluate_test_case
+from app.services.prescreen import prescreen_output
+from app.services.profile import build_test_case_profile
+from app.services.vectorizer import cosine_similarity, hash_vector
+
+DESIRED = "Our quarterly revenue grew by 12 percent, driven by strong demand in the enterprise segment and improved retention."
+CURRENT = "Revenue went up. Enterprise was good. Customers stayed, mostly, and things look fine for next quarter overall."
+
+def make_profile():
+    tc = TestCase(name="TC", project_id=1)
+    tc.examples = [Example(content=DESIRED, type="desired"), Example(content=CURRENT, type="current")]
+    return build_test_case_profile(tc)
+
+def test_hash_vector_similarity():
+    assert round(cosine_similarity(hash_vector(DESIRED), hash_vector(DESIRED)), 6) == 1.0
+    paraphrase = "Revenue for the quarter increased 12% thanks to enterprise demand and better customer retention."
+    assert cosine_similarity(hash_vector(DESIRED), hash_vector(paraphrase)) > 0.3
+    assert cosine_similarity(hash_vector(DESIRED), hash_vector("这是一个完全不同的中文句子，没有任何共同点。")) < 0.05
+    assert hash_vector("   ") == {}
+
+def test_prescreen_checks():
+    profile = make_profile()
+    good = "Quarterly revenue grew 12 percent on enterprise demand, while retention improved across the customer base."
+    assert prescreen_output(good, profile) is None
+    assert prescreen_output("  \n", profile) == "empty output"
+    assert prescreen_output("Our quarterly", profile).startswith("truncated")
+    assert prescreen_output(DESIRED * 6, profile).startswith("length outlier")
+    assert prescreen_output(CURRENT, profile).startswith("copy of a current (flawed) example")
+    assert prescreen_output("这是一个完全不同的中文句子，没有任何共同点。这是一个完全不同的中文句子，没有任何共同点。", profile).startswith("unrelated")
+    # Without examples only emptiness can be judged
+    assert prescreen_output("x", build_test_case_profile(TestCase(name="Bare", project_id=1))) is None
+
+def test_prescreen_short_circuits_judging(session: Session):
+    project = Project(name="Prescreen Project")
+    session.add(project)
+    session.commit()
+    tc = TestCase(name="Prescreen Case", project_id=project.id)
+    session.add(tc)
+    session.commit()
+    session.add(Example(content=DESIRED, type="desired", test_case_id=tc.id))
+    session.add(Example(content=CURRENT, type="current", test_case_id=tc.id))
+    judge = MetricDefinition(
+        test_case_id=tc.id, name="Quality", description="Desc", metric_type=MetricType.LLM_JUDGE,
+        scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER, evaluation_prompt="Score it."
+    )
+    session.add(judge)
+    session.commit()
+    session.refresh(tc)
+
+    judged = []
+
+    class CountingProvider(StubLLMProvider):
+        def judge_metric(self, metric, candidate_text, test_case_context, sample=0):
+            judged.append(candidate_text)
+            return JudgeResult(score=90.0, explanation="good")
+
+    good = "Quarterly revenue grew 12 percent on enterprise demand, while retention improved across the customer base."
+    with patch("app.services.evaluation.get_llm_provider", return_value=CountingProvider()):
+        with patch("app.core.config.settings.EVAL_PRESCREEN_ENABLED", True):
+            run = evaluate_test_case(tc, [judge], [good, "", CURRENT], multi_sample=True)
+        assert judged == [good]
+
+        samples = sorted(run.sample_results, key=lambda r: r["sample_index"])
+        assert samples[0]["score"] == 90.0 and "short_circuited" not in samples[0]
+        for row in samples[1:]:
+            assert row["short_circuited"] is True and row["score"] == 0.0
+            assert json.loads(row["raw_json"])["short_circuited"] is True
+        assert run.metric_results[0]["score"] == 30.0
+        assert "Output failed the pre-screen (empty output); LLM judges skipped." in run.warnings
+
+        # Disabled by default: everything is judged
+        judged.clear()
+        evaluate_test_case(tc, [judge], [good, "", CURRENT], multi_sample=True)
+        assert len(judged) == 3
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+from app.providers.llm import StubLLMProvider, get_async_llm_provider, get_llm_provider
+from app.providers.replay import (
+    AsyncReplayLLMProvider, LLMRecordingArchive, RecordingLLMProvider, ReplayLLMProvider
+)
+from app.schemas.llm_validation import JudgeResult
+
+class SlowProvider(StubLLMProvider):
+    model = "gpt-test"
+
+    def judge_metric(self, metric, candidate_text, test_case_context, sample=0):
+        time.sleep(0.05)
+        return JudgeResult(score=77.0, explanation=f"Recorded for {candidate_text}")
+
+def make_metric(metric_id=1):
+    return MetricDefinition(
+        id=metric_id, name="Judge", description="Desc", metric_type=MetricType.LLM_JUDGE,
+        scale_type=ScaleType.BOUNDED, scale_min=0, scale_max=100,
+        target_direction=TargetDirection.HIGHER_IS_BETTER,
+        evaluation_prompt="Score it."
+    )
+
+def record(path):
+    archive = LLMRecordingArchive(str(path))
+    RecordingLLMProvider(SlowProvider(), archive).judge_metric(make_metric(), "Candidate", "Ctx")
+    return archive
+
+def test_replay_serves_recordings_with_scaled_latency(tmp_path):
+    path = tmp_path / "recordings.jsonl"
+    record(path)
+    # A fresh archive reads the recording back from disk
+    archive = LLMRecordingArchive(str(path))
+    assert archive.stats()["methods"] == {"judge_metric": 1}
+
+    instant = ReplayLLMProvider(archive, "gpt-test", latency_scale=0)
+    started = time.perf_counter()
+    result = instant.judge_metric(make_metric(), "Candidate", "Ctx")
+    assert time.perf_counter() - started < 0.04
+    assert result.score == 77.0
+    assert result.explanation == "Recorded for Candidate"
+
+    slowed = ReplayLLMProvider(archive, "gpt-test", latency_scale=2.0)
+    started = time.perf_counter()
+    slowed.judge_metric(make_metric(), "Candidate", "Ctx")
+    assert time.perf_counter() - started >= 0.1
+
+    async_replay = AsyncReplayLLMProvider(archive, "gpt-test", latency_scale=0)
+    assert asyncio.run(async_replay.judge_metric(make_metric(), "Candidate", "Ctx")).score == 77.0
+
+def test_replay_miss_policies(tmp_path):
+    archive = record(tmp_path / "recordings.jsonl")
+
+    # Unrecorded input: another recording of the same method
+    assert ReplayLLMProvider(archive, "gpt-test", 0, "any").judge_metric(make_metric(), "Other", "Ctx").score == 77.0
+    # ... or the stub answer
+    stub = StubLLMProvider().judge_metric(make_metric(), "Other", "Ctx")
+    assert ReplayLLMProvider(archive, "gpt-test", 0, "stub").judge_metric(make_metric(), "Other", "Ctx") == stub
+    with pytest.raises(LookupError):
+        ReplayLLMProvider(archive, "gpt-test", 0, "error").judge_metric(make_metric(), "Other", "Ctx")
+
+    # Nothing recorded for the method at all: "any" falls back to the stub
+    replay = ReplayLLMProvider(archive, "gpt-test", 0, "any")
+    judged = replay.judge_metrics([make_metric(1), make_metric(2)], "Other", "Ctx")
+    assert set(judged) == {1, 2}
+
+def test_llm_mode_selects_replay_provider(tmp_path):
+    path = tmp_path / "recordings.jsonl"
+    record(path)
+    with patch("app.core.config.settings.LLM_MODE", "replay"), \
+         patch("app.core.config.settings.LLM_RECORDING_PATH", str(path)), \
+         patch("app.core.config.settings.LLM_REPLAY_LATENCY_SCALE", 0):
+        provider = get_llm_provider("gpt-test")
+        assert isinstance(provider.inner, ReplayLLMProvider)
+        assert provider.judge_metric(make_metric(), "Candidate", "Ctx").score == 77.0
+
+        async def judge():
+            provider = get_async_llm_provider("gpt-test")
+            assert isinstance(provider.inner, AsyncReplayLLMProvider)
+            return await provider.judge_metric(make_metric(), "Candidate", "Ctx")
+        assert asyncio.run(judge()).score == 77.0
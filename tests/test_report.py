@@ -23,14 +23,14 @@ def test_report_workflow(auth_client: TestClient, session: Session):
     session.commit()
     
     # Run 1 (Earlier)
-    run1 = EvaluationRun(test_case_id=test_case.id, version_number=1, aggregated_score=50.0, created_at=datetime(2023, 1, 1))
+    run1 = EvaluationRun(test_case_id=test_case.id, version_number=1, status="completed", aggregated_score=50.0, created_at=datetime(2023, 1, 1))
     session.add(run1)
     session.commit()
     res1 = MetricResult(evaluation_run_id=run1.id, metric_definition_id=m1.id, score=50.0, metric_name="Score")
     session.add(res1)
     
     # Run 2 (Later)
-    run2 = EvaluationRun(test_case_id=test_case.id, version_number=2, aggregated_score=60.0, created_at=datetime(2023, 2, 1))
+    run2 = EvaluationRun(test_case_id=test_case.id, version_number=2, status="completed", aggregated_score=60.0, created_at=datetime(2023, 2, 1))
     session.add(run2)
     session.commit()
     res2 = MetricResult(evaluation_run_id=run2.id, metric_definition_id=m1.id, score=60.0, metric_name="Score")
@@ -0,0 +1,126 @@
+import json
+import time
+import pytest
+from unittest.mock import patch
+from app.models.metric import MetricDefinition, MetricType, ScaleType, TargetDirection
+from app.models.test_case import TestCase
+from app.services import rules
+from app.services.rules import compile_rule, parse_rule_definition, RuleCache
+from app.services.evaluation import _score_deterministic_metric
+from app.services.profile import build_test_case_profile
+
+def make_metric(rule_definition, scale_type=ScaleType.BOUNDED, direction=TargetDirection.HIGHER_IS_BETTER, metric_id=1):
+    return MetricDefinition(
+        id=metric_id, name="Rule", description="Desc", test_case_id=1,
+        metric_type=MetricType.DETERMINISTIC, scale_type=scale_type,
+        scale_min=0 if scale_type == ScaleType.BOUNDED else None,
+        scale_max=100 if scale_type == ScaleType.BOUNDED else None,
+        target_direction=direction, rule_definition=rule_definition
+    )
+
+def test_free_text_rules_are_not_compiled():
+    assert parse_rule_definition("Count violations.") is None
+    assert parse_rule_definition('{"type": "unknown"}') is None
+    assert compile_rule(make_metric("Count occurrences of 'spam'.", metric_id=100)) is None
+
+def test_substring_blocklist_counts_longest_match():
+    rule = compile_rule(make_metric(json.dumps({"type": "substrings", "values": ["risk", "risk-free", "Guaranteed", "100%"]}), metric_id=101))
+    outcome = rule.evaluate("GUARANTEED returns, risk-free, 100% safe. Some risk.")
+    assert outcome.value == 4
+    assert outcome.passed is None
+
+def test_large_blocklist_is_fast():
+    words = [f"blockedterm{i}" for i in range(500)]
+    rule = compile_rule(make_metric(json.dumps({"type": "substrings", "values": words, "max": 0}), metric_id=102))
+    text = "perfectly fine words " * 5000 + "blockedterm499"
+    start = time.monotonic()
+    outcome = rule.evaluate(text)
+    assert time.monotonic() - start < 1.0
+    assert outcome.value == 1
+    assert outcome.passed is False
+
+def test_count_rules_with_bounds():
+    text = "One sentence here. Another one! And a third?"
+    assert compile_rule(make_metric('{"type": "sentence_count", "min": 3}', metric_id=103)).evaluate(text).passed is True
+    assert compile_rule(make_metric('{"type": "word_count", "max": 5}', metric_id=104)).evaluate(text).passed is False
+    assert compile_rule(make_metric('{"type": "char_count", "min": 1, "max": 100}', metric_id=105)).evaluate(text).value == len(text)
+
+def test_regex_rule_scoring():
+    profile = build_test_case_profile(TestCase(name="TC", project_id=1))
+    metric = make_metric("regex: \\bguaranteed\\b", scale_type=ScaleType.UNBOUNDED, direction=TargetDirection.LOWER_IS_BETTER, metric_id=106)
+    score, explanation, include, failed = _score_deterministic_metric(metric, "This is guaranteed.", profile)
+    assert (score, include, failed) == (0.0, True, False)
+    score, _, include, _ = _score_deterministic_metric(metric, "This is fine.", profile)
+    assert (score, include) == (100.0, True)
+
+    counter = make_metric('{"type": "regex", "pattern": "\\\\d+"}', scale_type=ScaleType.UNBOUNDED, metric_id=107)
+    score, _, include, _ = _score_deterministic_metric(counter, "1, 22 and 333", profile)
+    assert (score, include) == (3.0, False)
+
+def test_compiled_rules_cached_per_metric_version():
+    cache = RuleCache()
+    metric = make_metric('{"type": "word_count", "max": 5}', metric_id=108)
+    first = cache.get(metric)
+    assert cache.get(metric) is first
+    metric.rule_definition = '{"type": "word_count", "max": 6}'
+    assert cache.get(metric) is not first
+
+def test_invalid_and_dangerous_regexes_are_disabled():
+    invalid = compile_rule(make_metric('{"type": "regex", "pattern": "(unclosed"}', metric_id=109))
+    assert invalid.evaluate("text").error
+
+    if rules.regex_module is None:
+        nested = compile_rule(make_metric('{"type": "regex", "pattern": "(a+)+$"}', metric_id=110))
+        assert "nested quantifiers" in nested.evaluate("aaaa").error
+
+@pytest.mark.parametrize("engine", ["regex", "sandbox"])
+def test_regex_time_budget(engine):
+    # Not caught by the nested-quantifier screen, but still polynomial with a huge exponent on this input
+    definition = '{"type": "regex", "pattern": "(.*?,){15}x"}'
+    slow, fast = "a," * 30, "a," * 15 + "x"
+    with patch.object(rules, "regex_module", rules.regex_module if engine == "regex" else None):
+        if engine == "regex" and rules.regex_module is None:
+            pytest.skip("regex package not installed")
+        rule = rules.build_rule(rules.parse_rule_definition(definition))
+        assert rule.evaluate(fast).value == 1 # Sandbox: starts a worker outside the timed section
+        with patch("app.core.config.settings.RULE_TIME_BUDGET_MS", 50):
+            start = time.monotonic()
+            outcome = rule.evaluate(slow)
+            assert time.monotonic() - start < 1.0
+        assert "time budget" in outcome.error
+        assert outcome.passed is None
+        # One overrun doesn't disable the rule; a success resets the count
+        assert rule.evaluate(fast).value == 1
+        with patch("app.core.config.settings.RULE_TIME_BUDGET_MS", 50):
+            for _ in range(rules.TIMEOUT_STRIKES):
+                assert "time budget" in rule.evaluate(slow).error
+        # Consecutive overruns suspend it, so it can't stall every later evaluation
+        assert "suspended" in rule.evaluate(fast).error
+        rule.suspended_until = 0.0
+        assert rule.evaluate(fast).value == 1
+
+def test_sandbox_budget_excludes_transfer_time():
+    from app.services.regex_sandbox import RegexSandbox
+    sandbox = RegexSandbox(size=1)
+    try:
+        text = "foo bar " * 1_500_000 # 12MB takes far longer to pipe than the budget below
+        sandbox.count_matches(r"\Afoo", 0, "warm up", timeout=5.0)
+        assert sandbox.count_matches(r"\Afoo", 0, text, timeout=0.005) == 1
+    finally:
+        sandbox.shutdown()
+
+def test_unevaluated_rules_are_excluded_from_the_aggregate():
+    from app.services.evaluation import evaluate_test_case
+    from app.services.regex_sandbox import SandboxError
+
+    test_case = TestCase(id=1, name="TC", project_id=1)
+    blocked = make_metric('{"type": "regex", "pattern": "\\bguaranteed\\b", "max": 0}', metric_id=112)
+    length = make_metric('{"type": "word_count", "max": 50}', metric_id=113)
+    with patch.object(rules, "regex_module", None), \
+         patch.object(rules.sandbox, "count_matches", side_effect=SandboxError("rule worker crashed")):
+        compiled = {112: rules.build_rule(rules.parse_rule_definition(blocked.rule_definition)), 113: compile_rule(length)}
+        with patch.object(rules.rule_cache, "get", side_effect=lambda m: compiled[m.id]):
+            response = evaluate_test_case(test_case, [blocked, length], ["Fine answer."])
+    assert response.aggregated_score == 100.0
+    assert "Rule not evaluated: rule worker crashed" in response.metric_results[0]["explanation"]
+    assert any("rule not evaluated" in w for w in response.warnings)
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from fastapi.testclient import TestClient
+from app.providers.scheduler import LLMScheduler, TokenBucket
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+class FakeBadRequestError(Exception):
+    status_code = 400
+
+def test_retries_rate_limits_and_backs_off():
+    sleeps = []
+    scheduler = LLMScheduler(initial_concurrency=8, max_attempts=3, sleep=sleeps.append)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise FakeRateLimitError("slow down")
+        return "ok"
+
+    assert scheduler.call("gpt-4o", 100, flaky) == "ok"
+    assert len(calls) == 2
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 0.5
+
+    stats = scheduler.stats()[0]
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 1
+    assert stats["completed"] == 1
+    # A 429 halves the concurrency limit
+    assert stats["concurrency_limit"] == 4
+
+def test_non_retryable_errors_fail_fast():
+    sleeps = []
+    scheduler = LLMScheduler(max_attempts=5, sleep=sleeps.append)
+
+    def bad():
+        raise FakeBadRequestError("invalid schema")
+
+    try:
+        scheduler.call("gpt-4o", 100, bad)
+        assert False, "expected the error to propagate"
+    except FakeBadRequestError:
+        pass
+    assert sleeps == []
+    assert scheduler.stats()[0]["failed"] == 1
+
+def test_concurrency_limit_is_shared_by_threads():
+    scheduler = LLMScheduler(initial_concurrency=2, max_concurrency=2)
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0, "queue_seen": 0}
+
+    def work():
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            state["queue_seen"] = max(state["queue_seen"], scheduler.stats()[0]["queue_depth"])
+        time.sleep(0.05)
+        with lock:
+            state["in_flight"] -= 1
+
+    threads = [threading.Thread(target=scheduler.call, args=("gpt-4o", 10, work)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert state["peak"] == 2
+    assert state["queue_seen"] > 0
+    assert scheduler.stats()[0]["completed"] == 6
+
+def test_async_callers_respect_the_limit():
+    scheduler = LLMScheduler(initial_concurrency=3, max_concurrency=3)
+    state = {"in_flight": 0, "peak": 0}
+
+    async def work():
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.02)
+        state["in_flight"] -= 1
+        return 1
+
+    async def main():
+        return await asyncio.gather(*(scheduler.call_async("gpt-4o", 10, work) for _ in range(10)))
+
+    assert sum(asyncio.run(main())) == 10
+    assert state["peak"] == 3
+
+def test_cancelled_call_releases_its_slot():
+    scheduler = LLMScheduler(initial_concurrency=1, max_concurrency=1)
+
+    async def main():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.create_task(scheduler.call_async("gpt-4o", 10, hang))
+        await started.wait()
+        assert scheduler.stats()[0]["in_flight"] == 1
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert scheduler.stats()[0]["in_flight"] == 0
+
+        # The only slot is usable again
+        async def work():
+            return 1
+        return await asyncio.wait_for(scheduler.call_async("gpt-4o", 10, work), timeout=1.0)
+
+    assert asyncio.run(main()) == 1
+    assert scheduler.stats()[0]["failed"] == 0
+
+def test_token_bucket_waits_for_budget():
+    bucket = TokenBucket(per_minute=600) # 10 per second
+    now = bucket.updated
+    assert bucket.wait_time(600, now) == 0.0
+    bucket.take(600)
+    assert abs(bucket.wait_time(5, now) - 0.5) < 1e-6
+    # Refills over time
+    assert bucket.wait_time(5, now + 0.5) == 0.0
+    assert TokenBucket(per_minute=0).wait_time(10**6, now) == 0.0
+
+def test_scheduler_stats_endpoint(client: TestClient):
+    response = client.get("/api/v1/llm/scheduler")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)